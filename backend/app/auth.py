@@ -0,0 +1,146 @@
+"""Bearer-token sessions backed by ``user_sessions`` and an in-process cache."""
+
+import threading
+from datetime import date, datetime
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import cache, crud
+from .config import settings
+from .database import SessionLocal, after_commit, session_scope
+
+
+class Principal(NamedTuple):
+    user_id: int
+    session_id: int
+    expires_at: datetime
+
+
+# Entries stay valid for at most session_cache_ttl_seconds after a revoke on
+# another worker; revokes on this worker drop them immediately.
+_sessions: cache.TTLCache[Principal] = cache.TTLCache(
+    settings.session_cache_ttl_seconds, settings.session_cache_size, name="sessions"
+)
+_last_seen: Dict[int, datetime] = {}
+_last_seen_lock = threading.Lock()
+_bearer = HTTPBearer(auto_error=False)
+
+
+def issue_token(db: Session, user_id: int) -> str:
+    return crud.create_user_session(
+        db, user_id, ttl_seconds=settings.session_ttl_seconds
+    )
+
+
+def revoke(db: Session, principal: Principal, *, everywhere: bool = False) -> int:
+    if everywhere:
+        revoked = crud.revoke_user_sessions(db, user_id=principal.user_id)
+    else:
+        revoked = crud.revoke_user_sessions(db, session_id=principal.session_id)
+    # Evict once the revoke is committed, so a concurrent request cannot put
+    # the still-valid row back into the cache.
+    after_commit(db, partial(_evict, revoked))
+    return len(revoked)
+
+
+def _evict(token_hashes: List[str]) -> None:
+    for token_hash in token_hashes:
+        _sessions.pop(token_hash)
+
+
+def _load(token_hash: str) -> Optional[Principal]:
+    with SessionLocal() as db:
+        row = crud.get_active_session(db, token_hash)
+    if row is None:
+        return None
+    principal = Principal(row.user_id, row.id, row.expires_at)
+    _sessions.set(token_hash, principal)
+    return principal
+
+
+async def _authenticate(token: str) -> Optional[Principal]:
+    token_hash = crud.hash_session_token(token)
+    principal = _sessions.get(token_hash)
+    if principal is None:
+        principal = await run_in_threadpool(_load, token_hash)
+        if principal is None:
+            return None
+    now = datetime.utcnow()
+    if principal.expires_at <= now:
+        _sessions.pop(token_hash)
+        return None
+    with _last_seen_lock:
+        _last_seen[principal.session_id] = now
+    return principal
+
+
+async def optional_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+) -> Optional[Principal]:
+    if credentials is None:
+        return None
+    principal = await _authenticate(credentials.credentials)
+    if principal is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired session",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+
+async def current_user(
+    principal: Optional[Principal] = Depends(optional_current_user),
+) -> Principal:
+    if principal is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+
+def acting_user_id(
+    principal: Optional[Principal], claimed: Optional[int], *, required: bool = True
+) -> Optional[int]:
+    """The user a request acts for, given the ``user_id`` it sent (if any).
+
+    With a bearer token it is the signed-in user, and a ``user_id`` that names
+    someone else is a 403. Without one, the ``user_id`` is trusted only until
+    ``LEGACY_USER_ID_UNTIL`` so clients from before sessions keep working;
+    after that it is a 401. Returns None when neither is given and the user
+    is not ``required``.
+    """
+    if principal is not None:
+        if claimed is not None and claimed != principal.user_id:
+            raise HTTPException(
+                status_code=403, detail="user_id does not match the signed-in user"
+            )
+        return principal.user_id
+    if claimed is None and not required:
+        return None
+    if claimed is None or date.today() > settings.legacy_user_id_until:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claimed
+
+
+def flush_last_seen() -> int:
+    """Write buffered activity timestamps in one batch."""
+    with _last_seen_lock:
+        if not _last_seen:
+            return 0
+        pending = dict(_last_seen)
+        _last_seen.clear()
+    with session_scope() as db:
+        crud.touch_user_sessions(db, pending)
+    return len(pending)
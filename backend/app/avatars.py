@@ -0,0 +1,142 @@
+"""Content-addressed avatar storage on the local filesystem.
+
+Images are stored once per SHA-256 digest under ``AVATAR_STORAGE_DIR`` (sharded
+by the first two hex characters), so identical uploads share a file and a
+digest's bytes never change, which makes them safe to cache forever. A square
+thumbnail is generated next to each original with Pillow (a requirement, but
+imported optionally so a bare install still stores originals).
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import settings
+
+try:  # Pillow is optional; without it only originals are stored.
+    from PIL import Image
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+
+THUMBNAIL_SIZE = 128
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URL_PATTERN = re.compile(r"^data:(?P<mime>[\w/+.-]+)?(;[\w=-]+)*;base64,", re.I)
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def root() -> Path:
+    return Path(settings.avatar_storage_dir)
+
+
+def decode(avatar_data: str) -> bytes:
+    """Decode a ``data:image/...;base64,`` URL or bare base64 string."""
+    payload = _DATA_URL_PATTERN.sub("", avatar_data.strip(), count=1)
+    try:
+        data = base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("INVALID_AVATAR")
+    if not data:
+        raise ValueError("INVALID_AVATAR")
+    if len(data) > settings.avatar_max_bytes:
+        raise ValueError("AVATAR_TOO_LARGE")
+    if content_type(data) is None:
+        raise ValueError("INVALID_AVATAR")
+    return data
+
+
+def content_type(data: bytes) -> Optional[str]:
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def path_for(digest: str, *, thumbnail: bool = False) -> Path:
+    name = f"{digest}.thumb" if thumbnail else digest
+    return root() / digest[:2] / name
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST_PATTERN.match(value))
+
+
+def store(data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    original = path_for(digest)
+    if not original.exists():
+        _write_atomic(original, data)
+    thumbnail_path = path_for(digest, thumbnail=True)
+    if not thumbnail_path.exists():
+        thumbnail = _thumbnail(data)
+        if thumbnail is not None:
+            _write_atomic(thumbnail_path, thumbnail)
+    return digest
+
+
+def open_image(digest: str, *, thumbnail: bool = False) -> Optional[Tuple[Path, str]]:
+    if not is_digest(digest):
+        return None
+    path = path_for(digest, thumbnail=thumbnail)
+    if thumbnail and not path.exists():
+        path = path_for(digest)
+    if not path.exists():
+        return None
+    with path.open("rb") as handle:
+        mime = content_type(handle.read(16)) or "application/octet-stream"
+    return path, mime
+
+
+def url_for(digest: Optional[str], legacy: Optional[str] = None) -> Optional[str]:
+    """Public URL of a stored avatar, else the user's legacy avatar value.
+
+    ``legacy`` is an external http(s) URL or an inline ``data:`` URL that has
+    not been migrated into the store yet.
+    """
+    if not digest:
+        return legacy or None
+    return f"{settings.public_base_url.rstrip('/')}/avatars/{digest}"
+
+
+def _thumbnail(data: bytes) -> Optional[bytes]:
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            side = min(image.size)
+            left = (image.width - side) // 2
+            top = (image.height - side) // 2
+            image = image.crop((left, top, left + side, top + side))
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=85, optimize=True)
+            return buffer.getvalue()
+    except Exception:
+        # A file Pillow cannot parse is still served as the original.
+        return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+    try:
+        with os.fdopen(handle, "wb") as output:
+            output.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
@@ -0,0 +1,186 @@
+"""``POST /batch``: several GET requests in one round trip.
+
+Each sub-request is dispatched through the application itself, so it gets the
+same routing, validation, error handling and body as a direct call. They all
+share one database session (``database.shared_session``): one connection
+checkout for the whole batch, with every read in the same transaction. Each
+item runs inside a SAVEPOINT, so an item that fails with a 5xx undoes only its
+own work; the rest is committed once at the end. A session cannot be used from
+two threads at once, so sub-requests run one after another; the saving is the
+client's round trips and the per-request session and threadpool overhead, not
+parallelism on the server.
+
+Only GETs are accepted, so a failing item never leaves a half-applied write
+behind. Long polling (``wait``) and event streams would hold the whole batch
+open and are refused per item with a 400.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from . import schemas, serialization
+from .database import SessionLocal, shared_session
+
+logger = logging.getLogger(__name__)
+
+# Request headers passed on to every sub-request.
+FORWARDED_HEADERS = (b"authorization", b"cookie", b"user-agent")
+# Response headers copied into each item, besides any X-* header.
+KEPT_HEADERS = frozenset({"etag", "cache-control", "location"})
+EVENT_STREAM = "text/event-stream"
+
+
+class _Result:
+    def __init__(self) -> None:
+        self.status = 500
+        self.headers: Dict[str, str] = {}
+        self.content_type = ""
+        self.chunks: List[bytes] = []
+
+
+async def run(app, request: Request, items: List[schemas.BatchRequestItem]) -> bytes:
+    """Run ``items`` in order and return the combined JSON body."""
+    forwarded = [
+        (name, value)
+        for name, value in request.scope["headers"]
+        if name in FORWARDED_HEADERS
+    ]
+    parts = []
+    # Session I/O goes to the threadpool, like the endpoints' own.
+    db = SessionLocal()
+    try:
+        with shared_session(db):
+            for item in items:
+                path, query_string = _target(item)
+                if _waits(query_string):
+                    result = _error(400, "Long polling is not supported in a batch")
+                else:
+                    savepoint = await run_in_threadpool(db.begin_nested)
+                    result = await _dispatch(
+                        app, request, path, query_string, forwarded
+                    )
+                    if result.status >= 500:
+                        # Only the failed item's work is undone; items already
+                        # reported as done keep theirs.
+                        await run_in_threadpool(savepoint.rollback)
+                    else:
+                        await run_in_threadpool(savepoint.commit)
+                parts.append(_encode_item(item.id, result))
+        await run_in_threadpool(db.commit)
+    except BaseException:
+        await run_in_threadpool(db.rollback)
+        raise
+    finally:
+        await run_in_threadpool(db.close)
+    return b'{"responses":[' + b",".join(parts) + b"]}"
+
+
+def _target(item: schemas.BatchRequestItem) -> Tuple[str, str]:
+    path, _, inline = item.path.partition("?")
+    pairs = parse_qsl(inline, keep_blank_values=True)
+    for name, value in item.query.items():
+        values = value if isinstance(value, list) else [value]
+        for single in values:
+            if isinstance(single, bool):
+                single = "true" if single else "false"
+            pairs.append((name, str(single)))
+    return path, urlencode(pairs)
+
+
+def _waits(query_string: str) -> bool:
+    return any(
+        name == "wait" and value not in ("", "0")
+        for name, value in parse_qsl(query_string, keep_blank_values=True)
+    )
+
+
+async def _dispatch(
+    app,
+    request: Request,
+    path: str,
+    query_string: str,
+    forwarded: List[Tuple[bytes, bytes]],
+) -> _Result:
+    scope = {
+        key: value
+        for key, value in request.scope.items()
+        if key in ("asgi", "http_version", "scheme", "server", "client", "state")
+    }
+    scope.update(
+        type="http",
+        method="GET",
+        root_path=request.scope.get("root_path", ""),
+        path=path,
+        raw_path=path.encode(),
+        query_string=query_string.encode(),
+        headers=[(b"accept", serialization.JSON.encode()), *forwarded],
+    )
+    result = _Result()
+    finished = asyncio.Event()
+    requested = False
+
+    async def receive() -> dict:
+        # An empty body once, then a disconnect when the item is done, like a
+        # client that waits for its response.
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            result.status = message["status"]
+            for raw_name, raw_value in message.get("headers", []):
+                name = raw_name.decode("latin-1").lower()
+                value = raw_value.decode("latin-1")
+                if name == "content-type":
+                    result.content_type = value.split(";")[0].strip()
+                elif name.startswith("x-") or name in KEPT_HEADERS:
+                    result.headers[name] = value
+            if result.content_type == EVENT_STREAM:
+                # Disconnecting makes starlette stop the stream.
+                finished.set()
+        elif result.content_type != EVENT_STREAM:
+            result.chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The app has sent its 500 and re-raised; log it as uvicorn would.
+        logger.exception("Batch item GET %s failed", path)
+        return _error(500, "Internal Server Error")
+    finally:
+        finished.set()
+    if result.content_type == EVENT_STREAM:
+        return _error(400, "Event streams are not supported in a batch")
+    return result
+
+
+def _error(status: int, detail: str) -> _Result:
+    result = _Result()
+    result.status = status
+    result.content_type = serialization.JSON
+    result.chunks.append(serialization.dumps({"detail": detail}))
+    return result
+
+
+def _encode_item(item_id: str, result: _Result) -> bytes:
+    body = b"".join(result.chunks)
+    if not body:
+        payload = b"null"
+    elif result.content_type == serialization.JSON:
+        # Already JSON: spliced in as is rather than parsed and re-encoded.
+        payload = body
+    else:
+        payload = serialization.dumps(body.decode("utf-8", "replace"))
+    head = serialization.dumps(
+        {"id": item_id, "status": result.status, "headers": result.headers}
+    )
+    return head[:-1] + b',"body":' + payload + b"}"
@@ -0,0 +1,174 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+``CompressionMiddleware`` compresses bodies of at least
+``COMPRESSION_MINIMUM_SIZE`` bytes whose content type is text or one of the
+API's data formats. It uses Brotli (``br``) or zstd when the ``brotli`` or
+``zstandard`` package is installed, and gzip otherwise. The client's q-values
+decide, and ties go to the order in ``COMPRESSION_ENCODINGS``. Each codec's
+level comes from settings and defaults to a fast level: list bodies are very
+repetitive, so the higher levels cost CPU for little extra saving. Responses
+that already carry a ``Content-Encoding``, and event streams (which must
+reach the client as soon as they are sent), are passed through unchanged.
+"""
+
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .config import settings
+
+try:  # optional codecs
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/msgpack",
+        "application/cbor",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+
+class _Compressor(NamedTuple):
+    """Streaming compressor: ``compress`` chunks, then ``finish`` once."""
+
+    compress: Callable[[bytes], bytes]
+    finish: Callable[[], bytes]
+
+
+def _gzip() -> _Compressor:
+    stream = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+    return _Compressor(stream.compress, stream.flush)
+
+
+def _brotli() -> _Compressor:
+    stream = brotli.Compressor(quality=settings.compression_brotli_quality)
+    return _Compressor(stream.process, stream.finish)
+
+
+def _zstd() -> _Compressor:
+    stream = zstandard.ZstdCompressor(
+        level=settings.compression_zstd_level
+    ).compressobj()
+    return _Compressor(stream.compress, stream.flush)
+
+
+# Installed codecs by content-coding name.
+CODECS: Dict[str, Callable[[], _Compressor]] = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = _brotli
+if zstandard is not None:
+    CODECS["zstd"] = _zstd
+
+ENCODINGS: List[str] = [
+    name.strip()
+    for name in settings.compression_encodings.split(",")
+    if name.strip() in CODECS
+]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best installed coding the client accepts, or ``None`` for identity."""
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type.startswith("text/"):
+        return content_type != "text/event-stream"
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, coding))
+
+
+class _CompressingSend:
+    def __init__(self, send, coding: str) -> None:
+        self.send = send
+        self.coding = coding
+        self.start: Optional[dict] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress.
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            headers = Headers(raw=self.start["headers"])
+            if not _compressible(headers) or (
+                not more_body and len(body) < settings.compression_minimum_size
+            ):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compressor = CODECS[self.coding]()
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.coding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                await self.send(self.start)
+            else:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
@@ -1,23 +1,69 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from functools import partial
+from typing import Collection, Dict, List, NamedTuple, Optional, Set, Tuple
+import base64
 import hashlib
+import json
 import secrets
 
-from sqlalchemy import select, update, func
+from sqlalchemy import delete, insert, select, tuple_, update, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload
 
-from . import models, schemas
+from . import (
+    avatars,
+    cache,
+    models,
+    passwords,
+    realtime,
+    schemas,
+    search,
+    swap_matching,
+)
+from .config import settings
+from .database import after_commit, transaction_cache
 
 
 DEFAULT_USER_EMAIL = "jamie@nurseshift.app"
 
 
+class UserIdentity(NamedTuple):
+    id: int
+    name: str
+    email: str
+    hospital_id: Optional[int]
+    department_id: Optional[int]
+    primary_hospital: Optional[str]
+    primary_department: Optional[str]
+    primary_position: Optional[str]
+
+
+_IDENTITY_COLUMNS = tuple(getattr(models.User, field) for field in UserIdentity._fields)
+
+# Read-through caches shared by every request on this worker. A lookup is only
+# remembered once its transaction commits, and crud updates drop the entry on
+# commit; updates from other workers show up within the TTL. Emails never
+# change, so the email index needs no invalidation.
+_user_identities: cache.TTLCache[UserIdentity] = cache.TTLCache(
+    settings.user_identity_cache_ttl_seconds,
+    settings.user_identity_cache_size,
+    name="user_identities",
+)
+_user_ids_by_email: cache.TTLCache[int] = cache.TTLCache(
+    settings.user_identity_cache_ttl_seconds,
+    settings.user_identity_cache_size,
+    name="user_ids_by_email",
+)
+
+
 def create_event(db: Session, event_in: schemas.EventCreate) -> models.Event:
     payload = event_in.model_dump()
     requested_user_id = payload.pop("user_id", None)
-    user: Optional[models.User]
+    user: Optional[UserIdentity]
     if requested_user_id is not None:
-        user = db.get(models.User, requested_user_id)
+        user = get_user_identity(db, requested_user_id)
         if not user:
             raise ValueError("USER_NOT_FOUND")
     else:
@@ -25,8 +71,8 @@ def create_event(db: Session, event_in: schemas.EventCreate) -> models.Event:
     payload["user_id"] = user.id
     event = models.Event(**payload)
     db.add(event)
-    db.commit()
-    db.refresh(event)
+    db.flush()
+    realtime.emit_calendar(db, [event.user_id], event.id, [event.date])
     return event
 
 
@@ -34,30 +80,17 @@ def get_event(db: Session, event_id: int) -> Optional[models.Event]:
     return db.get(models.Event, event_id)
 
 
-def list_events(
-    db: Session, *, start_date: date, end_date: date, user_id: Optional[int] = None
-) -> List[models.Event]:
-    stmt = (
-        select(models.Event)
-        .where(models.Event.date >= start_date)
-        .where(models.Event.date <= end_date)
-        .order_by(models.Event.date.asc(), models.Event.start_time.asc())
-    )
-    if user_id is not None:
-        stmt = stmt.where(models.Event.user_id == user_id)
-    return list(db.scalars(stmt).all())
-
-
 def update_event(
     db: Session, event_id: int, payload: schemas.EventUpdate
 ) -> Optional[models.Event]:
     event = get_event(db, event_id)
     if not event:
         return None
+    previous_date = event.date
     for key, value in payload.model_dump().items():
         setattr(event, key, value)
-    db.commit()
-    db.refresh(event)
+    realtime.emit_calendar(db, [event.user_id], event.id, [previous_date, event.date])
+    db.flush()
     return event
 
 
@@ -65,8 +98,9 @@ def delete_event(db: Session, event_id: int) -> bool:
     event = get_event(db, event_id)
     if not event:
         return False
+    realtime.emit_calendar(db, [event.user_id], event.id, [event.date])
     db.delete(event)
-    db.commit()
+    db.flush()
     return True
 
 
@@ -76,7 +110,9 @@ def create_swap_request(
     event = get_event(db, payload.event_id)
     if not event:
         raise ValueError("EVENT_NOT_FOUND")
-    owner = event.user or _get_or_create_default_user(db)
+    owner = (
+        get_user_identity(db, event.user_id) if event.user_id else None
+    ) or _get_or_create_default_user(db)
     swap_request = models.SwapRequest(
         event_id=payload.event_id,
         mode=payload.mode.value,
@@ -90,116 +126,39 @@ def create_swap_request(
         notes=payload.notes,
         user_id=owner.id,
     )
-    for colleague in payload.targeted_colleagues:
-        match = (
-            db.query(models.User)
-            .filter(models.User.email == colleague.lower())
-            .first()
+    targets = {
+        models.normalize_email(colleague): colleague
+        for colleague in payload.targeted_colleagues
+    }
+    target_ids = (
+        dict(
+            db.execute(
+                select(models.User.email_normalized, models.User.id).where(
+                    models.User.email_normalized.in_(targets)
+                )
+            )
+            .tuples()
+            .all()
         )
+        if targets
+        else {}
+    )
+    for colleague in payload.targeted_colleagues:
         swap_request.targets.append(
             models.SwapTarget(
                 colleague_name=colleague,
-                user_id=match.id if match else None,
+                user_id=target_ids.get(models.normalize_email(colleague)),
             )
         )
     db.add(swap_request)
-    db.commit()
-    db.refresh(swap_request)
-    return swap_request
-
-
-def list_swap_requests(
-    db: Session,
-    *,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    status: Optional[str] = None,
-    user_id: Optional[int] = None,
-) -> List[models.SwapRequest]:
-    stmt = select(models.SwapRequest).join(models.Event)
-    if start_date:
-        stmt = stmt.where(models.Event.date >= start_date)
-    if end_date:
-        stmt = stmt.where(models.Event.date <= end_date)
-    if status:
-        stmt = stmt.where(models.SwapRequest.status == status)
-    if user_id is not None:
-        stmt = stmt.where(models.Event.user_id == user_id)
-    stmt = stmt.order_by(
-        models.Event.date.asc(), models.Event.start_time.asc(), models.SwapRequest.id.asc()
-    )
-    return list(db.scalars(stmt).unique().all())
-
-
-def list_inbox_swap_requests(db: Session, user_id: int) -> List[models.SwapRequest]:
-    user = (
-        db.query(models.User)
-        .options(joinedload(models.User.group_memberships))
-        .filter(models.User.id == user_id)
-        .first()
-    )
-    if not user:
-        return []
-    user_groups = {membership.group_id for membership in user.group_memberships}
-    responded_ids = {
-        response.swap_request_id
-        for response in db.query(models.SwapRequestResponse)
-        .filter(models.SwapRequestResponse.user_id == user_id)
-    }
-    requests = (
-        db.query(models.SwapRequest)
-        .join(models.Event)
-        .options(
-            joinedload(models.SwapRequest.user).joinedload(
-                models.User.group_memberships
-            ),
-            joinedload(models.SwapRequest.targets),
-            joinedload(models.SwapRequest.event),
-            joinedload(models.SwapRequest.accepted_by),
-        )
-        .filter(models.SwapRequest.status == schemas.SwapStatus.pending.value)
-        .filter(models.SwapRequest.user_id != user_id)
-        .order_by(models.Event.date.asc(), models.Event.start_time.asc())
-        .all()
-    )
-    inbox: List[models.SwapRequest] = []
-    for swap in requests:
-        if swap.id in responded_ids:
-            continue
-        owner = swap.user
-        if not owner:
-            continue
-        owner_groups = {membership.group_id for membership in owner.group_memberships}
-        target_match = any(
-            target.user_id == user_id for target in swap.targets if target.user_id
-        )
-        shared_worksite = (
-            user.primary_hospital
-            and owner.primary_hospital
-            and user.primary_hospital == owner.primary_hospital
-        )
-        shared_group = bool(user_groups & owner_groups)
-        if target_match or shared_worksite or shared_group:
-            inbox.append(swap)
-    existing_ids = {swap.id for swap in inbox}
-    owner_notifications = (
-        db.query(models.SwapRequest)
-        .join(models.Event)
-        .options(
-            joinedload(models.SwapRequest.user),
-            joinedload(models.SwapRequest.event),
-            joinedload(models.SwapRequest.accepted_by),
-        )
-        .filter(models.SwapRequest.user_id == user_id)
-        .filter(models.SwapRequest.status == schemas.SwapStatus.fulfilled.value)
-        .order_by(models.Event.date.asc(), models.Event.start_time.asc())
-        .all()
+    db.flush()
+    realtime.emit(
+        db,
+        _swap_audience(db, swap_request, owner),
+        "swap_request.created",
+        swap_request,
     )
-    for swap in owner_notifications:
-        if swap.id in existing_ids:
-            continue
-        inbox.append(swap)
-    return inbox
+    return swap_request
 
 
 def get_swap_request(db: Session, request_id: int) -> Optional[models.SwapRequest]:
@@ -219,11 +178,55 @@ def retract_swap_request(db: Session, request_id: int) -> Optional[models.SwapRe
         .execution_options(synchronize_session="fetch")
     )
     db.execute(stmt)
-    db.commit()
-    db.refresh(swap)
+    owner = get_user_identity(db, swap.user_id)
+    if owner:
+        realtime.emit(
+            db,
+            _swap_audience(db, swap, owner),
+            "swap_request.retracted",
+            swap,
+        )
     return swap
 
 
+def expire_stale_swap_requests(
+    db: Session, *, batch_size: int = 500, today: Optional[date] = None
+) -> int:
+    today = today or date.today()
+    expired = 0
+    while True:
+        stale_ids = (
+            select(models.SwapRequest.id)
+            .join(models.Event, models.Event.id == models.SwapRequest.event_id)
+            .where(models.SwapRequest.status == schemas.SwapStatus.pending.value)
+            .where(models.Event.date < today)
+            .limit(batch_size)
+        )
+        batch = db.scalars(
+            update(models.SwapRequest)
+            .where(models.SwapRequest.id.in_(stale_ids))
+            .where(models.SwapRequest.status == schemas.SwapStatus.pending.value)
+            .values(
+                status=schemas.SwapStatus.expired.value,
+                updated_at=datetime.utcnow(),
+            )
+            .returning(models.SwapRequest.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if batch:
+            db.execute(
+                delete(models.SwapRequestResponse)
+                .where(models.SwapRequestResponse.swap_request_id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+        # A background job rather than a request: commit each batch so locks
+        # are held briefly and progress survives an interruption.
+        db.commit()
+        expired += len(batch)
+        if len(batch) < batch_size:
+            return expired
+
+
 def accept_swap_request_for_user(
     db: Session, request_id: int, user_id: int
 ) -> Optional[models.SwapRequest]:
@@ -240,11 +243,18 @@ def accept_swap_request_for_user(
     # Transfer the event to the accepting user so it is no longer swappable
     # by the original owner.
     if swap.event:
+        realtime.emit_calendar(
+            db, [swap.event.user_id, user_id], swap.event.id, [swap.event.date]
+        )
         swap.event.user_id = user_id
     _record_response(db, request_id, user_id, "accepted")
     _expire_other_targets(db, swap, user_id)
-    db.commit()
-    db.refresh(swap)
+    owner = get_user_identity(db, swap.user_id)
+    if owner:
+        recipients = _swap_audience(db, swap, owner)
+        recipients.add(swap.user_id)
+        realtime.emit(db, recipients, "swap_request.accepted", swap)
+    db.flush()
     return swap
 
 
@@ -259,7 +269,8 @@ def decline_swap_request_for_user(
     if swap.user_id == user_id:
         raise ValueError("CANNOT_DECLINE_OWN")
     _record_response(db, request_id, user_id, "declined")
-    db.commit()
+    realtime.emit(db, [user_id], "swap_request.declined", swap)
+    db.flush()
     return swap
 
 
@@ -297,38 +308,478 @@ def _expire_other_targets(
             _record_response(db, swap.id, target.user_id, "expired")
 
 
-def list_colleagues(db: Session) -> List[models.Colleague]:
-    stmt = select(models.Colleague).order_by(models.Colleague.name.asc())
-    return list(db.scalars(stmt).all())
+class SwapCandidate(NamedTuple):
+    event: models.Event
+    owner_name: str
+    days_from_original: int
+    colleague_available: bool
+
+
+def list_swap_candidates(
+    db: Session, request_id: int, *, limit: int = 20
+) -> Optional[List[SwapCandidate]]:
+    swap = get_swap_request(db, request_id)
+    if not swap:
+        return None
+    if swap.mode != schemas.SwapMode.swap.value:
+        raise ValueError("NOT_A_SWAP")
+    event = swap.event
+    owner = get_user_identity(db, swap.user_id)
+    if not event or not owner:
+        return []
+    range_start, range_end = swap_matching.request_date_range(
+        event.date, swap.available_start_date, swap.available_end_date
+    )
+    colleague_ids = _colleague_user_ids(db, owner)
+    colleague_ids.update(
+        target.user_id
+        for target in swap.targets
+        if target.user_id and target.user_id != owner.id
+    )
+    if not colleague_ids:
+        return []
+
+    rows = db.execute(
+        select(models.Event, models.User.name)
+        .join(models.User, models.User.id == models.Event.user_id)
+        .where(models.Event.user_id.in_(colleague_ids))
+        .where(models.Event.date >= range_start)
+        .where(models.Event.date <= range_end)
+        .order_by(models.Event.date.asc(), models.Event.start_time.asc())
+    ).all()
+
+    # Overnight shifts on the neighbouring days can still collide.
+    busy = db.execute(
+        select(
+            models.Event.date, models.Event.start_time, models.Event.end_time
+        )
+        .where(models.Event.user_id == owner.id)
+        .where(models.Event.id != event.id)
+        .where(models.Event.date >= range_start - timedelta(days=1))
+        .where(models.Event.date <= range_end)
+    ).all()
+    owner_intervals = sorted(
+        swap_matching.shift_interval(day, start, end) for day, start, end in busy
+    )
+    owner_starts = [begin for begin, _ in owner_intervals]
+
+    original_begin, original_end = swap_matching.shift_interval(
+        event.date, event.start_time, event.end_time
+    )
+    unavailable = {
+        user_id
+        for user_id, day, start, end in db.execute(
+            select(
+                models.Event.user_id,
+                models.Event.date,
+                models.Event.start_time,
+                models.Event.end_time,
+            )
+            .where(models.Event.user_id.in_(colleague_ids))
+            .where(models.Event.date >= event.date - timedelta(days=1))
+            .where(models.Event.date <= event.date + timedelta(days=1))
+        )
+        if _intervals_overlap(
+            swap_matching.shift_interval(day, start, end),
+            (original_begin, original_end),
+        )
+    }
+
+    tokens = swap_matching.shift_type_tokens(swap.desired_shift_type)
+    candidates: List[SwapCandidate] = []
+    for candidate, owner_name in rows:
+        if not swap_matching.matches_shift_type(
+            tokens, candidate.title, candidate.event_type, candidate.start_time
+        ):
+            continue
+        if not swap_matching.fits_time_window(
+            candidate.start_time,
+            candidate.end_time,
+            swap.available_start_time,
+            swap.available_end_time,
+        ):
+            continue
+        begin, end = swap_matching.shift_interval(
+            candidate.date, candidate.start_time, candidate.end_time
+        )
+        if swap_matching.overlaps_any(owner_intervals, owner_starts, begin, end):
+            continue
+        candidates.append(
+            SwapCandidate(
+                event=candidate,
+                owner_name=owner_name,
+                days_from_original=(candidate.date - event.date).days,
+                colleague_available=candidate.user_id not in unavailable,
+            )
+        )
+    candidates.sort(
+        key=lambda item: (
+            not item.colleague_available,
+            abs(item.days_from_original),
+            item.event.date,
+            item.event.start_time,
+        )
+    )
+    return candidates[:limit]
+
+
+class SwapMatchResult(NamedTuple):
+    pending: int
+    compatible_edges: int
+    pairs: List[Tuple[int, int]]
+    cycles: List[Tuple[int, int, int]]
+
+
+def find_swap_matches(
+    db: Session,
+    *,
+    hospital: Optional[str] = None,
+    include_cycles: bool = True,
+    today: Optional[date] = None,
+) -> SwapMatchResult:
+    today = today or date.today()
+    pending_swaps = (
+        models.SwapRequest.status == schemas.SwapStatus.pending.value,
+        models.SwapRequest.mode == schemas.SwapMode.swap.value,
+    )
+    stmt = (
+        select(
+            models.SwapRequest.id,
+            models.SwapRequest.user_id,
+            models.SwapRequest.desired_shift_type,
+            models.SwapRequest.available_start_time,
+            models.SwapRequest.available_end_time,
+            models.SwapRequest.available_start_date,
+            models.SwapRequest.available_end_date,
+            models.Event.date,
+            models.Event.start_time,
+            models.Event.end_time,
+            models.Event.title,
+            models.Event.event_type,
+            models.User.hospital_id,
+        )
+        .join(models.Event, models.Event.id == models.SwapRequest.event_id)
+        .join(models.User, models.User.id == models.SwapRequest.user_id)
+        .where(*pending_swaps)
+        .where(models.Event.date >= today)
+    )
+    if hospital:
+        stmt = stmt.where(
+            models.User.hospital_id
+            == select(models.Hospital.id)
+            .where(models.Hospital.name_normalized == models.normalize_place(hospital))
+            .scalar_subquery()
+        )
+    rows = {row.id: row for row in db.execute(stmt)}
+    if not rows:
+        return SwapMatchResult(0, 0, [], [])
+
+    owner_ids = select(models.SwapRequest.user_id).where(*pending_swaps)
+    groups_by_user: Dict[int, Set[int]] = defaultdict(set)
+    for user_id, group_id in db.execute(
+        select(models.GroupMembership.user_id, models.GroupMembership.group_id)
+        .where(models.GroupMembership.user_id.in_(owner_ids))
+    ):
+        groups_by_user[user_id].add(group_id)
+
+    ranges = {
+        request_id: swap_matching.request_date_range(
+            row.date, row.available_start_date, row.available_end_date
+        )
+        for request_id, row in rows.items()
+    }
+    earliest = min(start for start, _ in ranges.values())
+    latest = max(end for _, end in ranges.values())
+    calendars: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for user_id, day, start, end in db.execute(
+        select(
+            models.Event.user_id,
+            models.Event.date,
+            models.Event.start_time,
+            models.Event.end_time,
+        )
+        .where(models.Event.user_id.in_(owner_ids))
+        .where(models.Event.date >= earliest - timedelta(days=1))
+        .where(models.Event.date <= latest)
+    ):
+        calendars[user_id].append(swap_matching.shift_interval(day, start, end))
+    for intervals in calendars.values():
+        intervals.sort()
+    calendar_starts = {
+        user_id: [begin for begin, _ in intervals]
+        for user_id, intervals in calendars.items()
+    }
+
+    # Index requests by scope and event day, grouping identical shifts, so
+    # each request evaluates its constraints once per (day, shift shape)
+    # inside its acceptable date range rather than once per other request.
+    scopes: Dict[int, List[tuple]] = {}
+    index: Dict[tuple, Dict[int, Dict[tuple, List[int]]]] = defaultdict(
+        lambda: defaultdict(lambda: defaultdict(list))
+    )
+    for request_id, row in rows.items():
+        request_scopes = [
+            ("group", group_id) for group_id in groups_by_user[row.user_id]
+        ]
+        if row.hospital_id is not None:
+            request_scopes.append(("hospital", row.hospital_id))
+        scopes[request_id] = request_scopes
+        shape = (row.title, row.event_type, row.start_time, row.end_time)
+        for scope in request_scopes:
+            index[scope][row.date.toordinal()][shape].append(request_id)
+    scope_days = {scope: sorted(days) for scope, days in index.items()}
+    requests_by_owner: Dict[int, Set[int]] = defaultdict(set)
+    for request_id, row in rows.items():
+        requests_by_owner[row.user_id].add(request_id)
+
+    out_edges: Dict[int, Set[int]] = {}
+    for request_id, row in rows.items():
+        tokens = swap_matching.shift_type_tokens(row.desired_shift_type)
+        range_start, range_end = ranges[request_id]
+        own_shift = swap_matching.shift_interval(
+            row.date, row.start_time, row.end_time
+        )
+        intervals = calendars.get(row.user_id, [])
+        starts = calendar_starts.get(row.user_id, [])
+        fits: Dict[tuple, bool] = {}
+        wanted: Set[int] = set()
+        for scope in scopes[request_id]:
+            days = scope_days[scope]
+            low = bisect_left(days, range_start.toordinal())
+            high = bisect_right(days, range_end.toordinal())
+            for day in days[low:high]:
+                for shape, other_ids in index[scope][day].items():
+                    title, event_type, start, end = shape
+                    if shape not in fits:
+                        fits[shape] = swap_matching.matches_shift_type(
+                            tokens, title, event_type, start
+                        ) and swap_matching.fits_time_window(
+                            start,
+                            end,
+                            row.available_start_time,
+                            row.available_end_time,
+                        )
+                    if not fits[shape]:
+                        continue
+                    begin, finish = swap_matching.shift_interval(
+                        date.fromordinal(day), start, end
+                    )
+                    if swap_matching.overlaps_any(
+                        intervals, starts, begin, finish, ignore=own_shift
+                    ):
+                        continue
+                    wanted.update(other_ids)
+        wanted -= requests_by_owner[row.user_id]
+        if wanted:
+            out_edges[request_id] = wanted
+
+    mutual: Dict[int, Set[int]] = {}
+    edge_count = 0
+    for request_id, wanted in out_edges.items():
+        edge_count += len(wanted)
+        reciprocal = {
+            other_id for other_id in wanted if request_id in out_edges.get(other_id, ())
+        }
+        if reciprocal:
+            mutual[request_id] = reciprocal
+    matching = swap_matching.maximum_matching(mutual)
+    pairs = sorted(
+        (request_id, partner)
+        for request_id, partner in matching.items()
+        if request_id < partner
+    )
+    cycles: List[Tuple[int, int, int]] = []
+    if include_cycles:
+        cycles = swap_matching.find_three_cycles(
+            out_edges,
+            (request_id for request_id in out_edges if request_id not in matching),
+            {request_id: row.user_id for request_id, row in rows.items()},
+        )
+    return SwapMatchResult(len(rows), edge_count, pairs, cycles)
+
+
+def _colleague_user_ids(db: Session, user: UserIdentity) -> Set[int]:
+    shared_groups = select(models.GroupMembership.group_id).where(
+        models.GroupMembership.user_id == user.id
+    )
+    stmt = select(models.GroupMembership.user_id).where(
+        models.GroupMembership.group_id.in_(shared_groups)
+    )
+    if user.hospital_id is not None:
+        stmt = stmt.union(
+            select(models.User.id).where(models.User.hospital_id == user.hospital_id)
+        )
+    user_ids = set(db.scalars(stmt).all())
+    user_ids.discard(user.id)
+    return user_ids
+
+
+def _swap_audience(
+    db: Session, swap: models.SwapRequest, owner: UserIdentity
+) -> Set[int]:
+    audience = _colleague_user_ids(db, owner)
+    audience.update(target.user_id for target in swap.targets if target.user_id)
+    audience.discard(owner.id)
+    return audience
+
+
+def _intervals_overlap(first: tuple[int, int], second: tuple[int, int]) -> bool:
+    return first[0] < second[1] and second[0] < first[1]
+
+
+class ColleaguePage(NamedTuple):
+    items: List[models.Colleague]
+    next_cursor: Optional[str]
+
+
+# Per-owner typeahead indexes, used while the pg_trgm index on
+# colleagues.search_text is missing; rebuilt from search_text when they expire.
+_colleague_indexes: cache.TTLCache[search.NgramIndex] = cache.TTLCache(
+    settings.colleague_search_cache_ttl_seconds,
+    settings.colleague_search_cache_size,
+    name="colleague_indexes",
+)
+# Set by the startup schema patches once ix_colleagues_search_text_trgm exists.
+_colleague_trigram_index = False
+
+
+def set_colleague_trigram_index(available: bool) -> None:
+    """Record whether ``q=`` can be served by the pg_trgm index."""
+    global _colleague_trigram_index
+    _colleague_trigram_index = available
+
+
+def list_colleagues(
+    db: Session,
+    *,
+    user_id: Optional[int] = None,
+    query: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> ColleaguePage:
+    owner_id = _resolve_colleague_owner(db, user_id)
+    after = _decode_cursor(cursor) if cursor else None
+    words = models.search_words(query) if query else []
+    if words and not _colleague_trigram_index:
+        keys = _colleague_index(db, owner_id).search(
+            query, after=after, limit=limit + 1
+        )
+        colleagues = {
+            colleague.id: colleague
+            for colleague in db.scalars(
+                select(models.Colleague).where(
+                    models.Colleague.id.in_([key[1] for key in keys[:limit]])
+                )
+            )
+        }
+        items = [colleagues[key[1]] for key in keys[:limit] if key[1] in colleagues]
+        next_key = keys[limit - 1] if len(keys) > limit else None
+        return ColleaguePage(items, _encode_cursor(next_key) if next_key else None)
+
+    stmt = select(models.Colleague).where(models.Colleague.user_id == owner_id)
+    for word in words:
+        # Words are \w runs, so "_" is the only LIKE wildcard to escape. Served
+        # by the pg_trgm GIN index on search_text.
+        pattern = word.replace("_", "\\_")
+        stmt = stmt.where(
+            models.Colleague.search_text.like(f"% {pattern}%", escape="\\")
+        )
+    if after:
+        stmt = stmt.where(
+            tuple_(models.Colleague.name, models.Colleague.id) > tuple_(*after)
+        )
+    stmt = stmt.order_by(models.Colleague.name.asc(), models.Colleague.id.asc())
+    rows = list(db.scalars(stmt.limit(limit + 1)).all())
+    items = rows[:limit]
+    next_cursor = (
+        _encode_cursor((items[-1].name, items[-1].id)) if len(rows) > limit else None
+    )
+    return ColleaguePage(items, next_cursor)
+
+
+def _resolve_colleague_owner(db: Session, user_id: Optional[int]) -> int:
+    if user_id is None:
+        return _get_or_create_default_user(db).id
+    if get_user_identity(db, user_id) is None:
+        raise ValueError("USER_NOT_FOUND")
+    return user_id
+
+
+def _colleague_index(db: Session, owner_id: int) -> search.NgramIndex:
+    index = _colleague_indexes.get(owner_id)
+    if index is None:
+        rows = db.execute(
+            select(
+                models.Colleague.id,
+                models.Colleague.name,
+                models.Colleague.search_text,
+            ).where(models.Colleague.user_id == owner_id)
+        )
+        index = search.NgramIndex(rows.tuples())
+        _colleague_indexes.set(owner_id, index)
+    return index
+
+
+def _encode_cursor(key: Tuple[str, int]) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, colleague_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("INVALID_CURSOR")
+    if not isinstance(name, str) or not isinstance(colleague_id, int):
+        raise ValueError("INVALID_CURSOR")
+    return name, colleague_id
 
 
 def create_colleague(
     db: Session, payload: schemas.ColleagueCreate
 ) -> models.Colleague:
-    owner = _get_or_create_default_user(db)
+    data = payload.model_dump()
+    owner_id = _resolve_colleague_owner(db, data.pop("user_id", None))
     invitation_message = (
         f"Hi {payload.name}, I'm using NurseShift to coordinate swaps. "
         "Can I add you as a colleague so we can exchange coverage more easily?"
     )
     colleague = models.Colleague(
-        **payload.model_dump(),
+        **data,
         invitation_message=invitation_message,
         status="invited",
-        user_id=owner.id,
+        user_id=owner_id,
     )
     db.add(colleague)
-    db.commit()
-    db.refresh(colleague)
+    db.flush()
+    after_commit(
+        db,
+        partial(
+            _index_new_colleague,
+            owner_id,
+            colleague.id,
+            colleague.name,
+            colleague.search_text,
+        ),
+    )
     return colleague
 
 
+def _index_new_colleague(
+    owner_id: int, colleague_id: int, name: str, text: Optional[str]
+) -> None:
+    index = _colleague_indexes.get(owner_id)
+    if index is not None:
+        index.add(colleague_id, name, text)
+
+
 def accept_colleague(db: Session, colleague_id: int) -> Optional[models.Colleague]:
     colleague = db.get(models.Colleague, colleague_id)
     if not colleague:
         return None
     colleague.status = "accepted"
-    db.commit()
-    db.refresh(colleague)
+    db.flush()
     return colleague
 
 
@@ -350,21 +801,27 @@ def create_worksite(db: Session, payload: schemas.WorksiteCreate) -> models.Work
         .filter(models.Worksite.user_id == payload.user_id)
         .first()
     )
+    hospital_id = _ensure_hospital(db, payload.hospital_name)
+    department_id = _ensure_department(db, hospital_id, payload.department_name)
     if worksite:
         worksite.hospital_name = payload.hospital_name
         worksite.department_name = payload.department_name
         worksite.position_name = payload.position_name
+        worksite.hospital_id = hospital_id
+        worksite.department_id = department_id
     else:
         worksite = models.Worksite(
             user_id=payload.user_id,
             hospital_name=payload.hospital_name,
             department_name=payload.department_name,
             position_name=payload.position_name,
+            hospital_id=hospital_id,
+            department_id=department_id,
         )
         db.add(worksite)
-    db.commit()
-    db.refresh(worksite)
-    _sync_user_primary_worksite(db, payload.user_id)
+    _apply_primary_worksite(user, worksite)
+    db.flush()
+    forget_user_identity(db, user.id)
     return worksite
 
 
@@ -374,8 +831,15 @@ def delete_worksite(db: Session, worksite_id: int) -> bool:
         return False
     user_id = worksite.user_id
     db.delete(worksite)
-    db.commit()
-    _sync_user_primary_worksite(db, user_id)
+    db.flush()
+    user = db.get(models.User, user_id)
+    if user:
+        remaining = db.scalars(
+            select(models.Worksite).where(models.Worksite.user_id == user_id).limit(1)
+        ).first()
+        _apply_primary_worksite(user, remaining)
+        forget_user_identity(db, user_id)
+    db.flush()
     return True
 
 
@@ -385,42 +849,91 @@ def update_user_avatar(
     user = db.get(models.User, user_id)
     if not user:
         return None
-    user.avatar_url = avatar_data
-    db.commit()
-    db.refresh(user)
+    user.avatar_hash = (
+        avatars.store(avatars.decode(avatar_data)) if avatar_data else None
+    )
+    user.legacy_avatar_data = None
+    db.flush()
+    db.expire(user, ["legacy_avatar_fallback"])
     return user
 
 
-def _sync_user_primary_worksite(db: Session, user_id: int) -> None:
-    user = db.get(models.User, user_id)
-    if not user:
-        return
-    stmt = (
-        select(models.Worksite)
-        .where(models.Worksite.user_id == user_id)
-        .limit(1)
-    )
-    worksite = db.scalars(stmt).first()
+def _apply_primary_worksite(
+    user: models.User, worksite: Optional[models.Worksite]
+) -> None:
     if worksite:
+        user.hospital_id = worksite.hospital_id
+        user.department_id = worksite.department_id
         user.primary_hospital = worksite.hospital_name
         user.primary_department = worksite.department_name
         user.primary_position = worksite.position_name
     else:
+        user.hospital_id = None
+        user.department_id = None
         user.primary_hospital = None
         user.primary_department = None
         user.primary_position = None
-    db.commit()
 
 
-def list_groups(db: Session) -> List[models.Group]:
-    stmt = (
-        select(models.Group)
-        .options(
+def _ensure_hospital(db: Session, name: str) -> int:
+    key = models.normalize_place(name)
+    if not key:
+        raise ValueError("INVALID_HOSPITAL")
+    return _ensure_reference(
+        db,
+        models.Hospital,
+        {"name": name.strip(), "name_normalized": key},
+        ["name_normalized"],
+    )
+
+
+def _ensure_department(db: Session, hospital_id: int, name: str) -> int:
+    key = models.normalize_place(name)
+    if not key:
+        raise ValueError("INVALID_DEPARTMENT")
+    return _ensure_reference(
+        db,
+        models.Department,
+        {"hospital_id": hospital_id, "name": name.strip(), "name_normalized": key},
+        ["hospital_id", "name_normalized"],
+    )
+
+
+def _ensure_reference(db: Session, model, values: dict, keys: List[str]) -> int:
+    # The first spelling seen becomes the display name; concurrent writers of
+    # the same key fall through the conflict and read the winner's id.
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    inserted = db.scalar(
+        insert(model)
+        .values(**values, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=keys)
+        .returning(model.id)
+    )
+    if inserted is not None:
+        return inserted
+    return db.scalar(
+        select(model.id).where(
+            *(getattr(model, key) == values[key] for key in keys)
+        )
+    )
+
+
+def list_groups(
+    db: Session, relations: Collection[str] = ("invites", "shared_calendar")
+) -> List[models.Group]:
+    options = []
+    if "shared_calendar" in relations:
+        options += [
             joinedload(models.Group.memberships)
             .joinedload(models.GroupMembership.user),
             joinedload(models.Group.memberships).joinedload(models.GroupMembership.share),
-            joinedload(models.Group.invites),
-        )
+        ]
+    if "invites" in relations:
+        options.append(joinedload(models.Group.invites))
+    stmt = (
+        select(models.Group)
+        .options(*options)
         .order_by(models.Group.created_at.desc())
     )
     return list(db.scalars(stmt).unique().all())
@@ -441,10 +954,10 @@ def create_group(db: Session, payload: schemas.GroupCreate) -> models.Group:
         shared_calendar="[]",
     )
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    db.flush()
     user = _get_or_create_default_user(db)
     _get_or_create_membership(db, group.id, user.id)
+    db.refresh(group)
     return group
 
 
@@ -453,7 +966,8 @@ def delete_group(db: Session, group_id: int) -> bool:
     if not group:
         return False
     db.delete(group)
-    db.commit()
+    db.flush()
+    after_commit(db, partial(_forget_group_invite_links, group_id))
     return True
 
 
@@ -463,7 +977,7 @@ def add_group_invite(
     group = get_group(db, group_id)
     if not group:
         return None
-    email = (payload.invitee_email or "").strip().lower()
+    email = models.normalize_email(payload.invitee_email or "")
     if not email:
         raise ValueError("INVITE_EMAIL_REQUIRED")
     token = secrets.token_urlsafe(20)
@@ -476,29 +990,246 @@ def add_group_invite(
     )
     match = (
         db.query(models.User)
-        .filter(func.lower(models.User.email) == email)
+        .filter(models.User.email_normalized == email)
         .first()
     )
     if not match:
         match = (
             db.query(models.User)
             .filter(
-                func.lower(models.User.name) == payload.invitee_name.strip().lower()
+                models.User.name_normalized
+                == models.normalize_name(payload.invitee_name)
             )
             .first()
         )
     if match:
         invite.invitee_user_id = match.id
     db.add(invite)
-    db.commit()
+    db.flush()
     db.refresh(group)
     return group
 
 
+MAX_BULK_INVITES = 5000
+_BULK_INSERT_CHUNK = 1000
+_INVITE_TOKEN_BYTES = 20
+
+
+def bulk_add_group_invites(
+    db: Session,
+    group_id: int,
+    roster: List[Optional[schemas.GroupInviteRosterRow]],
+) -> Optional[schemas.GroupInviteBulkReport]:
+    if not db.scalar(select(models.Group.id).where(models.Group.id == group_id)):
+        return None
+    if len(roster) > MAX_BULK_INVITES:
+        raise ValueError("ROSTER_TOO_LARGE")
+    Status = schemas.GroupInviteBulkStatus
+    results: List[Optional[schemas.GroupInviteBulkResult]] = [None] * len(roster)
+    pending: Dict[str, Tuple[int, str]] = {}
+    for index, row in enumerate(roster):
+        email = models.normalize_email(row.invitee_email or "") if row else ""
+        name = row.invitee_name.strip() if row else ""
+        reason = None
+        if row is None:
+            reason = "INVALID_ROW"
+        elif not email or "@" not in email:
+            reason = "INVITE_EMAIL_REQUIRED"
+        elif not name:
+            reason = "INVITE_NAME_REQUIRED"
+        elif email in pending:
+            results[index] = schemas.GroupInviteBulkResult(
+                row=index, status=Status.duplicate
+            )
+            continue
+        if reason:
+            results[index] = schemas.GroupInviteBulkResult(
+                row=index, status=Status.invalid, reason=reason
+            )
+            continue
+        pending[email] = (index, name)
+
+    # Resolve the whole roster with a handful of set-based queries: existing
+    # invites, users by (lowercased, indexed) email, then by name for the rest.
+    already_invited: Set[str] = set()
+    for chunk in _chunked(list(pending), _BULK_INSERT_CHUNK):
+        already_invited.update(
+            db.scalars(
+                select(models.GroupInvite.invitee_email).where(
+                    models.GroupInvite.group_id == group_id,
+                    models.GroupInvite.invitee_email.in_(chunk),
+                )
+            )
+        )
+    users_by_email: Dict[str, int] = {}
+    for chunk in _chunked(list(pending), _BULK_INSERT_CHUNK):
+        users_by_email.update(
+            db.execute(
+                select(models.User.email_normalized, models.User.id).where(
+                    models.User.email_normalized.in_(chunk)
+                )
+            ).tuples().all()
+        )
+    unmatched_names = {
+        models.normalize_name(name)
+        for email, (_, name) in pending.items()
+        if email not in users_by_email
+    }
+    users_by_name: Dict[str, int] = {}
+    for chunk in _chunked(sorted(unmatched_names), _BULK_INSERT_CHUNK):
+        for normalized, user_id in db.execute(
+            select(models.User.name_normalized, models.User.id)
+            .where(models.User.name_normalized.in_(chunk))
+            .order_by(models.User.id.desc())
+        ):
+            users_by_name[normalized] = user_id
+    members = set(
+        db.scalars(
+            select(models.GroupMembership.user_id).where(
+                models.GroupMembership.group_id == group_id
+            )
+        )
+    )
+
+    new_rows = []
+    for email, (index, name) in pending.items():
+        user_id = users_by_email.get(email) or users_by_name.get(
+            models.normalize_name(name)
+        )
+        if email in already_invited:
+            status = Status.already_invited
+        elif user_id is not None and user_id in members:
+            status = Status.already_member
+        else:
+            new_rows.append((index, name, email, user_id))
+            continue
+        results[index] = schemas.GroupInviteBulkResult(
+            row=index, status=status, invitee_user_id=user_id
+        )
+
+    tokens = _bulk_invite_tokens(len(new_rows))
+    for chunk in _chunked(list(zip(new_rows, tokens)), _BULK_INSERT_CHUNK):
+        inserted = db.execute(
+            insert(models.GroupInvite).returning(
+                models.GroupInvite.id, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    "group_id": group_id,
+                    "invitee_name": name,
+                    "invitee_email": email,
+                    "invitee_user_id": user_id,
+                    "token": token,
+                    "status": schemas.GroupInviteStatus.invited.value,
+                    "created_at": datetime.utcnow(),
+                }
+                for (_, name, email, user_id), token in chunk
+            ],
+        ).scalars()
+        for ((index, _, _, user_id), _), invite_id in zip(chunk, inserted):
+            results[index] = schemas.GroupInviteBulkResult(
+                row=index,
+                status=Status.invited,
+                invite_id=invite_id,
+                invitee_user_id=user_id,
+            )
+
+    invited = len(new_rows)
+    failed = sum(1 for result in results if result.status == Status.invalid)
+    return schemas.GroupInviteBulkReport(
+        group_id=group_id,
+        invited=invited,
+        skipped=len(results) - invited - failed,
+        failed=failed,
+        rows=results,
+    )
+
+
+def _bulk_invite_tokens(count: int) -> List[str]:
+    # One read from the OS CSPRNG, sliced into per-invite tokens equivalent to
+    # secrets.token_urlsafe(_INVITE_TOKEN_BYTES).
+    raw = secrets.token_bytes(_INVITE_TOKEN_BYTES * count)
+    return [
+        base64.urlsafe_b64encode(raw[offset : offset + _INVITE_TOKEN_BYTES])
+        .rstrip(b"=")
+        .decode("ascii")
+        for offset in range(0, len(raw), _INVITE_TOKEN_BYTES)
+    ]
+
+
+def _chunked(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
 def _hash_invite_token(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
+class InviteLinkState(NamedTuple):
+    id: int
+    group_id: int
+    group_name: str
+    expires_at: datetime
+    max_uses: int
+    use_count: int
+    member_count: int
+
+
+# Resolved links are short-lived because use_count moves on every redeem;
+# NOT_FOUND/EXPIRED/REVOKED never become valid again, so junk tokens from
+# link unfurlers can be remembered for longer.
+_invite_links: cache.TTLCache[InviteLinkState] = cache.TTLCache(
+    settings.invite_cache_ttl_seconds, settings.invite_cache_size, name="invite_links"
+)
+_invalid_invite_links: cache.TTLCache[str] = cache.TTLCache(
+    settings.invite_negative_cache_ttl_seconds,
+    settings.invite_negative_cache_size,
+    name="invalid_invite_links",
+)
+
+
+def _resolve_invite_link(
+    db: Session, token_hash: str
+) -> tuple[Optional[InviteLinkState], Optional[str]]:
+    reason = _invalid_invite_links.get(token_hash)
+    if reason:
+        return None, reason
+    state = _invite_links.get(token_hash)
+    if state is None:
+        row = db.execute(
+            select(
+                models.GroupInviteLink.id,
+                models.GroupInviteLink.group_id,
+                models.Group.name,
+                models.GroupInviteLink.expires_at,
+                models.GroupInviteLink.max_uses,
+                models.GroupInviteLink.use_count,
+                models.Group.member_count,
+                models.GroupInviteLink.revoked_at,
+            )
+            .join(models.Group, models.Group.id == models.GroupInviteLink.group_id)
+            .where(models.GroupInviteLink.token_hash == token_hash)
+        ).first()
+        if row is None:
+            _invalid_invite_links.set(token_hash, "NOT_FOUND")
+            return None, "NOT_FOUND"
+        if row.revoked_at is not None:
+            _invalid_invite_links.set(token_hash, "REVOKED")
+            return None, "REVOKED"
+        state = InviteLinkState(*row[:7])
+        _invite_links.set(token_hash, state)
+    if state.expires_at <= datetime.utcnow():
+        _invite_links.pop(token_hash)
+        _invalid_invite_links.set(token_hash, "EXPIRED")
+        return None, "EXPIRED"
+    return state, None
+
+
+def _forget_invite_link(token_hash: str) -> None:
+    _invite_links.pop(token_hash)
+
+
 def create_group_invite_link(
     db: Session, group_id: int, payload: schemas.GroupInviteLinkCreate
 ) -> Optional[tuple[models.GroupInviteLink, str]]:
@@ -516,54 +1247,115 @@ def create_group_invite_link(
         max_uses=payload.max_uses,
     )
     db.add(invite)
-    db.commit()
-    db.refresh(invite)
+    db.flush()
     return invite, token
 
 
 def get_invite_link_preview(
     db: Session, token: str
-) -> tuple[Optional[models.GroupInviteLink], Optional[str]]:
-    token_hash = _hash_invite_token(token)
-    invite = (
-        db.query(models.GroupInviteLink)
-        .filter(models.GroupInviteLink.token_hash == token_hash)
-        .first()
-    )
+) -> tuple[Optional[InviteLinkState], Optional[str]]:
+    invite, reason = _resolve_invite_link(db, _hash_invite_token(token))
     if not invite:
-        return None, "NOT_FOUND"
-    if invite.revoked_at is not None:
-        return None, "REVOKED"
-    if invite.expires_at <= datetime.utcnow():
-        return None, "EXPIRED"
+        return None, reason
     if invite.use_count >= invite.max_uses:
         return None, "NO_USES_LEFT"
     return invite, None
 
 
 def redeem_invite_link(
-    db: Session, token: str, user_id: str
+    db: Session, token: str, user_id: int
 ) -> tuple[Optional[str], Optional[int], Optional[str]]:
-    invite, reason = get_invite_link_preview(db, token)
-    if not invite:
-        return None, None, reason
-    user = db.get(models.User, int(user_id))
-    if not user:
-        return None, None, "USER_NOT_FOUND"
-    membership = (
-        db.query(models.GroupMembership)
-        .filter(
-            models.GroupMembership.group_id == invite.group_id,
-            models.GroupMembership.user_id == user.id,
+    token_hash = _hash_invite_token(token)
+    user = get_user_identity(db, user_id)
+    # Claiming a use and checking validity is one statement, so concurrent
+    # redeems serialize on the link row and can never overshoot max_uses.
+    group_id = db.scalar(
+        update(models.GroupInviteLink)
+        .where(
+            models.GroupInviteLink.token_hash == token_hash,
+            models.GroupInviteLink.revoked_at.is_(None),
+            models.GroupInviteLink.expires_at > datetime.utcnow(),
+            models.GroupInviteLink.use_count < models.GroupInviteLink.max_uses,
         )
-        .first()
+        .values(use_count=models.GroupInviteLink.use_count + 1)
+        .returning(models.GroupInviteLink.group_id)
+        .execution_options(synchronize_session=False)
     )
-    if membership:
-        return "ALREADY_MEMBER", invite.group_id, None
-    db.add(models.GroupMembership(group_id=invite.group_id, user_id=user.id))
-    invite.use_count += 1
-    db.commit()
-    return "JOINED", invite.group_id, None
+    if group_id is None:
+        _forget_invite_link(token_hash)
+        invite, reason = get_invite_link_preview(db, token)
+        return None, None, reason or "NO_USES_LEFT"
+    if not user or not _insert_membership(db, group_id, user.id):
+        # Give the claimed use back; the row is still locked by the claim, so
+        # this cannot race another redeem.
+        db.execute(
+            update(models.GroupInviteLink)
+            .where(models.GroupInviteLink.token_hash == token_hash)
+            .values(use_count=models.GroupInviteLink.use_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        if not user:
+            return None, None, "USER_NOT_FOUND"
+        return "ALREADY_MEMBER", group_id, None
+    after_commit(db, partial(_forget_invite_link, token_hash))
+    return "JOINED", group_id, None
+
+
+def _insert_membership(db: Session, group_id: int, user_id: int) -> bool:
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    inserted = db.scalar(
+        insert(models.GroupMembership)
+        .values(group_id=group_id, user_id=user_id, joined_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["group_id", "user_id"])
+        .returning(models.GroupMembership.id)
+    )
+    if inserted is None:
+        return False
+    _adjust_group_counters(db, group_id, members=1)
+    return True
+
+
+def _adjust_group_counters(
+    db: Session, group_id: int, *, members: int = 0, sharing: int = 0
+) -> None:
+    # Relative updates keep concurrent joins from overwriting each other.
+    db.execute(
+        update(models.Group)
+        .where(models.Group.id == group_id)
+        .values(
+            member_count=models.Group.member_count + members,
+            sharing_count=models.Group.sharing_count + sharing,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_group_counters(db: Session) -> int:
+    members = (
+        select(func.count(models.GroupMembership.id))
+        .where(models.GroupMembership.group_id == models.Group.id)
+        .scalar_subquery()
+    )
+    sharing = (
+        select(func.count(models.GroupShare.id))
+        .join(
+            models.GroupMembership,
+            models.GroupMembership.id == models.GroupShare.membership_id,
+        )
+        .where(models.GroupMembership.group_id == models.Group.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(models.Group)
+        .where(
+            (models.Group.member_count != members)
+            | (models.Group.sharing_count != sharing)
+        )
+        .values(member_count=members, sharing_count=sharing)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
 
 
 def revoke_invite_link(db: Session, token: str) -> bool:
@@ -576,34 +1368,36 @@ def revoke_invite_link(db: Session, token: str) -> bool:
     if not invite:
         return False
     invite.revoked_at = datetime.utcnow()
-    db.commit()
+    db.flush()
+    after_commit(db, partial(_remember_revoked_invite_link, token_hash))
     return True
 
 
+def _forget_group_invite_links(group_id: int) -> None:
+    _invite_links.discard_where(lambda state: state.group_id == group_id)
+
+
+def _remember_revoked_invite_link(token_hash: str) -> None:
+    _forget_invite_link(token_hash)
+    _invalid_invite_links.set(token_hash, "REVOKED")
+
+
 def accept_group_invite(
     db: Session, invite_id: int, user_id: int
 ) -> Optional[models.Group]:
     invite = db.get(models.GroupInvite, invite_id)
     if not invite:
         return None
-    user = db.get(models.User, user_id)
+    user = get_user_identity(db, user_id)
     if not user:
         raise ValueError("USER_NOT_FOUND")
     if invite.status == schemas.GroupInviteStatus.accepted.value:
         return invite.group
-    normalized_email = user.email.lower()
-    name_match = user.name.strip().lower()
-    if invite.invitee_email:
-        if invite.invitee_email.lower() != normalized_email and (
-            invite.invitee_user_id and invite.invitee_user_id != user.id
-        ):
-            raise ValueError("INVITE_EMAIL_MISMATCH")
-    elif invite.invitee_name.lower() != name_match:
-        raise ValueError("INVITE_EMAIL_MISMATCH")
+    _check_invitee(invite, user)
     _get_or_create_membership(db, invite.group_id, user.id)
     invite.status = schemas.GroupInviteStatus.accepted.value
     invite.invitee_user_id = user.id
-    db.commit()
+    db.flush()
     db.refresh(invite.group)
     return invite.group
 
@@ -614,23 +1408,26 @@ def decline_group_invite(
     invite = db.get(models.GroupInvite, invite_id)
     if not invite:
         return None
-    user = db.get(models.User, user_id)
+    user = get_user_identity(db, user_id)
     if not user:
         raise ValueError("USER_NOT_FOUND")
-    normalized_email = user.email.lower()
-    name_match = user.name.strip().lower()
+    _check_invitee(invite, user)
+    invite.status = schemas.GroupInviteStatus.declined.value
+    invite.invitee_user_id = user.id
+    db.flush()
+    db.refresh(invite.group)
+    return invite.group
+
+
+def _check_invitee(invite: models.GroupInvite, user: UserIdentity) -> None:
     if invite.invitee_email:
-        if invite.invitee_email.lower() != normalized_email and (
+        email = models.normalize_email(invite.invitee_email)
+        if email != models.normalize_email(user.email) and (
             invite.invitee_user_id and invite.invitee_user_id != user.id
         ):
             raise ValueError("INVITE_EMAIL_MISMATCH")
-    elif invite.invitee_name.lower() != name_match:
+    elif models.normalize_name(invite.invitee_name) != models.normalize_name(user.name):
         raise ValueError("INVITE_EMAIL_MISMATCH")
-    invite.status = schemas.GroupInviteStatus.declined.value
-    invite.invitee_user_id = user.id
-    db.commit()
-    db.refresh(invite.group)
-    return invite.group
 
 
 def accept_group_invite_by_token(
@@ -652,7 +1449,7 @@ def share_group_schedule(
     group = get_group(db, group_id)
     if not group:
         return None
-    user = db.get(models.User, payload.user_id)
+    user = get_user_identity(db, payload.user_id)
     if not user:
         return None
     membership = _get_or_create_membership(db, group_id, user.id)
@@ -667,7 +1464,8 @@ def share_group_schedule(
             end_date=payload.end_date,
         )
         db.add(share)
-    db.commit()
+        _adjust_group_counters(db, group_id, sharing=1)
+    db.flush()
     db.refresh(group)
     return group
 
@@ -687,29 +1485,38 @@ def cancel_group_share(
         return None
     if membership.share:
         db.delete(membership.share)
-        db.commit()
+        _adjust_group_counters(db, group_id, sharing=-1)
+        db.flush()
     db.refresh(membership.group)
     return membership.group
 
 
-def _hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
-
-
-def create_user(db: Session, payload: schemas.UserCreate) -> models.User:
+def create_user(
+    db: Session, payload: schemas.UserCreate, *, password_hash: Optional[str] = None
+) -> models.User:
     user = models.User(
         name=payload.name,
-        email=payload.email.lower(),
-        password_hash=_hash_password(payload.password),
+        email=models.normalize_email(payload.email),
+        password_hash=password_hash or passwords.hash_password(payload.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
 
+def update_password_hash(db: Session, user_id: int, password_hash: str) -> None:
+    db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(password_hash=password_hash)
+        .execution_options(synchronize_session=False)
+    )
+
+
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
-    stmt = select(models.User).where(models.User.email == email.lower())
+    stmt = select(models.User).where(
+        models.User.email_normalized == models.normalize_email(email)
+    )
     return db.scalars(stmt).first()
 
 
@@ -717,16 +1524,121 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[models
     user = get_user_by_email(db, email)
     if not user:
         return None
-    if user.password_hash != _hash_password(password):
+    if not passwords.verify_password(password, user.password_hash):
         return None
+    if passwords.needs_rehash(user.password_hash):
+        update_password_hash(db, user.id, passwords.hash_password(password))
     return user
 
 
-def _get_or_create_default_user(db: Session) -> models.User:
-    user = get_user_by_email(db, DEFAULT_USER_EMAIL)
-    if user:
-        return user
-    return create_user(
+def hash_session_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_user_session(db: Session, user_id: int, *, ttl_seconds: int) -> str:
+    token = secrets.token_hex(24)
+    now = datetime.utcnow()
+    db.add(
+        models.UserSession(
+            user_id=user_id,
+            token_hash=hash_session_token(token),
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl_seconds),
+            last_seen_at=now,
+        )
+    )
+    db.flush()
+    return token
+
+
+def get_active_session(db: Session, token_hash: str):
+    return db.execute(
+        select(
+            models.UserSession.user_id,
+            models.UserSession.id,
+            models.UserSession.expires_at,
+        ).where(
+            models.UserSession.token_hash == token_hash,
+            models.UserSession.revoked_at.is_(None),
+            models.UserSession.expires_at > datetime.utcnow(),
+        )
+    ).first()
+
+
+def revoke_user_sessions(
+    db: Session, *, session_id: Optional[int] = None, user_id: Optional[int] = None
+) -> List[str]:
+    stmt = update(models.UserSession).where(models.UserSession.revoked_at.is_(None))
+    if session_id is not None:
+        stmt = stmt.where(models.UserSession.id == session_id)
+    if user_id is not None:
+        stmt = stmt.where(models.UserSession.user_id == user_id)
+    revoked = db.scalars(
+        stmt.values(revoked_at=datetime.utcnow())
+        .returning(models.UserSession.token_hash)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return list(revoked)
+
+
+def touch_user_sessions(db: Session, last_seen: Dict[int, datetime]) -> None:
+    if not last_seen:
+        return
+    # ORM bulk UPDATE by primary key: one executemany for the whole batch.
+    db.execute(
+        update(models.UserSession),
+        [
+            {"id": session_id, "last_seen_at": seen_at}
+            for session_id, seen_at in last_seen.items()
+        ],
+    )
+
+
+def get_user_identity(db: Session, user_id: int) -> Optional[UserIdentity]:
+    seen: Dict[int, Optional[UserIdentity]] = transaction_cache(db, "user_identities")
+    identity = seen.get(user_id)
+    if identity is None and user_id not in seen:
+        identity = _user_identities.get(user_id)
+    if identity is None:
+        return _load_user_identity(db, models.User.id == user_id)
+    seen[user_id] = identity
+    return identity
+
+
+def get_user_identity_by_email(db: Session, email: str) -> Optional[UserIdentity]:
+    normalized = models.normalize_email(email)
+    user_id = _user_ids_by_email.get(normalized)
+    if user_id is not None:
+        return get_user_identity(db, user_id)
+    return _load_user_identity(db, models.User.email_normalized == normalized)
+
+
+def forget_user_identity(db: Session, user_id: int) -> None:
+    # Reads later in this transaction must skip the shared, now stale entry.
+    transaction_cache(db, "user_identities")[user_id] = None
+    after_commit(db, partial(_user_identities.pop, user_id))
+
+
+def _load_user_identity(db: Session, condition) -> Optional[UserIdentity]:
+    row = db.execute(select(*_IDENTITY_COLUMNS).where(condition)).first()
+    if row is None:
+        return None
+    identity = UserIdentity(*row)
+    transaction_cache(db, "user_identities")[identity.id] = identity
+    after_commit(db, partial(_remember_user_identity, identity))
+    return identity
+
+
+def _remember_user_identity(identity: UserIdentity) -> None:
+    _user_identities.set(identity.id, identity)
+    _user_ids_by_email.set(models.normalize_email(identity.email), identity.id)
+
+
+def _get_or_create_default_user(db: Session) -> UserIdentity:
+    identity = get_user_identity_by_email(db, DEFAULT_USER_EMAIL)
+    if identity:
+        return identity
+    user = create_user(
         db,
         schemas.UserCreate(
             name="Jamie Ortega",
@@ -734,6 +1646,7 @@ def _get_or_create_default_user(db: Session) -> models.User:
             password="password123",
         ),
     )
+    return get_user_identity(db, user.id)
 
 
 def _get_or_create_membership(
@@ -749,19 +1662,12 @@ def _get_or_create_membership(
     )
     if membership:
         return membership
-    membership = models.GroupMembership(group_id=group_id, user_id=user_id)
-    db.add(membership)
-    db.commit()
-    db.refresh(membership)
-    return membership
-    membership_exists = (
+    _insert_membership(db, group_id, user_id)
+    return (
         db.query(models.GroupMembership)
         .filter(
             models.GroupMembership.group_id == group_id,
-            models.GroupMembership.user_id == user.id,
+            models.GroupMembership.user_id == user_id,
         )
-        .first()
+        .one()
     )
-    if not membership_exists:
-        db.add(models.GroupMembership(group_id=group_id, user_id=user.id))
-        db.commit()
@@ -1,5 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from .config import settings
 
@@ -7,10 +11,74 @@ engine = create_engine(settings.database_url, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+_AFTER_COMMIT_KEY = "after_commit_callbacks"
+_TRANSACTION_CACHE_KEY = "transaction_caches"
 
-def get_db():
+_shared_session: ContextVar[Optional[Session]] = ContextVar(
+    "shared_session", default=None
+)
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """One unit of work: crud functions only flush, the scope commits once.
+
+    Any exception rolls the whole unit back, including rows flushed by earlier
+    crud calls in the same scope.
+    """
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
     finally:
         db.close()
+
+
+@contextmanager
+def shared_session(db: Session) -> Iterator[Session]:
+    """Hand ``db`` to every ``get_db`` call made inside the block.
+
+    Used by ``POST /batch`` so its sub-requests check out a single session,
+    which the caller commits; they must not run concurrently, as a session is
+    not thread-safe.
+    """
+    token = _shared_session.set(db)
+    try:
+        yield db
+    finally:
+        _shared_session.reset(token)
+
+
+def get_db():
+    shared = _shared_session.get()
+    if shared is not None:
+        yield shared
+        return
+    with session_scope() as db:
+        yield db
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once ``db`` commits; it is dropped on rollback."""
+    db.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+
+def transaction_cache(db: Session, name: str) -> dict:
+    """A dict private to ``db``'s current transaction, emptied when it ends."""
+    return db.info.setdefault(_TRANSACTION_CACHE_KEY, {}).setdefault(name, {})
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    session.info.pop(_TRANSACTION_CACHE_KEY, None)
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, ()):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session) -> None:
+    session.info.pop(_TRANSACTION_CACHE_KEY, None)
+    session.info.pop(_AFTER_COMMIT_KEY, None)
@@ -0,0 +1,90 @@
+"""Sparse fieldsets: ``fields=`` and ``include=`` on the list endpoints.
+
+Without either parameter a list endpoint returns its full response model.
+With one of them the response is trimmed:
+
+* ``fields`` names the attributes (plain fields) to return. ``id`` is always
+  returned. It defaults to every attribute when only ``include`` is given.
+* ``include`` names the relations to embed, e.g. a swap request's ``event``.
+  It defaults to none when only ``fields`` is given.
+
+Each endpoint passes the selected relations down to its query, so an omitted
+relation is neither loaded from the database nor serialized. Names are
+comma-separated, and an unknown name is a 400.
+"""
+
+from typing import Any, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
+
+from . import schemas
+
+
+class Resource(NamedTuple):
+    # Response keys in the model's order.
+    keys: Tuple[str, ...]
+    # Relation name -> the response keys it fills.
+    relations: Mapping[str, Tuple[str, ...]]
+
+    @property
+    def attributes(self) -> Tuple[str, ...]:
+        embedded = {key for keys in self.relations.values() for key in keys}
+        return tuple(key for key in self.keys if key not in embedded)
+
+
+class Selection(NamedTuple):
+    keys: Tuple[str, ...]
+    relations: FrozenSet[str]
+    sparse: bool
+
+
+EVENT = Resource(keys=tuple(schemas.EventRead.model_fields), relations={})
+SWAP_REQUEST = Resource(
+    keys=tuple(schemas.SwapRequestRead.model_fields),
+    relations={
+        "event": ("event",),
+        "targets": ("targeted_colleagues",),
+        "accepted_by": ("accepted_by_name", "accepted_by_email"),
+        "owner": ("owner_name", "owner_email"),
+    },
+)
+GROUP = Resource(
+    keys=tuple(schemas.GroupRead.model_fields),
+    relations={"invites": ("invites",), "shared_calendar": ("shared_calendar",)},
+)
+
+
+def _names(value: str) -> List[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def parse(
+    resource: Resource, fields: Optional[str] = None, include: Optional[str] = None
+) -> Selection:
+    if fields is None and include is None:
+        return Selection(resource.keys, frozenset(resource.relations), False)
+    attributes = resource.attributes
+    if fields is None:
+        chosen = set(attributes)
+    else:
+        chosen = {"id"}
+        for name in _names(fields):
+            if name not in attributes:
+                raise ValueError("UNKNOWN_FIELD")
+            chosen.add(name)
+    relations = set()
+    for name in _names(include or ""):
+        if name not in resource.relations:
+            raise ValueError("UNKNOWN_INCLUDE")
+        relations.add(name)
+        chosen.update(resource.relations[name])
+    return Selection(
+        tuple(key for key in resource.keys if key in chosen),
+        frozenset(relations),
+        True,
+    )
+
+
+def trim(items: List[Dict[str, Any]], selection: Selection) -> List[Dict[str, Any]]:
+    if not selection.sparse:
+        return items
+    keys = selection.keys
+    return [{key: item[key] for key in keys} for item in items]
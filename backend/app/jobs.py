@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import auth, crud
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _advisory_key(name: str) -> int:
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+@contextmanager
+def job_lock(connection: Connection, name: str) -> Iterator[bool]:
+    """Hold a cluster-wide lock for ``name`` without blocking.
+
+    Postgres uses a session-level advisory lock so only one worker runs the
+    job. Other databases (SQLite) use an ``flock`` on a file in the temp
+    directory named after the database and job, which covers the worker
+    processes of one host. Without ``fcntl`` (Windows) the lock is local to
+    the process, so each worker process may run the job.
+    """
+    if connection.dialect.name == "postgresql":
+        key = _advisory_key(name)
+        acquired = connection.execute(select(func.pg_try_advisory_lock(key))).scalar()
+        connection.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(select(func.pg_advisory_unlock(key)))
+                connection.commit()
+        return
+    if fcntl is not None:
+        with _file_lock(f"{connection.engine.url}:{name}") as acquired:
+            yield acquired
+        return
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+@contextmanager
+def _file_lock(key: str) -> Iterator[bool]:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(tempfile.gettempdir(), f"nurseshift-job-{digest}.lock")
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(descriptor, fcntl.LOCK_UN)
+    finally:
+        os.close(descriptor)
+
+
+def expire_stale_swap_requests() -> int:
+    with engine.connect() as connection:
+        with job_lock(connection, "expire-stale-swap-requests") as acquired:
+            if not acquired:
+                return 0
+            with Session(bind=connection) as db:
+                expired = crud.expire_stale_swap_requests(
+                    db, batch_size=settings.swap_expiry_batch_size
+                )
+    if expired:
+        logger.info("Expired %s stale swap requests", expired)
+    return expired
+
+
+def flush_session_last_seen() -> int:
+    return auth.flush_last_seen()
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[], object]):
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start() -> List[asyncio.Task]:
+    if not settings.background_jobs_enabled:
+        return []
+    return [
+        asyncio.create_task(
+            _run_periodically(
+                "expire-stale-swap-requests",
+                settings.swap_expiry_interval_seconds,
+                expire_stale_swap_requests,
+            )
+        ),
+        asyncio.create_task(
+            _run_periodically(
+                "flush-session-last-seen",
+                settings.session_touch_interval_seconds,
+                flush_session_last_seen,
+            )
+        ),
+    ]
+
+
+async def stop(tasks: List[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if tasks:
+        try:
+            await run_in_threadpool(flush_session_last_seen)
+        except Exception:
+            logger.exception("Final session activity flush failed")
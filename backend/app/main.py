@@ -1,20 +1,51 @@
+import asyncio
+import csv
 import html
+import io
+import json
 import logging
 import os
+import re
+from contextlib import asynccontextmanager
 from datetime import date, time, timedelta
-from typing import List, Optional
+from typing import Collection, List, Optional, Union
 import secrets
 from urllib.parse import urljoin
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import text, func
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-
-from . import crud, models, schemas
-from .database import Base, engine, get_db, SessionLocal
+from starlette.concurrency import run_in_threadpool
+
+from . import (
+    auth,
+    avatars,
+    batch,
+    compression,
+    crud,
+    fieldsets,
+    jobs,
+    metrics,
+    models,
+    passwords,
+    reads,
+    realtime,
+    schemas,
+    serialization,
+    singleflight,
+)
+from .database import Base, engine, get_db, SessionLocal, session_scope
 
 logger = logging.getLogger(__name__)
 
@@ -112,6 +143,14 @@ def _apply_schema_patches():
                 "ADD COLUMN IF NOT EXISTS primary_position VARCHAR(255)"
             )
         )
+        # Same-hospital matching uses hospital_id; nothing reads this index.
+        connection.execute(text("DROP INDEX IF EXISTS ix_users_primary_hospital"))
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_events_user_id_date "
+                "ON events (user_id, date)"
+            )
+        )
         connection.execute(
             text(
                 "ALTER TABLE users "
@@ -124,6 +163,9 @@ def _apply_schema_patches():
                 "ALTER COLUMN avatar_url TYPE TEXT"
             )
         )
+        connection.execute(
+            text("ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_hash VARCHAR(64)")
+        )
         connection.execute(
             text(
                 "CREATE TABLE IF NOT EXISTS group_memberships ("
@@ -149,6 +191,53 @@ def _apply_schema_patches():
         connection.execute(
             text("ALTER TABLE group_shares DROP COLUMN IF EXISTS entries")
         )
+        has_counters = connection.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'groups' AND column_name = 'member_count'"
+            )
+        ).first()
+        if not has_counters:
+            connection.execute(
+                text(
+                    "ALTER TABLE groups "
+                    "ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0, "
+                    "ADD COLUMN sharing_count INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+        # Duplicate memberships go before the unique index is built. The one
+        # kept is the one with the latest share (then the oldest), since
+        # deleting a membership cascades to its share.
+        deduped = connection.execute(
+            text(
+                "DELETE FROM group_memberships m USING ("
+                "SELECT d.id, ROW_NUMBER() OVER ("
+                "PARTITION BY d.group_id, d.user_id "
+                "ORDER BY s.id IS NULL, s.updated_at DESC, d.id"
+                ") AS rank "
+                "FROM group_memberships d "
+                "LEFT JOIN group_shares s ON s.membership_id = d.id"
+                ") ranked "
+                "WHERE m.id = ranked.id AND ranked.rank > 1"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_group_memberships_group_user "
+                "ON group_memberships (group_id, user_id)"
+            )
+        )
+        if not has_counters or deduped.rowcount:
+            connection.execute(
+                text(
+                    "UPDATE groups SET "
+                    "member_count = (SELECT COUNT(*) FROM group_memberships m "
+                    "WHERE m.group_id = groups.id), "
+                    "sharing_count = (SELECT COUNT(*) FROM group_shares s "
+                    "JOIN group_memberships m ON m.id = s.membership_id "
+                    "WHERE m.group_id = groups.id)"
+                )
+            )
         connection.execute(
             text(
                 "CREATE TABLE IF NOT EXISTS worksites ("
@@ -174,6 +263,66 @@ def _apply_schema_patches():
                 "ON worksites(user_id)"
             )
         )
+        _link_worksite_references(connection)
+        connection.execute(
+            text(
+                "ALTER TABLE users "
+                "ADD COLUMN IF NOT EXISTS email_normalized VARCHAR(255), "
+                "ADD COLUMN IF NOT EXISTS name_normalized VARCHAR(255)"
+            )
+        )
+        connection.execute(
+            text(
+                "UPDATE users SET "
+                "email_normalized = lower(trim(email)), "
+                "name_normalized = lower(regexp_replace(trim(name), '\\s+', ' ', 'g')) "
+                "WHERE email_normalized IS NULL OR name_normalized IS NULL"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_users_email_normalized "
+                "ON users (email_normalized)"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_users_name_normalized "
+                "ON users (name_normalized)"
+            )
+        )
+        connection.execute(
+            text("ALTER TABLE colleagues ADD COLUMN IF NOT EXISTS search_text TEXT")
+        )
+        connection.execute(
+            text(
+                "UPDATE colleagues SET search_text = ' ' || trim(regexp_replace("
+                "lower(concat_ws(' ', name, email, department, facility)), "
+                "'\\W+', ' ', 'g')) "
+                "WHERE search_text IS NULL"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_colleagues_user_id_name_id "
+                "ON colleagues (user_id, name, id)"
+            )
+        )
+        # pg_trgm may need a privileged role; without it typeahead is served by
+        # per-owner in-memory indexes instead.
+        try:
+            with connection.begin_nested():
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                connection.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS ix_colleagues_search_text_trgm "
+                        "ON colleagues USING gin (search_text gin_trgm_ops)"
+                    )
+                )
+        except SQLAlchemyError as error:
+            logger.warning("Colleague trigram index unavailable: %s", error)
+        else:
+            crud.set_colleague_trigram_index(True)
         connection.execute(
             text(
                 "ALTER TABLE group_invites "
@@ -192,6 +341,12 @@ def _apply_schema_patches():
                 "ADD COLUMN IF NOT EXISTS invitee_user_id INTEGER REFERENCES users(id)"
             )
         )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_group_invites_group_id_email "
+                "ON group_invites (group_id, invitee_email)"
+            )
+        )
         connection.execute(
             text(
                 "CREATE TABLE IF NOT EXISTS group_invite_links ("
@@ -209,6 +364,89 @@ def _apply_schema_patches():
         )
 
 
+# SQL twin of models.normalize_place, used to dedupe existing spellings.
+_PLACE_KEY_SQL = "trim(regexp_replace(lower({}), '\\W+', ' ', 'g'))"
+
+
+def _link_worksite_references(connection):
+    hospital_key = _PLACE_KEY_SQL.format("w.hospital_name")
+    department_key = _PLACE_KEY_SQL.format("w.department_name")
+    connection.execute(
+        text(
+            "ALTER TABLE worksites "
+            "ADD COLUMN IF NOT EXISTS hospital_id INTEGER REFERENCES hospitals(id), "
+            "ADD COLUMN IF NOT EXISTS department_id INTEGER REFERENCES departments(id)"
+        )
+    )
+    connection.execute(
+        text(
+            "ALTER TABLE users "
+            "ADD COLUMN IF NOT EXISTS hospital_id INTEGER "
+            "REFERENCES hospitals(id) ON DELETE SET NULL, "
+            "ADD COLUMN IF NOT EXISTS department_id INTEGER "
+            "REFERENCES departments(id) ON DELETE SET NULL"
+        )
+    )
+    # Each spelling group becomes one row named after its most common spelling.
+    # Only worksites not linked yet are read, so this is cheap once migrated.
+    connection.execute(
+        text(
+            "INSERT INTO hospitals (name, name_normalized, created_at) "
+            "SELECT DISTINCT ON (place_key) name, place_key, NOW() FROM ("
+            f"SELECT trim(w.hospital_name) AS name, {hospital_key} AS place_key, "
+            "COUNT(*) AS uses FROM worksites w WHERE w.hospital_id IS NULL "
+            "GROUP BY 1, 2) spellings "
+            "WHERE place_key <> '' ORDER BY place_key, uses DESC, name "
+            "ON CONFLICT (name_normalized) DO NOTHING"
+        )
+    )
+    connection.execute(
+        text(
+            "UPDATE worksites w SET hospital_id = h.id FROM hospitals h "
+            f"WHERE w.hospital_id IS NULL AND h.name_normalized = {hospital_key}"
+        )
+    )
+    connection.execute(
+        text(
+            "INSERT INTO departments (hospital_id, name, name_normalized, created_at) "
+            "SELECT DISTINCT ON (hospital_id, place_key) "
+            "hospital_id, name, place_key, NOW() "
+            "FROM (SELECT w.hospital_id, trim(w.department_name) AS name, "
+            f"{department_key} AS place_key, COUNT(*) AS uses FROM worksites w "
+            "WHERE w.hospital_id IS NOT NULL AND w.department_id IS NULL "
+            "GROUP BY 1, 2, 3) spellings "
+            "WHERE place_key <> '' ORDER BY hospital_id, place_key, uses DESC, name "
+            "ON CONFLICT (hospital_id, name_normalized) DO NOTHING"
+        )
+    )
+    connection.execute(
+        text(
+            "UPDATE worksites w SET department_id = d.id FROM departments d "
+            "WHERE w.department_id IS NULL AND d.hospital_id = w.hospital_id "
+            f"AND d.name_normalized = {department_key}"
+        )
+    )
+    connection.execute(
+        text(
+            "UPDATE users u SET hospital_id = w.hospital_id, "
+            "department_id = w.department_id FROM worksites w "
+            "WHERE w.user_id = u.id AND u.hospital_id IS NULL "
+            "AND w.hospital_id IS NOT NULL"
+        )
+    )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_users_hospital_id ON users (hospital_id)"
+        )
+    )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_worksites_hospital_id "
+            "ON worksites (hospital_id)"
+        )
+    )
+
+
 _apply_schema_patches()
 
 
@@ -231,15 +469,18 @@ def _ensure_invite_tokens():
             .filter(models.GroupInvite.invitee_user_id.is_(None))
             .all()
         )
+        emails = {
+            models.normalize_email(invite.invitee_email) for invite in email_linked
+        }
+        user_ids = dict(
+            session.query(models.User.email_normalized, models.User.id)
+            .filter(models.User.email_normalized.in_(emails))
+            .all()
+        )
         for invite in email_linked:
-            email = invite.invitee_email.lower()
-            user = (
-                session.query(models.User)
-                .filter(func.lower(models.User.email) == email)
-                .first()
-            )
-            if user:
-                invite.invitee_user_id = user.id
+            user_id = user_ids.get(models.normalize_email(invite.invitee_email))
+            if user_id:
+                invite.invitee_user_id = user_id
         session.commit()
     finally:
         session.close()
@@ -260,7 +501,7 @@ def _build_deep_link(token: str) -> str:
 
 
 def _ensure_default_user():
-    with SessionLocal() as db:
+    with session_scope() as db:
         user = crud.get_user_by_email(db, "jamie@nurseshift.app")
         if not user:
             user = crud.create_user(
@@ -293,6 +534,7 @@ def _ensure_default_user():
             {"uid": user.id},
         )
         existing_groups = db.query(models.Group).all()
+        joined = False
         for group in existing_groups:
             membership = (
                 db.query(models.GroupMembership)
@@ -306,7 +548,10 @@ def _ensure_default_user():
                 db.add(
                     models.GroupMembership(group_id=group.id, user_id=user.id)
                 )
-        db.commit()
+                joined = True
+        if joined:
+            db.flush()
+            crud.reconcile_group_counters(db)
 
 
 def _ensure_seed_users():
@@ -316,7 +561,7 @@ def _ensure_seed_users():
         ("Morgan Wills", "morgan@nurseshift.app"),
         ("Avery Chen", "avery@nurseshift.app"),
     ]
-    with SessionLocal() as db:
+    with session_scope() as db:
         for name, email in seed_accounts:
             if crud.get_user_by_email(db, email):
                 continue
@@ -335,7 +580,7 @@ _ensure_seed_users()
 
 
 def _seed_groups():
-    with SessionLocal() as db:
+    with session_scope() as db:
         if db.query(models.Group).count():
             return
         base_start = date(2025, 11, 10)
@@ -356,7 +601,7 @@ def _seed_groups():
             models.GroupInvite(invitee_name="Imani Owens"),
         ]
         db.add(group)
-        db.commit()
+        db.flush()
         for name, email, labels, icon in sample_users:
             user = crud.get_user_by_email(db, email)
             if not user:
@@ -389,12 +634,32 @@ def _seed_groups():
                     user_id=user.id,
                 )
                 db.add(event)
-        db.commit()
+        db.flush()
+        crud.reconcile_group_counters(db)
 
 
 _seed_groups()
 
-app = FastAPI(title="NurseShift Calendar API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    realtime.start(asyncio.get_running_loop())
+    passwords.start()
+    tasks = jobs.start()
+    try:
+        yield
+    finally:
+        await jobs.stop(tasks)
+        passwords.shutdown()
+        realtime.stop()
+
+
+app = FastAPI(
+    title="NurseShift Calendar API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=serialization.FastJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -402,6 +667,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(singleflight.SingleFlightMiddleware)
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 
 @app.get("/health")
@@ -409,6 +677,20 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+# Several GET requests in one round trip for app launch; see app/batch.py.
+@app.post("/batch", response_model=schemas.BatchResponse)
+async def run_batch(request: Request, payload: schemas.BatchRequest):
+    body = await batch.run(app, request, payload.requests)
+    return Response(body, media_type="application/json")
+
+
 @app.get("/legal/privacy", response_class=HTMLResponse)
 def privacy_policy():
     content = """<!DOCTYPE html>
@@ -475,8 +757,34 @@ def disclaimer():
     return HTMLResponse(content=content)
 
 
+async def _wait_for_version(
+    topic: str,
+    user_id: int,
+    since: Optional[int],
+    wait: int,
+    predicate: Optional[realtime.Predicate] = None,
+) -> int:
+    if wait and since is not None:
+        return await realtime.broker.wait(topic, user_id, since, wait, predicate)
+    return realtime.broker.version(topic, user_id)
+
+
+def _fieldset(
+    resource: fieldsets.Resource, fields: Optional[str], include: Optional[str]
+) -> fieldsets.Selection:
+    try:
+        return fieldsets.parse(resource, fields, include)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (sparse fieldset)"
+INCLUDE_DESCRIPTION = "Comma-separated relations to embed (sparse fieldset)"
+
+
 @app.get("/events", response_model=List[schemas.EventRead])
-def list_events(
+async def list_events(
+    request: Request,
     *,
     db: Session = Depends(get_db),
     start_date: date = Query(..., description="YYYY-MM-DD"),
@@ -484,27 +792,62 @@ def list_events(
     user_id: Optional[int] = Query(
         None, description="Filter events by owner (optional)"
     ),
+    wait: int = Query(
+        0, ge=0, le=60, description="Seconds to hold the request for a change"
+    ),
+    since: Optional[int] = Query(
+        None, description="X-Calendar-Version from the previous response"
+    ),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    selection = _fieldset(fieldsets.EVENT, fields, None)
+    user_id = auth.acting_user_id(principal, user_id, required=False)
+    headers = {}
+    if user_id is not None:
+        version = await _wait_for_version(
+            realtime.CALENDAR,
+            user_id,
+            since,
+            wait,
+            realtime.touches_range(start_date, end_date),
+        )
+        headers["X-Calendar-Version"] = str(version)
+    elif wait:
+        raise HTTPException(status_code=400, detail="Long polling requires user_id")
     logger.info(
         "Listing events start=%s end=%s user_id=%s", start_date, end_date, user_id
     )
-    events = crud.list_events(
-        db,
-        start_date=start_date,
-        end_date=end_date,
-        user_id=user_id,
-    )
-    return [_to_read_schema(event) for event in events]
+
+    def load() -> Response:
+        rows = reads.list_events(
+            db,
+            start_date=start_date,
+            end_date=end_date,
+            user_id=user_id,
+        )
+        # Rows are encoded from plain dicts; response_model only documents them.
+        return serialization.negotiated_response(
+            request, reads.events_payload(rows, selection), headers=headers
+        )
+
+    return await run_in_threadpool(load)
 
 
 @app.post("/events", response_model=schemas.EventRead, status_code=201)
-def create_event(*, db: Session = Depends(get_db), payload: schemas.EventCreate):
+def create_event(
+    *,
+    db: Session = Depends(get_db),
+    payload: schemas.EventCreate,
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
+):
+    payload.user_id = auth.acting_user_id(principal, payload.user_id, required=False)
     try:
         event = crud.create_event(db, payload)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     logger.info("Created event %s for user %s", event.id, event.user_id)
-    return _to_read_schema(event)
+    return serialization.model_response(_to_read_schema(event), status_code=201)
 
 
 @app.put("/events/{event_id}", response_model=schemas.EventRead)
@@ -514,7 +857,7 @@ def update_event(
     event = crud.update_event(db, event_id, payload)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    return _to_read_schema(event)
+    return serialization.model_response(_to_read_schema(event))
 
 
 @app.delete("/events/{event_id}", status_code=204)
@@ -529,11 +872,12 @@ def get_event(event_id: int, db: Session = Depends(get_db)):
     event = crud.get_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    return _to_read_schema(event)
+    return serialization.model_response(_to_read_schema(event))
 
 
 @app.get("/swap-requests", response_model=List[schemas.SwapRequestRead])
 def list_swap_requests(
+    request: Request,
     *,
     db: Session = Depends(get_db),
     start_date: Optional[date] = Query(
@@ -548,24 +892,89 @@ def list_swap_requests(
     user_id: Optional[int] = Query(
         None, description="Limit results to the specified user id"
     ),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
-    requests = crud.list_swap_requests(
+    selection = _fieldset(fieldsets.SWAP_REQUEST, fields, include)
+    user_id = auth.acting_user_id(principal, user_id, required=False)
+    rows = reads.list_swap_requests(
         db,
         start_date=start_date,
         end_date=end_date,
         status=status.value if status else None,
         user_id=user_id,
+        relations=selection.relations,
+    )
+    return serialization.negotiated_response(
+        request, reads.swap_requests_payload(rows, selection)
     )
-    return [_swap_to_read_schema(item) for item in requests]
 
 
 @app.get(
     "/inbox/swap-requests",
     response_model=List[schemas.SwapRequestRead],
 )
-def list_inbox_swap_requests(user_id: int, db: Session = Depends(get_db)):
-    requests = crud.list_inbox_swap_requests(db, user_id)
-    return [_swap_to_read_schema(item) for item in requests]
+async def list_inbox_swap_requests(
+    request: Request,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    wait: int = Query(
+        0, ge=0, le=60, description="Seconds to hold the request for a change"
+    ),
+    since: Optional[int] = Query(
+        None, description="X-Inbox-Version from the previous response"
+    ),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
+):
+    selection = _fieldset(fieldsets.SWAP_REQUEST, fields, include)
+    user_id = auth.acting_user_id(principal, user_id)
+    version = await _wait_for_version(realtime.INBOX, user_id, since, wait)
+
+    def load() -> Response:
+        rows = reads.list_inbox_swap_requests(
+            db, user_id, relations=selection.relations
+        )
+        return serialization.negotiated_response(
+            request,
+            reads.swap_requests_payload(rows, selection),
+            headers={"X-Inbox-Version": str(version)},
+        )
+
+    return await run_in_threadpool(load)
+
+
+@app.get("/inbox/stream")
+async def stream_inbox(
+    user_id: Optional[int] = None,
+    heartbeat: int = Query(15, ge=5, le=60),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
+):
+    user_id = auth.acting_user_id(principal, user_id)
+
+    async def events():
+        queue = realtime.broker.subscribe(user_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message.get("topic", realtime.INBOX) != realtime.INBOX:
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            realtime.broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post(
@@ -582,7 +991,39 @@ def create_swap_request(
         if str(error) == "EVENT_NOT_FOUND":
             raise HTTPException(status_code=404, detail="Event not found") from error
         raise
-    return _swap_to_read_schema(swap_request)
+    return serialization.model_response(
+        _swap_to_read_schema(swap_request), status_code=201
+    )
+
+
+@app.get("/swap-requests/matches", response_model=schemas.SwapMatchReport)
+def list_swap_matches(
+    hospital: Optional[str] = Query(
+        None, description="Only match requests owned by staff at this hospital"
+    ),
+    include_cycles: bool = Query(True, description="Also propose 3-way swaps"),
+    db: Session = Depends(get_db),
+):
+    result = crud.find_swap_matches(
+        db, hospital=hospital, include_cycles=include_cycles
+    )
+    matches = [
+        schemas.SwapMatchRead(
+            kind=schemas.SwapMatchKind.pair, swap_request_ids=list(pair)
+        )
+        for pair in result.pairs
+    ]
+    matches.extend(
+        schemas.SwapMatchRead(
+            kind=schemas.SwapMatchKind.cycle, swap_request_ids=list(cycle)
+        )
+        for cycle in result.cycles
+    )
+    return schemas.SwapMatchReport(
+        pending=result.pending,
+        compatible_edges=result.compatible_edges,
+        matches=matches,
+    )
 
 
 @app.get("/swap-requests/{request_id}", response_model=schemas.SwapRequestRead)
@@ -590,7 +1031,38 @@ def get_swap_request(request_id: int, db: Session = Depends(get_db)):
     swap_request = crud.get_swap_request(db, request_id)
     if not swap_request:
         raise HTTPException(status_code=404, detail="Swap request not found")
-    return _swap_to_read_schema(swap_request)
+    return serialization.model_response(_swap_to_read_schema(swap_request))
+
+
+@app.get(
+    "/swap-requests/{request_id}/candidates",
+    response_model=List[schemas.SwapCandidateRead],
+)
+def list_swap_candidates(
+    request: Request,
+    request_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    try:
+        candidates = crud.list_swap_candidates(db, request_id, limit=limit)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    if candidates is None:
+        raise HTTPException(status_code=404, detail="Swap request not found")
+    return serialization.model_response(
+        [
+            schemas.SwapCandidateRead.model_construct(
+                event=_to_read_schema(candidate.event),
+                owner_id=candidate.event.user_id,
+                owner_name=candidate.owner_name,
+                days_from_original=candidate.days_from_original,
+                colleague_available=candidate.colleague_available,
+            )
+            for candidate in candidates
+        ],
+        request=request,
+    )
 
 
 @app.post("/swap-requests/{request_id}/retract", response_model=schemas.SwapRequestRead)
@@ -600,7 +1072,7 @@ def retract_swap_request(request_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Swap request not found")
     if swap_request.status != schemas.SwapStatus.pending.value:
         raise HTTPException(status_code=400, detail="Swap request already accepted")
-    return _swap_to_read_schema(swap_request)
+    return serialization.model_response(_swap_to_read_schema(swap_request))
 
 
 @app.post(
@@ -611,16 +1083,18 @@ def accept_swap_request(
     request_id: int,
     payload: schemas.SwapDecision,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, payload.user_id)
     try:
         swap_request = crud.accept_swap_request_for_user(
-            db, request_id=request_id, user_id=payload.user_id
+            db, request_id=request_id, user_id=user_id
         )
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     if not swap_request:
         raise HTTPException(status_code=404, detail="Swap request not found")
-    return _swap_to_read_schema(swap_request)
+    return serialization.model_response(_swap_to_read_schema(swap_request))
 
 
 @app.post(
@@ -631,29 +1105,67 @@ def decline_swap_request(
     request_id: int,
     payload: schemas.SwapDecision,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, payload.user_id)
     try:
         swap_request = crud.decline_swap_request_for_user(
-            db, request_id=request_id, user_id=payload.user_id
+            db, request_id=request_id, user_id=user_id
         )
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     if not swap_request:
         raise HTTPException(status_code=404, detail="Swap request not found")
-    return _swap_to_read_schema(swap_request)
+    return serialization.model_response(_swap_to_read_schema(swap_request))
 
 
 @app.get("/colleagues", response_model=List[schemas.ColleagueRead])
-def list_colleagues(db: Session = Depends(get_db)):
-    colleagues = crud.list_colleagues(db)
-    return [schemas.ColleagueRead.model_validate(colleague) for colleague in colleagues]
+def list_colleagues(
+    request: Request,
+    *,
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Query(
+        None, description="Owner of the colleague list (defaults to the demo user)"
+    ),
+    q: Optional[str] = Query(
+        None,
+        max_length=100,
+        description="Typeahead: every word must start a word of the name, "
+        "email, department or facility",
+    ),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor from the previous page"
+    ),
+    limit: int = Query(100, ge=1, le=500),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
+):
+    user_id = auth.acting_user_id(principal, user_id, required=False)
+    try:
+        page = crud.list_colleagues(
+            db, user_id=user_id, query=q, cursor=cursor, limit=limit
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else None
+    return serialization.model_response(
+        [schemas.ColleagueRead.model_validate(colleague) for colleague in page.items],
+        headers=headers,
+        request=request,
+    )
 
 
 @app.post("/colleagues", response_model=schemas.ColleagueRead, status_code=201)
 def create_colleague(
-    *, db: Session = Depends(get_db), payload: schemas.ColleagueCreate
+    *,
+    db: Session = Depends(get_db),
+    payload: schemas.ColleagueCreate,
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
-    colleague = crud.create_colleague(db, payload)
+    payload.user_id = auth.acting_user_id(principal, payload.user_id, required=False)
+    try:
+        colleague = crud.create_colleague(db, payload)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
     return schemas.ColleagueRead.model_validate(colleague)
 
 
@@ -667,14 +1179,18 @@ def accept_colleague(colleague_id: int, db: Session = Depends(get_db)):
 
 @app.get("/worksites", response_model=List[schemas.WorksiteRead])
 def list_worksites(
+    request: Request,
     *,
     db: Session = Depends(get_db),
-    user_id: int = Query(..., description="Owner user id"),
+    user_id: Optional[int] = Query(None, description="Owner user id"),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, user_id)
     worksites = crud.list_worksites(db, user_id=user_id)
-    return [
-        schemas.WorksiteRead.model_validate(worksite) for worksite in worksites
-    ]
+    return serialization.model_response(
+        [schemas.WorksiteRead.model_validate(worksite) for worksite in worksites],
+        request=request,
+    )
 
 
 @app.post("/worksites", response_model=schemas.WorksiteRead, status_code=201)
@@ -682,7 +1198,9 @@ def create_worksite(
     *,
     db: Session = Depends(get_db),
     payload: schemas.WorksiteCreate,
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    payload.user_id = auth.acting_user_id(principal, payload.user_id)
     try:
         worksite = crud.create_worksite(db, payload)
     except ValueError as error:
@@ -699,27 +1217,59 @@ def delete_worksite(worksite_id: int, db: Session = Depends(get_db)):
 
 @app.post("/users/{user_id}/avatar", response_model=schemas.UserRead)
 def update_avatar(
-    user_id: int, payload: schemas.UserAvatarUpdate, db: Session = Depends(get_db)
+    user_id: int,
+    payload: schemas.UserAvatarUpdate,
+    db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
-    user = crud.update_user_avatar(db, user_id, payload.avatar_data)
+    user_id = auth.acting_user_id(principal, user_id)
+    try:
+        user = crud.update_user_avatar(db, user_id, payload.avatar_data)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return schemas.UserRead.model_validate(user)
 
 
+@app.get("/avatars/{digest}")
+def get_avatar(
+    digest: str,
+    size: Optional[str] = Query(None, description="Pass `thumb` for a 128px square"),
+):
+    found = avatars.open_image(digest, thumbnail=size == "thumb")
+    if not found:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    path, media_type = found
+    # The URL is the content hash, so the bytes behind it can never change.
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{digest}"',
+        },
+    )
+
+
 @app.get("/group-shared", response_model=List[schemas.GroupRead])
 def list_group_shared(
+    request: Request,
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     db: Session = Depends(get_db),
 ):
-    groups = crud.list_groups(db)
+    selection = _fieldset(fieldsets.GROUP, fields, include)
+    groups = crud.list_groups(db, selection.relations)
     results = [
         _group_to_read_schema(
             db=db,
             group=group,
             start_date=start_date,
             end_date=end_date,
+            relations=selection.relations,
         )
         for group in groups
     ]
@@ -727,13 +1277,19 @@ def list_group_shared(
         f"/group-shared returning {len(results)} groups "
         f"for range {start_date} to {end_date}"
     )
-    return results
+    return serialization.model_response(
+        results,
+        request=request,
+        fields=selection.keys if selection.sparse else None,
+    )
 
 
 @app.post("/group-shared", response_model=schemas.GroupRead, status_code=201)
 def create_group_shared(*, db: Session = Depends(get_db), payload: schemas.GroupCreate):
     group = crud.create_group(db, payload)
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(
+        _group_to_read_schema(db=db, group=group), status_code=201
+    )
 
 
 @app.post(
@@ -776,17 +1332,12 @@ def preview_invite_link(token: str, db: Session = Depends(get_db)):
             status_code=400,
             content=jsonable_encoder(payload.model_dump(by_alias=True)),
         )
-    member_count = (
-        db.query(models.GroupMembership)
-        .filter(models.GroupMembership.group_id == invite.group_id)
-        .count()
-    )
     return schemas.GroupInvitePreviewResponse(
         valid=True,
         group=schemas.GroupInviteGroupSummary(
-            id=str(invite.group.id),
-            name=invite.group.name,
-            member_count=member_count,
+            id=str(invite.group_id),
+            name=invite.group_name,
+            member_count=invite.member_count,
         ),
         expires_at=invite.expires_at,
         remaining_uses=max(invite.max_uses - invite.use_count, 0),
@@ -801,9 +1352,10 @@ def redeem_invite_link(
     token: str,
     payload: schemas.GroupInviteRedeemRequest,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
     status, group_id, reason = crud.redeem_invite_link(
-        db, token, payload.user_id
+        db, token, auth.acting_user_id(principal, payload.user_id)
     )
     if not status:
         payload = schemas.GroupInviteRedeemResponse(
@@ -852,7 +1404,100 @@ def create_group_invite(
         raise HTTPException(status_code=400, detail=str(error))
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(
+        _group_to_read_schema(db=db, group=group), status_code=201
+    )
+
+
+_ROSTER_NAME_KEYS = ("invitee_name", "name", "full_name")
+_ROSTER_EMAIL_KEYS = ("invitee_email", "email")
+
+
+def _roster_value(row: dict, keys: tuple) -> str:
+    for key in keys:
+        value = row.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def _parse_invite_roster(
+    body: bytes, content_type: str
+) -> List[Optional[schemas.GroupInviteRosterRow]]:
+    if "json" in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="INVALID_ROSTER")
+        if isinstance(data, dict):
+            data = data.get("invites")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="INVALID_ROSTER")
+        records = [
+            {str(key).lower(): value for key, value in item.items()}
+            if isinstance(item, dict)
+            else None
+            for item in data
+        ]
+    else:
+        try:
+            text_body = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="INVALID_ROSTER")
+        lines = [
+            [cell.strip() for cell in line]
+            for line in csv.reader(io.StringIO(text_body))
+            if any(cell.strip() for cell in line)
+        ]
+        header = ["name", "email"]
+        if lines and any(
+            cell.lower() in _ROSTER_EMAIL_KEYS for cell in lines[0]
+        ):
+            header = [cell.lower() for cell in lines.pop(0)]
+        records = [dict(zip(header, line)) for line in lines]
+    roster: List[Optional[schemas.GroupInviteRosterRow]] = []
+    for record in records:
+        try:
+            roster.append(
+                schemas.GroupInviteRosterRow(
+                    invitee_name=_roster_value(record, _ROSTER_NAME_KEYS),
+                    invitee_email=_roster_value(record, _ROSTER_EMAIL_KEYS) or None,
+                )
+                if record is not None
+                else None
+            )
+        except ValidationError:
+            roster.append(None)
+    return roster
+
+
+@app.post(
+    "/group-shared/{group_id}/invites/bulk",
+    response_model=schemas.GroupInviteBulkReport,
+    response_model_exclude_none=True,
+)
+async def bulk_create_group_invites(
+    group_id: int, request: Request, db: Session = Depends(get_db)
+):
+    roster = _parse_invite_roster(
+        await request.body(), request.headers.get("content-type", "")
+    )
+    try:
+        report = await run_in_threadpool(
+            crud.bulk_add_group_invites, db, group_id, roster
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    if not report:
+        raise HTTPException(status_code=404, detail="Group not found")
+    logger.info(
+        "Bulk invited %s members to group %s (%s skipped, %s failed)",
+        report.invited,
+        group_id,
+        report.skipped,
+        report.failed,
+    )
+    return report
 
 
 @app.post(
@@ -864,11 +1509,13 @@ def share_group_schedule(
     *,
     db: Session = Depends(get_db),
     payload: schemas.GroupShareCreate,
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    payload.user_id = auth.acting_user_id(principal, payload.user_id)
     group = crud.share_group_schedule(db, group_id, payload)
     if not group:
         raise HTTPException(status_code=404, detail="Group or user not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(_group_to_read_schema(db=db, group=group))
 
 
 @app.post(
@@ -880,11 +1527,13 @@ def cancel_group_share(
     *,
     db: Session = Depends(get_db),
     payload: schemas.GroupShareCancel,
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    payload.user_id = auth.acting_user_id(principal, payload.user_id)
     group = crud.cancel_group_share(db, group_id, payload)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(_group_to_read_schema(db=db, group=group))
 
 
 @app.post(
@@ -896,14 +1545,16 @@ def accept_group_invite(
     *,
     payload: schemas.GroupInviteDecision,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, payload.user_id)
     try:
-        group = crud.accept_group_invite(db, invite_id, payload.user_id)
+        group = crud.accept_group_invite(db, invite_id, user_id)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     if not group:
         raise HTTPException(status_code=404, detail="Invite not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(_group_to_read_schema(db=db, group=group))
 
 
 @app.post(
@@ -915,14 +1566,16 @@ def decline_group_invite(
     *,
     payload: schemas.GroupInviteDecision,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, payload.user_id)
     try:
-        group = crud.decline_group_invite(db, invite_id, payload.user_id)
+        group = crud.decline_group_invite(db, invite_id, user_id)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     if not group:
         raise HTTPException(status_code=404, detail="Invite not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(_group_to_read_schema(db=db, group=group))
 
 
 @app.post(
@@ -932,39 +1585,31 @@ def decline_group_invite(
 def accept_invite_by_token(
     payload: schemas.GroupInviteTokenAccept,
     db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
 ):
+    user_id = auth.acting_user_id(principal, payload.user_id)
     try:
-        group = crud.accept_group_invite_by_token(
-            db, payload.token, payload.user_id
-        )
+        group = crud.accept_group_invite_by_token(db, payload.token, user_id)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
     if not group:
         raise HTTPException(status_code=404, detail="Invite not found")
-    return _group_to_read_schema(db=db, group=group)
+    return serialization.model_response(_group_to_read_schema(db=db, group=group))
 
 
-def _build_invite_landing_html(
-    *,
-    title: str,
-    description: str,
-    token: Optional[str],
-) -> str:
-    safe_title = html.escape(title)
-    safe_description = html.escape(description)
-    deep_link = html.escape(_build_deep_link(token)) if token else None
+def _compile_invite_landing_template() -> List[Union[bytes, str]]:
+    # The page is static apart from three slots, so it is rendered once into
+    # byte chunks with slot names in between; responses only join and escape.
+    markers = {
+        name: f"\x00{name}\x00" for name in ("title", "description", "primary")
+    }
     download_url = html.escape(APP_DOWNLOAD_URL)
-    primary = (
-        f'<a class="primary" href="{deep_link}">Open in the NurseShift app</a>'
-        if deep_link
-        else ""
-    )
-    return f"""<!DOCTYPE html>
+    page = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <title>{safe_title} • NurseShift</title>
+  <title>{markers['title']} • NurseShift</title>
   <style>
     body {{
       font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
@@ -1027,39 +1672,71 @@ def _build_invite_landing_html(
 </head>
 <body>
   <div class="card">
-    <h1>{safe_title}</h1>
-    <p>{safe_description}</p>
+    <h1>{markers['title']}</h1>
+    <p>{markers['description']}</p>
     <div class="actions">
-      {primary}
+      {markers['primary']}
       <a class="secondary" href="{download_url}" target="_blank" rel="noopener">Download the app</a>
     </div>
     <p class="note">Already installed? Tap the button above after logging in to accept automatically.</p>
   </div>
 </body>
 </html>"""
+    parts: List[Union[bytes, str]] = []
+    for index, piece in enumerate(re.split("\x00(\\w+)\x00", page)):
+        parts.append(piece if index % 2 else piece.encode("utf-8"))
+    return parts
+
+
+def _build_invite_landing_html(
+    *,
+    title: str,
+    description: str,
+    token: Optional[str],
+) -> bytes:
+    primary = (
+        '<a class="primary" href="%s">Open in the NurseShift app</a>'
+        % html.escape(_build_deep_link(token))
+        if token
+        else ""
+    )
+    values = {
+        "title": html.escape(title),
+        "description": html.escape(description),
+        "primary": primary,
+    }
+    return b"".join(
+        part if isinstance(part, bytes) else values[part].encode("utf-8")
+        for part in _INVITE_LANDING_TEMPLATE
+    )
+
+
+_INVITE_LANDING_TEMPLATE = _compile_invite_landing_template()
+_UNAVAILABLE_INVITE_PAGES = {
+    reason: _build_invite_landing_html(
+        title="Invite unavailable", description=message, token=None
+    )
+    for reason, message in (
+        ("NOT_FOUND", "This invite link is no longer valid."),
+        ("EXPIRED", "This invite link has expired."),
+        ("REVOKED", "This invite link was revoked."),
+        ("NO_USES_LEFT", "This invite link has already been used."),
+    )
+}
 
 
 @app.get("/ginv/{token}", response_class=HTMLResponse)
 def invite_universal_link(token: str, db: Session = Depends(get_db)):
     invite, reason = crud.get_invite_link_preview(db, token)
     if not invite:
-        message = "This invite link is no longer valid."
-        if reason == "EXPIRED":
-            message = "This invite link has expired."
-        elif reason == "REVOKED":
-            message = "This invite link was revoked."
-        elif reason == "NO_USES_LEFT":
-            message = "This invite link has already been used."
         return HTMLResponse(
-            content=_build_invite_landing_html(
-                title="Invite unavailable",
-                description=message,
-                token=None,
+            content=_UNAVAILABLE_INVITE_PAGES.get(
+                reason, _UNAVAILABLE_INVITE_PAGES["NOT_FOUND"]
             )
         )
     return HTMLResponse(
         content=_build_invite_landing_html(
-            title=f"Join {invite.group.name}",
+            title=f"Join {invite.group_name}",
             description="Tap below to open NurseShift and accept the invite.",
             token=token,
         )
@@ -1078,132 +1755,130 @@ def invite_landing(
     )
     if not invite:
         raise HTTPException(status_code=404, detail="Invite not found")
-    group_name = html.escape(invite.group.name)
-    invitee = html.escape(invite.invitee_name)
-    deep_link = html.escape(_build_deep_link(token))
-    download_url = html.escape(APP_DOWNLOAD_URL)
-    content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-  <meta charset="utf-8" />
-  <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <title>Join {group_name} • NurseShift</title>
-  <style>
-    body {{
-      font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-      background: #f7f9fc;
-      color: #0a1f33;
-      margin: 0;
-      padding: 24px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      min-height: 100vh;
-    }}
-    .card {{
-      background: #fff;
-      border-radius: 20px;
-      padding: 32px;
-      box-shadow: 0 15px 40px rgba(10, 31, 51, 0.08);
-      max-width: 480px;
-      width: 100%;
-      text-align: center;
-    }}
-    h1 {{
-      margin-top: 0;
-      font-size: 28px;
-    }}
-    p {{
-      line-height: 1.5;
-      color: #41526b;
-    }}
-    .actions {{
-      margin-top: 24px;
-      display: flex;
-      flex-direction: column;
-      gap: 12px;
-    }}
-    a.primary {{
-      display: inline-block;
-      padding: 14px 18px;
-      border-radius: 12px;
-      background: #006972;
-      color: #fff;
-      text-decoration: none;
-      font-weight: 600;
-    }}
-    a.secondary {{
-      display: inline-block;
-      padding: 14px 18px;
-      border-radius: 12px;
-      border: 1px solid #cfd8e6;
-      color: #006972;
-      text-decoration: none;
-      font-weight: 600;
-    }}
-    .note {{
-      font-size: 14px;
-      color: #617087;
-      margin-top: 16px;
-    }}
-  </style>
-</head>
-<body>
-  <div class="card">
-    <h1>Join {group_name}</h1>
-    <p>{invitee} invited you to share schedules with their team on NurseShift.</p>
-    <div class="actions">
-      <a class="primary" href="{deep_link}">Open in the NurseShift app</a>
-      <a class="secondary" href="{download_url}" target="_blank" rel="noopener">Download the app</a>
-    </div>
-    <p class="note">Already installed? Tap the button above after logging in to accept automatically.</p>
-  </div>
-</body>
-</html>"""
-    return HTMLResponse(content=content)
+    return HTMLResponse(
+        content=_build_invite_landing_html(
+            title=f"Join {invite.group.name}",
+            description=(
+                f"{invite.invitee_name} invited you to share schedules with "
+                "their team on NurseShift."
+            ),
+            token=token,
+        )
+    )
 
 
 @app.post("/auth/login", response_model=schemas.AuthResponse)
-def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, payload.email, payload.password)
-    if not user:
+async def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
+    # Key derivation runs in the password process pool; only the short
+    # database steps use the threadpool.
+    user = await run_in_threadpool(crud.get_user_by_email, db, payload.email)
+    stored = user.password_hash if user else None
+    if not await passwords.verify_password_async(payload.password, stored):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = secrets.token_hex(24)
-    return schemas.AuthResponse(
-        token=token,
-        user=schemas.UserRead.model_validate(user),
-    )
+    if passwords.needs_rehash(stored):
+        rehashed = await passwords.hash_password_async(payload.password)
+        await run_in_threadpool(crud.update_password_hash, db, user.id, rehashed)
+
+    def respond() -> schemas.AuthResponse:
+        token = auth.issue_token(db, user.id)
+        return schemas.AuthResponse(
+            token=token,
+            user=schemas.UserRead.model_validate(user),
+        )
+
+    return await run_in_threadpool(respond)
 
 
 @app.post("/auth/logout")
-def logout() -> dict:
-    return {"message": "Logged out"}
+def logout(
+    everywhere: bool = Query(False, description="Revoke every session of the user"),
+    db: Session = Depends(get_db),
+    principal: Optional[auth.Principal] = Depends(auth.optional_current_user),
+) -> dict:
+    if principal is None:
+        return {"message": "Logged out"}
+    revoked = auth.revoke(db, principal, everywhere=everywhere)
+    return {"message": "Logged out", "revoked_sessions": revoked}
+
+
+@app.get("/auth/me", response_model=schemas.UserRead)
+def read_current_user(
+    db: Session = Depends(get_db),
+    principal: auth.Principal = Depends(auth.current_user),
+):
+    user = db.get(models.User, principal.user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return schemas.UserRead.model_validate(user)
+
+
+@app.get("/me/bootstrap", response_model=schemas.BootstrapRead)
+def read_bootstrap(
+    request: Request,
+    month: Optional[date] = Query(
+        None, description="Any day of the month to load (defaults to today)"
+    ),
+    inbox_limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    principal: auth.Principal = Depends(auth.current_user),
+):
+    start_date = (month or date.today()).replace(day=1)
+    end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    payload = reads.bootstrap(
+        db,
+        user_id=principal.user_id,
+        start_date=start_date,
+        end_date=end_date,
+        inbox_limit=inbox_limit,
+    )
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    # Encoded once, so the ETag is a hash of exactly the bytes sent.
+    media_type = serialization.negotiate(request)
+    body = serialization.encode(payload, media_type)
+    tag = serialization.etag(body)
+    headers = {
+        "ETag": tag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept, Authorization",
+    }
+    if serialization.etag_matches(request, tag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
 
 
 @app.post("/auth/register", response_model=schemas.AuthResponse, status_code=201)
-def register(payload: schemas.RegisterRequest, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_email(db, payload.email)
+async def register(payload: schemas.RegisterRequest, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(crud.get_user_by_email, db, payload.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     if not payload.accept_privacy or not payload.accept_disclaimer:
         raise HTTPException(status_code=400, detail="ACCEPT_TERMS_REQUIRED")
-    user = crud.create_user(
-        db,
-        schemas.UserCreate(
-            name=payload.name,
-            email=payload.email,
-            password=payload.password,
-        ),
-    )
-    token = secrets.token_hex(24)
-    return schemas.AuthResponse(
-        token=token,
-        user=schemas.UserRead.model_validate(user),
-    )
+    password_hash = await passwords.hash_password_async(payload.password)
+
+    def respond() -> schemas.AuthResponse:
+        user = crud.create_user(
+            db,
+            schemas.UserCreate(
+                name=payload.name,
+                email=payload.email,
+                password=payload.password,
+            ),
+            password_hash=password_hash,
+        )
+        token = auth.issue_token(db, user.id)
+        return schemas.AuthResponse(
+            token=token,
+            user=schemas.UserRead.model_validate(user),
+        )
+
+    return await run_in_threadpool(respond)
 
 
+# The read models below are filled from database rows, so they are built with
+# model_construct (no validation) and sent with serialization.model_response.
 def _to_read_schema(event: models.Event) -> schemas.EventRead:
-    return schemas.EventRead(
+    return schemas.EventRead.model_construct(
         id=event.id,
         title=event.title,
         date=event.date,
@@ -1218,7 +1893,7 @@ def _to_read_schema(event: models.Event) -> schemas.EventRead:
 
 
 def _swap_to_read_schema(event: models.SwapRequest) -> schemas.SwapRequestRead:
-    return schemas.SwapRequestRead(
+    return schemas.SwapRequestRead.model_construct(
         id=event.id,
         event_id=event.event_id,
         mode=schemas.SwapMode(event.mode),
@@ -1250,9 +1925,11 @@ def _group_to_read_schema(
     group: models.Group,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    relations: Collection[str] = fieldsets.GROUP.relations,
 ) -> schemas.GroupRead:
     shared_rows: List[schemas.GroupSharedRow] = []
-    for membership in group.memberships:
+    memberships = group.memberships if "shared_calendar" in relations else []
+    for membership in memberships:
         user = membership.user
         share = membership.share
         if not user or not share:
@@ -1285,7 +1962,7 @@ def _group_to_read_schema(
             .all()
         )
         parsed_entries = [
-            schemas.GroupShareEntry(
+            schemas.GroupShareEntry.model_construct(
                 date=event.date,
                 label=event.title,
                 icon=event.event_type,
@@ -1299,7 +1976,7 @@ def _group_to_read_schema(
         if not parsed_entries:
             continue
         shared_rows.append(
-            schemas.GroupSharedRow(
+            schemas.GroupSharedRow.model_construct(
                 member_name=user.name,
                 entries=parsed_entries,
                 member_id=user.id,
@@ -1307,12 +1984,17 @@ def _group_to_read_schema(
                 end_date=share.end_date,
             )
         )
-    return schemas.GroupRead(
+    invites = []
+    if "invites" in relations:
+        invites = [_invite_to_read_schema(invite) for invite in group.invites]
+    return schemas.GroupRead.model_construct(
         id=group.id,
         name=group.name,
         description=group.description,
         invite_message=group.invite_message,
-        invites=[_invite_to_read_schema(invite) for invite in group.invites],
+        member_count=group.member_count,
+        sharing_count=group.sharing_count,
+        invites=invites,
         shared_calendar=shared_rows,
     )
 
@@ -1324,7 +2006,7 @@ def _invite_to_read_schema(
     if invite.token:
         base = INVITE_BASE_URL.rstrip("/")
         invite_url = f"{base}/group-invites/accept?token={invite.token}"
-    return schemas.GroupInviteRead(
+    return schemas.GroupInviteRead.model_construct(
         id=invite.id,
         group_id=invite.group_id,
         invitee_name=invite.invitee_name,
@@ -0,0 +1,181 @@
+"""Per-request database counters, exported in Prometheus text format.
+
+``RequestMetricsMiddleware`` gives every HTTP request a ``RequestStats`` in a
+context variable; engine listeners count the commits and SQL statements issued
+while it is current (the variable follows the request into threadpool calls).
+Work outside a request, such as background jobs, is counted separately. Hit and
+miss counts of the named in-process caches (``cache.registry``) are included,
+as are requests coalesced by ``app.singleflight``.
+"""
+
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from . import cache
+from .database import engine
+
+COMMIT_BUCKETS = (0, 1, 2, 4, 8)
+
+
+@dataclass
+class RequestStats:
+    commits: int = 0
+    statements: int = 0
+    # Answered with another request's response (app.singleflight).
+    coalesced: bool = False
+
+
+@dataclass
+class _RouteTotals:
+    requests: int = 0
+    commits: int = 0
+    statements: int = 0
+    coalesced: int = 0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_db_stats", default=None
+)
+_lock = threading.Lock()
+_routes: Dict[Tuple[str, str], _RouteTotals] = defaultdict(_RouteTotals)
+_commit_histogram: List[int] = [0] * (len(COMMIT_BUCKETS) + 1)
+_background = _RouteTotals()
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(_connection) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.commits += 1
+    else:
+        with _lock:
+            _background.commits += 1
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(_connection, _cursor, _statement, _parameters, _context, _many):
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+    else:
+        with _lock:
+            _background.statements += 1
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record(method: str, route: str, stats: RequestStats) -> None:
+    bucket = next(
+        (index for index, bound in enumerate(COMMIT_BUCKETS) if stats.commits <= bound),
+        len(COMMIT_BUCKETS),
+    )
+    with _lock:
+        totals = _routes[(method, route)]
+        totals.requests += 1
+        totals.commits += stats.commits
+        totals.statements += stats.statements
+        totals.coalesced += stats.coalesced
+        _commit_histogram[bucket] += 1
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            # FastAPI stores the matched route in the scope; unmatched paths
+            # share one label so probes cannot create unbounded series.
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            record(scope["method"], route, stats)
+
+
+def render() -> str:
+    with _lock:
+        routes = sorted(
+            (key, _RouteTotals(**vars(totals))) for key, totals in _routes.items()
+        )
+        histogram = list(_commit_histogram)
+        background = _RouteTotals(**vars(_background))
+    lines = []
+    for name, field, description in (
+        ("nurseshift_http_requests_total", "requests", "HTTP requests handled."),
+        ("nurseshift_db_commits_total", "commits", "Database commits per route."),
+        ("nurseshift_db_statements_total", "statements", "SQL statements per route."),
+        (
+            "nurseshift_http_coalesced_requests_total",
+            "coalesced",
+            "Requests answered by an identical request already in flight.",
+        ),
+    ):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        for (method, route), totals in routes:
+            value = getattr(totals, field)
+            lines.append(f'{name}{{method="{method}",route="{route}"}} {value}')
+    name = "nurseshift_db_commits_per_request"
+    lines.append(f"# HELP {name} Database commits issued by each request.")
+    lines.append(f"# TYPE {name} histogram")
+    cumulative = 0
+    for bound, count in zip(COMMIT_BUCKETS, histogram):
+        cumulative += count
+        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {sum(histogram)}')
+    lines.append(f"{name}_sum {sum(totals.commits for _, totals in routes)}")
+    lines.append(f"{name}_count {sum(histogram)}")
+    for name, value, description in (
+        (
+            "nurseshift_db_background_commits_total",
+            background.commits,
+            "Database commits outside HTTP requests.",
+        ),
+        (
+            "nurseshift_db_background_statements_total",
+            background.statements,
+            "SQL statements outside HTTP requests.",
+        ),
+    ):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    caches = sorted(cache.registry.items())
+    for name, kind, read, description in (
+        (
+            "nurseshift_cache_hits_total",
+            "counter",
+            lambda registered: registered.hits,
+            "Lookups answered by an in-process cache.",
+        ),
+        (
+            "nurseshift_cache_misses_total",
+            "counter",
+            lambda registered: registered.misses,
+            "Lookups an in-process cache could not answer.",
+        ),
+        (
+            "nurseshift_cache_entries",
+            "gauge",
+            len,
+            "Entries currently held by an in-process cache.",
+        ),
+    ):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, registered in caches:
+            lines.append(f'{name}{{cache="{cache_name}"}} {read(registered)}')
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,7 @@
+import re
 from datetime import datetime, time
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 
 from sqlalchemy import (
     Boolean,
@@ -7,16 +9,58 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Time,
+    case,
 )
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy.orm import Mapped, column_property, deferred, relationship, validates
 
+from . import avatars
 from .database import Base
 
 
+def normalize_email(value: str) -> str:
+    return value.strip().lower()
+
+
+def normalize_name(value: str) -> str:
+    # Mirrors lower(regexp_replace(trim(name), '\s+', ' ', 'g')) used by the
+    # startup backfill.
+    return " ".join(value.split()).lower()
+
+
+def search_words(value: str) -> List[str]:
+    return [word for word in re.split(r"\W+", value.lower()) if word]
+
+
+def normalize_place(value: str) -> str:
+    # Spelling-insensitive key for hospital and department names: "St. Mary's"
+    # and "st  marys" differ, but "St. Mary" and "ST MARY" collide.
+    return " ".join(search_words(value))
+
+
+def search_text(*values: Optional[str]) -> str:
+    # Leading space so "word starts with" is a plain substring test (" tok");
+    # mirrors the SQL backfill in main._apply_schema_patches.
+    words = search_words(" ".join(value for value in values if value))
+    return " " + " ".join(words)
+
+
+# Shifts reuse a handful of start/end times, so the formatted ranges are cached.
+@lru_cache(maxsize=1024)
+def format_time_range(start: time, end: time) -> str:
+    return f"{_format_time(start)} – {_format_time(end)}"
+
+
+def _format_time(value: time) -> str:
+    hour = value.hour % 12 or 12
+    period = "AM" if value.hour < 12 else "PM"
+    return f"{hour}:{value.minute:02d} {period}"
+
+
 class Event(Base):
     __tablename__ = "events"
 
@@ -33,14 +77,10 @@ class Event(Base):
 
     user: Mapped["User"] = relationship("User", back_populates="events")
 
-    def to_time_range(self) -> str:
-        return f"{self._format_time(self.start_time)} – {self._format_time(self.end_time)}"
+    __table_args__ = (Index("ix_events_user_id_date", "user_id", "date"),)
 
-    @staticmethod
-    def _format_time(value: time) -> str:
-        hour = value.hour % 12 or 12
-        period = "AM" if value.hour < 12 else "PM"
-        return f"{hour}:{value.minute:02d} {period}"
+    def to_time_range(self) -> str:
+        return format_time_range(self.start_time, self.end_time)
 
 
 class SwapRequest(Base):
@@ -112,8 +152,22 @@ class Colleague(Base):
     status = Column(String(32), nullable=False, default="invited")
     invitation_message = Column(Text, nullable=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    search_text = Column(Text, nullable=True)
     user: Mapped["User"] = relationship("User", back_populates="colleagues")
 
+    __table_args__ = (
+        Index("ix_colleagues_user_id_name_id", "user_id", "name", "id"),
+    )
+
+    SEARCH_FIELDS = ("name", "email", "department", "facility")
+
+    @validates(*SEARCH_FIELDS)
+    def _index_search_text(self, key: str, value: Optional[str]) -> Optional[str]:
+        values = {field: getattr(self, field) for field in self.SEARCH_FIELDS}
+        values[key] = value
+        self.search_text = search_text(*values.values())
+        return value
+
 
 class Group(Base):
     __tablename__ = "groups"
@@ -123,6 +177,8 @@ class Group(Base):
     description = Column(Text, nullable=True)
     invite_message = Column(Text, nullable=False)
     shared_calendar = Column(Text, nullable=False, default="[]")
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    sharing_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     invites: Mapped[List["GroupInvite"]] = relationship(
@@ -148,6 +204,10 @@ class GroupInvite(Base):
     token = Column(String(128), nullable=False, unique=True)
     invitee_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
+    __table_args__ = (
+        Index("ix_group_invites_group_id_email", "group_id", "invitee_email"),
+    )
+
     group: Mapped[Group] = relationship("Group", back_populates="invites")
     invitee_user: Mapped["User"] = relationship("User")
 
@@ -174,9 +234,19 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, unique=True, index=True)
+    email_normalized = Column(String(255), nullable=True, index=True)
+    name_normalized = Column(String(255), nullable=True, index=True)
     password_hash = Column(String(255), nullable=False)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    avatar_url = Column(Text, nullable=True)
+    avatar_hash = Column(String(64), nullable=True)
+    # Legacy avatars: inline base64 until scripts/migrate_avatars.py moves them
+    # into the avatar store, or external http(s) URLs, which stay. Deferred so
+    # loading a user does not pull a blob for a user who already has a hash.
+    legacy_avatar_data = deferred(Column("avatar_url", Text, nullable=True))
+    # The legacy value, only while there is no avatar_hash.
+    legacy_avatar_fallback = column_property(
+        case((avatar_hash.is_(None), legacy_avatar_data.columns[0]))
+    )
     events: Mapped[List[Event]] = relationship("Event", back_populates="user")
     swap_requests: Mapped[List[SwapRequest]] = relationship(
         "SwapRequest",
@@ -202,10 +272,51 @@ class User(Base):
     worksites: Mapped[List["Worksite"]] = relationship(
         "Worksite", back_populates="user", cascade="all, delete-orphan"
     )
+    # Copied from the user's worksite. The ids drive same-hospital matching;
+    # the names are kept for display.
+    hospital_id = Column(
+        Integer,
+        ForeignKey("hospitals.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+    department_id = Column(
+        Integer, ForeignKey("departments.id", ondelete="SET NULL"), nullable=True
+    )
     primary_hospital = Column(String(255), nullable=True)
     primary_department = Column(String(255), nullable=True)
     primary_position = Column(String(255), nullable=True)
 
+    @property
+    def avatar_url(self) -> Optional[str]:
+        return avatars.url_for(self.avatar_hash, self.legacy_avatar_fallback)
+
+    @validates("email")
+    def _normalize_email(self, _: str, value: str) -> str:
+        self.email_normalized = normalize_email(value) if value else None
+        return value
+
+    @validates("name")
+    def _normalize_name(self, _: str, value: str) -> str:
+        self.name_normalized = normalize_name(value) if value else None
+        return value
+
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    last_seen_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    user: Mapped[User] = relationship("User")
+
 
 class GroupMembership(Base):
     __tablename__ = "group_memberships"
@@ -215,6 +326,10 @@ class GroupMembership(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     joined_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("uq_group_memberships_group_user", "group_id", "user_id", unique=True),
+    )
+
     group: Mapped[Group] = relationship("Group", back_populates="memberships")
     user: Mapped[User] = relationship("User", back_populates="group_memberships")
     share: Mapped["GroupShare"] = relationship(
@@ -241,11 +356,49 @@ class GroupShare(Base):
     )
 
 
+class Hospital(Base):
+    __tablename__ = "hospitals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    name_normalized = Column(String(255), nullable=False, unique=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    departments: Mapped[List["Department"]] = relationship(
+        "Department", back_populates="hospital", cascade="all, delete-orphan"
+    )
+
+
+class Department(Base):
+    __tablename__ = "departments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hospital_id = Column(
+        Integer, ForeignKey("hospitals.id", ondelete="CASCADE"), nullable=False
+    )
+    name = Column(String(255), nullable=False)
+    name_normalized = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    hospital: Mapped[Hospital] = relationship("Hospital", back_populates="departments")
+
+    __table_args__ = (
+        Index(
+            "uq_departments_hospital_id_name_normalized",
+            "hospital_id",
+            "name_normalized",
+            unique=True,
+        ),
+    )
+
+
 class Worksite(Base):
     __tablename__ = "worksites"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    hospital_id = Column(Integer, ForeignKey("hospitals.id"), nullable=True, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
     hospital_name = Column(String(255), nullable=False)
     department_name = Column(String(255), nullable=False)
     position_name = Column(String(255), nullable=False)
@@ -0,0 +1,137 @@
+"""Password hashing with scrypt, run off the event loop in a process pool.
+
+Hashes are stored as ``scrypt$<n>$<r>$<p>$<salt>$<digest>`` so the cost
+parameters travel with each hash and can be raised later without breaking
+existing accounts. Bare 64-character hex digests are legacy unsalted SHA-256
+hashes; they still verify and are flagged for rehashing.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .config import settings
+
+ALGORITHM = "scrypt"
+_SALT_BYTES = 16
+_DIGEST_BYTES = 32
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_dummy_hash: Optional[str] = None
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r * p,
+        dklen=_DIGEST_BYTES,
+    )
+
+
+def hash_password(password: str) -> str:
+    n = settings.password_scrypt_n
+    r = settings.password_scrypt_r
+    p = settings.password_scrypt_p
+    salt = secrets.token_bytes(_SALT_BYTES)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"{ALGORITHM}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if is_legacy(stored):
+        candidate = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(candidate, stored)
+    try:
+        algorithm, n, r, p, salt, digest = stored.split("$")
+        if algorithm != ALGORITHM:
+            return False
+        expected = _b64decode(digest)
+        candidate = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate, expected)
+
+
+def is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and "$" not in stored
+
+
+def needs_rehash(stored: str) -> bool:
+    if is_legacy(stored):
+        return True
+    current = (
+        f"{ALGORITHM}${settings.password_scrypt_n}$"
+        f"{settings.password_scrypt_r}${settings.password_scrypt_p}$"
+    )
+    return not stored.startswith(current)
+
+
+def _worker_count() -> int:
+    if settings.password_hash_workers > 0:
+        return settings.password_hash_workers
+    # Leave at least half the cores to the request handlers during login storms.
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def start() -> None:
+    global _pool, _slots
+    workers = _worker_count()
+    # Spawned (not forked) workers: the API process already runs threads.
+    _pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    _slots = asyncio.Semaphore(workers * settings.password_hash_queue_per_worker)
+
+
+def shutdown() -> None:
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _slots = None
+
+
+async def _run(function, *args):
+    loop = asyncio.get_running_loop()
+    if _pool is None or _slots is None:
+        # Outside the app lifespan (scripts, tests): still keep the loop free.
+        return await loop.run_in_executor(None, function, *args)
+    async with _slots:
+        return await loop.run_in_executor(_pool, function, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(password: str, stored: Optional[str]) -> bool:
+    global _dummy_hash
+    if stored is None:
+        # Spend the same effort for unknown accounts so response times do not
+        # reveal which emails are registered.
+        if _dummy_hash is None:
+            _dummy_hash = await hash_password_async(secrets.token_hex(8))
+        await _run(verify_password, "", _dummy_hash)
+        return False
+    if is_legacy(stored):
+        return verify_password(password, stored)
+    return await _run(verify_password, password, stored)
@@ -0,0 +1,509 @@
+"""ORM-free read path for the calendar and swap request list endpoints.
+
+``GET /events``, ``GET /swap-requests`` and ``GET /inbox/swap-requests`` can
+return thousands of rows. Loading them as ORM entities pays for identity-map
+bookkeeping and attribute instrumentation, and building ``EventRead`` and
+``SwapRequestRead`` models then re-validates data the database already
+guarantees. Here rows come from Core
+``select`` statements as NamedTuples and become plain dicts in the response
+models' shape and key order, encoded straight to JSON (or a binary format,
+see ``app.serialization``) with dates and times left to the encoder. Swap
+request relations left out of a sparse fieldset (see ``app.fieldsets``) are
+not joined or queried.
+
+``bootstrap`` assembles ``GET /me/bootstrap`` the same way in four queries:
+profile with latest worksite, the month's events with their pending swap
+requests, the inbox count with its first items, and group summaries.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import AbstractSet, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Select, and_, exists, func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from . import avatars, fieldsets, models, schemas, serialization
+
+
+class EventRow(NamedTuple):
+    id: int
+    title: str
+    date: date
+    start_time: time
+    end_time: time
+    location: str
+    event_type: str
+    notes: Optional[str]
+    created_at: datetime
+
+
+class SwapRequestRow(NamedTuple):
+    id: int
+    event_id: int
+    mode: str
+    desired_shift_type: str
+    available_start_time: Optional[time]
+    available_end_time: Optional[time]
+    available_start_date: Optional[date]
+    available_end_date: Optional[date]
+    visible_to_all: bool
+    share_with_staffing_pool: bool
+    notes: Optional[str]
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    accepted_by_user_id: Optional[int]
+    accepted_at: Optional[datetime]
+    event: Optional[EventRow]
+    targeted_colleagues: List[str]
+    accepted_by_name: Optional[str]
+    accepted_by_email: Optional[str]
+    owner_name: Optional[str]
+    owner_email: Optional[str]
+
+
+_EVENT_COLUMNS = tuple(getattr(models.Event, field) for field in EventRow._fields)
+_SWAP_FIELDS = SwapRequestRow._fields[: SwapRequestRow._fields.index("event")]
+_SWAP_COLUMNS = tuple(getattr(models.SwapRequest, field) for field in _SWAP_FIELDS)
+_WORKSITE_FIELDS = (
+    "hospital_name",
+    "department_name",
+    "position_name",
+    "id",
+    "user_id",
+    "hospital_id",
+    "department_id",
+)
+_INBOX_FIELDS = (
+    "id",
+    "event_id",
+    "mode",
+    "desired_shift_type",
+    "status",
+    "notes",
+    "created_at",
+)
+_PENDING = schemas.SwapStatus.pending.value
+_FULFILLED = schemas.SwapStatus.fulfilled.value
+_RELATIONS = frozenset(fieldsets.SWAP_REQUEST.relations)
+
+
+def list_events(
+    db: Session, *, start_date: date, end_date: date, user_id: Optional[int] = None
+) -> List[EventRow]:
+    stmt = (
+        select(*_EVENT_COLUMNS)
+        .where(models.Event.date >= start_date)
+        .where(models.Event.date <= end_date)
+        .order_by(models.Event.date.asc(), models.Event.start_time.asc())
+    )
+    if user_id is not None:
+        stmt = stmt.where(models.Event.user_id == user_id)
+    return [EventRow(*row) for row in db.execute(stmt)]
+
+
+def list_swap_requests(
+    db: Session,
+    *,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    relations: AbstractSet[str] = _RELATIONS,
+) -> List[SwapRequestRow]:
+    def filtered(stmt: Select) -> Select:
+        stmt = stmt.join(models.Event, models.Event.id == models.SwapRequest.event_id)
+        if start_date:
+            stmt = stmt.where(models.Event.date >= start_date)
+        if end_date:
+            stmt = stmt.where(models.Event.date <= end_date)
+        if status:
+            stmt = stmt.where(models.SwapRequest.status == status)
+        if user_id is not None:
+            stmt = stmt.where(models.Event.user_id == user_id)
+        return stmt
+
+    return _swap_requests(
+        db,
+        filtered,
+        relations,
+        models.Event.date.asc(),
+        models.Event.start_time.asc(),
+        models.SwapRequest.id.asc(),
+    )
+
+
+def list_inbox_swap_requests(
+    db: Session, user_id: int, *, relations: AbstractSet[str] = _RELATIONS
+) -> List[SwapRequestRow]:
+    user = db.execute(
+        select(models.User.hospital_id).where(models.User.id == user_id)
+    ).first()
+    if user is None:
+        return []
+    owner = aliased(models.User)
+
+    def filtered(stmt: Select) -> Select:
+        return (
+            stmt.join(models.Event, models.Event.id == models.SwapRequest.event_id)
+            .join(owner, owner.id == models.SwapRequest.user_id)
+            .where(_inbox_filter(user_id, user.hospital_id, owner))
+        )
+
+    # Offers first, then the user's own requests that were taken.
+    return _swap_requests(
+        db,
+        filtered,
+        relations,
+        models.SwapRequest.status != _PENDING,
+        models.Event.date.asc(),
+        models.Event.start_time.asc(),
+        models.SwapRequest.id.asc(),
+    )
+
+
+def _swap_requests(
+    db: Session,
+    filtered: Callable[[Select], Select],
+    relations: AbstractSet[str],
+    *order_by: Any,
+) -> List[SwapRequestRow]:
+    # Relations left out of ``relations`` are not joined or queried; their
+    # fields stay None (or empty) in the rows.
+    owner = aliased(models.User)
+    accepted_by = aliased(models.User)
+    columns: List[Any] = list(_SWAP_COLUMNS)
+    if "event" in relations:
+        columns += _EVENT_COLUMNS
+    if "accepted_by" in relations:
+        columns += [accepted_by.name, accepted_by.email]
+    if "owner" in relations:
+        columns += [owner.name, owner.email]
+    stmt = filtered(select(*columns))
+    if "accepted_by" in relations:
+        stmt = stmt.outerjoin(
+            accepted_by, accepted_by.id == models.SwapRequest.accepted_by_user_id
+        )
+    if "owner" in relations:
+        stmt = stmt.outerjoin(owner, owner.id == models.SwapRequest.user_id)
+    rows = db.execute(stmt.order_by(*order_by)).all()
+    if not rows:
+        return []
+    targets: Dict[int, List[str]] = defaultdict(list)
+    if "targets" in relations:
+        # Targets for the whole page in one query, filtered the same way
+        # rather than with an IN list that grows with the page.
+        target_rows = db.execute(
+            select(
+                models.SwapTarget.swap_request_id, models.SwapTarget.colleague_name
+            )
+            .where(
+                models.SwapTarget.swap_request_id.in_(
+                    filtered(select(models.SwapRequest.id))
+                )
+            )
+            .order_by(models.SwapTarget.id.asc())
+        )
+        for swap_request_id, colleague_name in target_rows:
+            targets[swap_request_id].append(colleague_name)
+
+    swap_width = len(_SWAP_COLUMNS)
+    event_end = swap_width + (len(_EVENT_COLUMNS) if "event" in relations else 0)
+    with_accepted_by = "accepted_by" in relations
+    with_owner = "owner" in relations
+    results = []
+    for row in rows:
+        event = None
+        if event_end > swap_width:
+            event = EventRow(*row[swap_width:event_end])
+        position = event_end
+        accepted_by_names = owner_names = (None, None)
+        if with_accepted_by:
+            accepted_by_names = row[position : position + 2]
+            position += 2
+        if with_owner:
+            owner_names = row[position : position + 2]
+        results.append(
+            SwapRequestRow(
+                *row[:swap_width],
+                event,
+                targets.get(row[0], []),
+                *accepted_by_names,
+                *owner_names,
+            )
+        )
+    return results
+
+
+def bootstrap(
+    db: Session,
+    *,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    inbox_limit: int,
+) -> Optional[Dict[str, Any]]:
+    """The ``BootstrapRead`` payload for ``user_id``, or None if there is none."""
+    latest_worksite = (
+        select(func.max(models.Worksite.id))
+        .where(models.Worksite.user_id == models.User.id)
+        .correlate(models.User)
+        .scalar_subquery()
+    )
+    profile = db.execute(
+        select(
+            models.User.name,
+            models.User.email,
+            models.User.id,
+            models.User.avatar_hash,
+            models.User.legacy_avatar_fallback,
+            models.User.hospital_id,
+            *(getattr(models.Worksite, field) for field in _WORKSITE_FIELDS),
+        )
+        .outerjoin(models.Worksite, models.Worksite.id == latest_worksite)
+        .where(models.User.id == user_id)
+    ).first()
+    if profile is None:
+        return None
+    worksite = dict(zip(_WORKSITE_FIELDS, profile[6:]))
+    events, swap_requests = _month(db, user_id, start_date, end_date)
+    return {
+        "user": {
+            "name": profile.name,
+            "email": profile.email,
+            "id": profile.id,
+            "avatar_url": avatars.url_for(
+                profile.avatar_hash, profile.legacy_avatar_fallback
+            ),
+        },
+        "worksite": worksite if worksite["id"] is not None else None,
+        "start_date": start_date,
+        "end_date": end_date,
+        "events": [_event_payload(row) for row in events],
+        "swap_requests": [_swap_request_payload(row) for row in swap_requests],
+        "inbox": _inbox(db, user_id, profile.hospital_id, inbox_limit),
+        "groups": [
+            row._asdict()
+            for row in db.execute(
+                select(
+                    models.Group.id,
+                    models.Group.name,
+                    models.Group.description,
+                    models.Group.member_count,
+                    models.Group.sharing_count,
+                )
+                .join(
+                    models.GroupMembership,
+                    models.GroupMembership.group_id == models.Group.id,
+                )
+                .where(models.GroupMembership.user_id == user_id)
+                .order_by(models.Group.created_at.desc())
+            )
+        ],
+    }
+
+
+def _month(
+    db: Session, user_id: int, start_date: date, end_date: date
+) -> Tuple[List[EventRow], List[SwapRequestRow]]:
+    # Events left-joined to their pending swap requests and those requests'
+    # targets: one row per event, swap request and target, folded back here.
+    owner = aliased(models.User)
+    accepted_by = aliased(models.User)
+    rows = db.execute(
+        select(
+            *_EVENT_COLUMNS,
+            *_SWAP_COLUMNS,
+            accepted_by.name,
+            accepted_by.email,
+            owner.name,
+            owner.email,
+            models.SwapTarget.colleague_name,
+        )
+        .select_from(models.Event)
+        .outerjoin(
+            models.SwapRequest,
+            and_(
+                models.SwapRequest.event_id == models.Event.id,
+                models.SwapRequest.status == _PENDING,
+            ),
+        )
+        .outerjoin(owner, owner.id == models.SwapRequest.user_id)
+        .outerjoin(accepted_by, accepted_by.id == models.SwapRequest.accepted_by_user_id)
+        .outerjoin(
+            models.SwapTarget,
+            models.SwapTarget.swap_request_id == models.SwapRequest.id,
+        )
+        .where(models.Event.user_id == user_id)
+        .where(models.Event.date >= start_date)
+        .where(models.Event.date <= end_date)
+        .order_by(
+            models.Event.date.asc(),
+            models.Event.start_time.asc(),
+            models.Event.id.asc(),
+            models.SwapRequest.id.asc(),
+            models.SwapTarget.id.asc(),
+        )
+    ).all()
+    event_width = len(_EVENT_COLUMNS)
+    swap_end = event_width + len(_SWAP_COLUMNS)
+    events: Dict[int, EventRow] = {}
+    swaps: Dict[int, SwapRequestRow] = {}
+    for row in rows:
+        event = events.get(row[0])
+        if event is None:
+            event = events[row[0]] = EventRow(*row[:event_width])
+        swap_id = row[event_width]
+        if swap_id is None:
+            continue
+        swap = swaps.get(swap_id)
+        if swap is None:
+            swap = swaps[swap_id] = SwapRequestRow(
+                *row[event_width:swap_end], event, [], *row[swap_end:-1]
+            )
+        if row[-1] is not None:
+            swap.targeted_colleagues.append(row[-1])
+    # Same order as GET /swap-requests.
+    swap_requests = sorted(
+        swaps.values(),
+        key=lambda swap: (swap.event.date, swap.event.start_time, swap.id),
+    )
+    return list(events.values()), swap_requests
+
+
+def _inbox_filter(user_id: int, hospital_id: Optional[int], owner: Any) -> Any:
+    # The inbox rules as one filter on swap requests joined to their event and
+    # ``owner``: upcoming pending requests the user has not answered from
+    # colleagues who target the user, share a group or work at the same
+    # hospital, and the user's own requests that were taken.
+    matches = [
+        exists().where(
+            models.SwapTarget.swap_request_id == models.SwapRequest.id,
+            models.SwapTarget.user_id == user_id,
+        ),
+        exists().where(
+            models.GroupMembership.user_id == models.SwapRequest.user_id,
+            models.GroupMembership.group_id.in_(
+                select(models.GroupMembership.group_id).where(
+                    models.GroupMembership.user_id == user_id
+                )
+            ),
+        ),
+    ]
+    if hospital_id is not None:
+        matches.append(owner.hospital_id == hospital_id)
+    offered = and_(
+        models.SwapRequest.status == _PENDING,
+        models.SwapRequest.user_id != user_id,
+        models.Event.date >= date.today(),
+        models.SwapRequest.id.not_in(
+            select(models.SwapRequestResponse.swap_request_id).where(
+                models.SwapRequestResponse.user_id == user_id
+            )
+        ),
+        or_(*matches),
+    )
+    taken = and_(
+        models.SwapRequest.user_id == user_id,
+        models.SwapRequest.status == _FULFILLED,
+    )
+    return or_(offered, taken)
+
+
+def _inbox(
+    db: Session, user_id: int, hospital_id: Optional[int], limit: int
+) -> Dict[str, Any]:
+    owner = aliased(models.User)
+    rows = db.execute(
+        select(
+            *(getattr(models.SwapRequest, field) for field in _INBOX_FIELDS),
+            owner.name,
+            owner.email,
+            *_EVENT_COLUMNS,
+            func.count().over(),
+        )
+        .join(models.Event, models.Event.id == models.SwapRequest.event_id)
+        .join(owner, owner.id == models.SwapRequest.user_id)
+        .where(_inbox_filter(user_id, hospital_id, owner))
+        .order_by(
+            models.SwapRequest.status != _PENDING,
+            models.Event.date.asc(),
+            models.Event.start_time.asc(),
+            models.SwapRequest.id.asc(),
+        )
+        .limit(limit)
+    ).all()
+    width = len(_INBOX_FIELDS)
+    items = []
+    for row in rows:
+        item = dict(zip(_INBOX_FIELDS, row[:width]))
+        item["owner_name"] = row[width]
+        item["owner_email"] = row[width + 1]
+        item["event"] = _event_payload(EventRow(*row[width + 2 : -1]))
+        items.append(item)
+    return {"count": rows[0][-1] if rows else 0, "items": items}
+
+
+def events_payload(
+    rows: List[EventRow], selection: Optional[fieldsets.Selection] = None
+) -> List[Dict[str, Any]]:
+    payload = [_event_payload(row) for row in rows]
+    return fieldsets.trim(payload, selection) if selection else payload
+
+
+def swap_requests_payload(
+    rows: List[SwapRequestRow], selection: Optional[fieldsets.Selection] = None
+) -> List[Dict[str, Any]]:
+    payload = [_swap_request_payload(row) for row in rows]
+    return fieldsets.trim(payload, selection) if selection else payload
+
+
+def events_json(rows: List[EventRow]) -> bytes:
+    return serialization.dumps(events_payload(rows))
+
+
+def swap_requests_json(rows: List[SwapRequestRow]) -> bytes:
+    return serialization.dumps(swap_requests_payload(rows))
+
+
+def _event_payload(row: EventRow) -> Dict[str, Any]:
+    return {
+        "title": row.title,
+        "date": row.date,
+        "start_time": row.start_time,
+        "end_time": row.end_time,
+        "location": row.location,
+        "event_type": row.event_type,
+        "notes": row.notes,
+        "id": row.id,
+        "created_at": row.created_at,
+        "time_range": models.format_time_range(row.start_time, row.end_time),
+    }
+
+
+def _swap_request_payload(row: SwapRequestRow) -> Dict[str, Any]:
+    return {
+        "event_id": row.event_id,
+        "mode": row.mode,
+        "desired_shift_type": row.desired_shift_type,
+        "available_start_time": row.available_start_time,
+        "available_end_time": row.available_end_time,
+        "available_start_date": row.available_start_date,
+        "available_end_date": row.available_end_date,
+        "visible_to_all": row.visible_to_all,
+        "share_with_staffing_pool": row.share_with_staffing_pool,
+        "notes": row.notes,
+        "id": row.id,
+        "status": row.status,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "event": _event_payload(row.event) if row.event else None,
+        "targeted_colleagues": row.targeted_colleagues,
+        "accepted_by_user_id": row.accepted_by_user_id,
+        "accepted_at": row.accepted_at,
+        "accepted_by_name": row.accepted_by_name,
+        "accepted_by_email": row.accepted_by_email,
+        "owner_name": row.owner_name,
+        "owner_email": row.owner_email,
+    }
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import select as selectors
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "nurseshift_inbox"
+INBOX = "inbox"
+CALENDAR = "calendar"
+QUEUE_SIZE = 100
+# Postgres caps NOTIFY payloads at 8000 bytes; leave room for the message.
+_MAX_RECIPIENTS_PER_NOTIFY = 600
+_PENDING_KEY = "realtime.pending"
+
+
+def _next_version() -> int:
+    # Microsecond timestamps keep versions comparable across workers.
+    return time.time_ns() // 1000
+
+
+Predicate = Callable[[dict], bool]
+
+
+class Broker:
+    """Fans messages out to the subscribers and waiters held by this worker.
+
+    Every message belongs to a topic (``inbox`` or ``calendar``) and carries a
+    version; the broker remembers the latest version per (topic, user) so
+    long-poll requests can tell whether anything changed since a client's
+    last response.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._waiters: Dict[
+            Tuple[str, int], List[Tuple[asyncio.Future, Optional[Predicate]]]
+        ] = defaultdict(list)
+        self._versions: Dict[Tuple[str, int], int] = {}
+        self._baseline = _next_version()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        self._loop = loop
+        if loop is not None:
+            # Changes made before this worker started listening are unknown,
+            # so any older version must be treated as stale.
+            self._baseline = _next_version()
+
+    def version(self, topic: str, user_id: int) -> int:
+        return self._versions.get((topic, user_id), self._baseline)
+
+    async def wait(
+        self,
+        topic: str,
+        user_id: int,
+        since: int,
+        timeout: float,
+        predicate: Optional[Predicate] = None,
+    ) -> int:
+        """Park until ``topic`` changes for ``user_id`` after ``since``.
+
+        Waiters are plain futures, so a parked request holds no thread or
+        database connection. Returns the current version.
+        """
+        key = (topic, user_id)
+        if self.version(topic, user_id) > since:
+            return self.version(topic, user_id)
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, predicate)
+        self._waiters[key].append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[key]
+        return self.version(topic, user_id)
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_ids: Iterable[int], message: dict) -> None:
+        """Deliver ``message`` from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._deliver, tuple(user_ids), message)
+
+    def _deliver(self, user_ids: Tuple[int, ...], message: dict) -> None:
+        topic = message.get("topic", INBOX)
+        version = message.get("version", 0)
+        for user_id in user_ids:
+            key = (topic, user_id)
+            if version > self._versions.get(key, 0):
+                self._versions[key] = version
+            for future, predicate in self._waiters.get(key, ()):
+                if not future.done() and (predicate is None or predicate(message)):
+                    future.set_result(version)
+            for queue in self._subscribers.get(user_id, ()):
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # The client fell behind; make it refetch instead.
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait({"type": "inbox.resync"})
+
+
+broker = Broker()
+
+
+def emit(db: Session, user_ids: Iterable[int], kind: str, swap_request) -> None:
+    """Queue an inbox delta that is delivered once ``db`` commits."""
+    _queue(
+        db,
+        user_ids,
+        {
+            "topic": INBOX,
+            "type": kind,
+            "swap_request_id": swap_request.id,
+            "status": swap_request.status,
+        },
+    )
+
+
+def emit_calendar(
+    db: Session, user_ids: Iterable[int], event_id: int, dates: Iterable[date]
+) -> None:
+    """Queue a calendar change covering ``dates`` for delivery on commit."""
+    _queue(
+        db,
+        user_ids,
+        {
+            "topic": CALENDAR,
+            "type": "calendar.changed",
+            "event_id": event_id,
+            "dates": sorted({day.isoformat() for day in dates}),
+        },
+    )
+
+
+def touches_range(start: date, end: date) -> Predicate:
+    low, high = start.isoformat(), end.isoformat()
+    return lambda message: any(low <= day <= high for day in message.get("dates", ()))
+
+
+def _queue(db: Session, user_ids: Iterable[int], message: dict) -> None:
+    recipients = sorted(set(user_ids))
+    if not recipients:
+        return
+    message["version"] = _next_version()
+    message["sent_at"] = datetime.utcnow().isoformat()
+    db.info.setdefault(_PENDING_KEY, []).append((recipients, message))
+
+
+def _uses_notify(session: Session) -> bool:
+    bind = session.get_bind()
+    return bind.dialect.name == "postgresql"
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_pending(session: Session) -> None:
+    pending = session.info.get(_PENDING_KEY)
+    if not pending or not _uses_notify(session):
+        return
+    # NOTIFY is transactional, so listeners only hear about committed work.
+    for recipients, message in session.info.pop(_PENDING_KEY):
+        for start in range(0, len(recipients), _MAX_RECIPIENTS_PER_NOTIFY):
+            payload = json.dumps(
+                {
+                    "u": recipients[start : start + _MAX_RECIPIENTS_PER_NOTIFY],
+                    "m": message,
+                },
+                separators=(",", ":"),
+            )
+            session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    for recipients, message in session.info.pop(_PENDING_KEY, ()):
+        broker.publish(recipients, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class _NotificationListener(threading.Thread):
+    """Relays Postgres notifications from every worker into the local broker."""
+
+    def __init__(self) -> None:
+        super().__init__(name="realtime-listener", daemon=True)
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Realtime listener lost its connection")
+                self._stopped.wait(5)
+
+    def _listen(self) -> None:
+        connection = engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while not self._stopped.is_set():
+                ready, _, _ = selectors.select([dbapi_connection], [], [], 5)
+                if not ready:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    self._dispatch(notification.payload)
+        finally:
+            # The connection was switched to autocommit; never hand it back.
+            connection.invalidate()
+
+    @staticmethod
+    def _dispatch(payload: str) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed realtime payload")
+            return
+        broker.publish(data["u"], data["m"])
+
+
+_listeners: List[_NotificationListener] = []
+
+
+def start(loop: asyncio.AbstractEventLoop) -> None:
+    broker.bind(loop)
+    if engine.dialect.name == "postgresql":
+        listener = _NotificationListener()
+        listener.start()
+        _listeners.append(listener)
+
+
+def stop() -> None:
+    while _listeners:
+        _listeners.pop().stop()
+    broker.bind(None)
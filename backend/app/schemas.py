@@ -1,6 +1,6 @@
 from datetime import date, datetime, time
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field, validator
 
@@ -41,6 +41,7 @@ class SwapStatus(str, Enum):
     pending = "pending"
     retracted = "retracted"
     fulfilled = "fulfilled"
+    expired = "expired"
 
 
 class SwapRequestBase(BaseModel):
@@ -85,6 +86,32 @@ class SwapRequestRead(SwapRequestBase):
         from_attributes = True
 
 
+class SwapCandidateRead(BaseModel):
+    event: EventRead
+    owner_id: int
+    owner_name: str
+    days_from_original: int
+    colleague_available: bool = Field(
+        ..., description="Whether the colleague is free to work the original shift"
+    )
+
+
+class SwapMatchKind(str, Enum):
+    pair = "pair"
+    cycle = "cycle"
+
+
+class SwapMatchRead(BaseModel):
+    kind: SwapMatchKind
+    swap_request_ids: List[int]
+
+
+class SwapMatchReport(BaseModel):
+    pending: int
+    compatible_edges: int
+    matches: List[SwapMatchRead] = Field(default_factory=list)
+
+
 class ColleagueStatus(str, Enum):
     invited = "invited"
     accepted = "accepted"
@@ -99,7 +126,9 @@ class ColleagueBase(BaseModel):
 
 
 class ColleagueCreate(ColleagueBase):
-    pass
+    user_id: Optional[int] = Field(
+        None, description="Owner of the colleague entry (defaults to the demo user)"
+    )
 
 
 class ColleagueRead(ColleagueBase):
@@ -118,12 +147,14 @@ class WorksiteBase(BaseModel):
 
 
 class WorksiteCreate(WorksiteBase):
-    user_id: int
+    user_id: Optional[int] = None
 
 
 class WorksiteRead(WorksiteBase):
     id: int
     user_id: int
+    hospital_id: Optional[int] = None
+    department_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -148,6 +179,34 @@ class GroupInviteCreate(GroupInviteBase):
         return value.strip()
 
 
+class GroupInviteRosterRow(GroupInviteBase):
+    invitee_name: str = Field("", max_length=255)
+
+
+class GroupInviteBulkStatus(str, Enum):
+    invited = "invited"
+    already_invited = "already_invited"
+    already_member = "already_member"
+    duplicate = "duplicate"
+    invalid = "invalid"
+
+
+class GroupInviteBulkResult(BaseModel):
+    row: int
+    status: GroupInviteBulkStatus
+    invite_id: Optional[int] = None
+    invitee_user_id: Optional[int] = None
+    reason: Optional[str] = None
+
+
+class GroupInviteBulkReport(BaseModel):
+    group_id: int
+    invited: int
+    skipped: int
+    failed: int
+    rows: List[GroupInviteBulkResult] = Field(default_factory=list)
+
+
 class GroupInviteRead(GroupInviteBase):
     id: int
     group_id: int
@@ -160,12 +219,12 @@ class GroupInviteRead(GroupInviteBase):
 
 
 class GroupInviteDecision(BaseModel):
-    user_id: int
+    user_id: Optional[int] = None
 
 
 class GroupInviteTokenAccept(BaseModel):
     token: str
-    user_id: int
+    user_id: Optional[int] = None
 
 
 class GroupInviteLinkCreate(BaseModel):
@@ -205,7 +264,7 @@ class GroupInvitePreviewResponse(BaseModel):
 
 
 class GroupInviteRedeemRequest(BaseModel):
-    user_id: str = Field(..., alias="userId")
+    user_id: Optional[int] = Field(None, alias="userId")
 
     model_config = {"populate_by_name": True}
 
@@ -242,7 +301,7 @@ class GroupSharedRow(BaseModel):
 
 
 class GroupShareCreate(BaseModel):
-    user_id: int
+    user_id: Optional[int] = None
     start_date: date
     end_date: date
 
@@ -257,7 +316,7 @@ class GroupShareCreate(BaseModel):
 
 
 class GroupShareCancel(BaseModel):
-    user_id: int
+    user_id: Optional[int] = None
     start_date: date
     end_date: date
 
@@ -265,6 +324,8 @@ class GroupShareCancel(BaseModel):
 class GroupRead(GroupBase):
     id: int
     invite_message: str
+    member_count: int = 0
+    sharing_count: int = 0
     invites: List[GroupInviteRead] = Field(default_factory=list)
     shared_calendar: List[GroupSharedRow] = Field(default_factory=list)
 
@@ -294,7 +355,7 @@ class UserAvatarUpdate(BaseModel):
 
 
 class SwapDecision(BaseModel):
-    user_id: int
+    user_id: Optional[int] = None
 
 
 class LoginRequest(BaseModel):
@@ -329,4 +390,67 @@ class RegisterRequest(BaseModel):
         return value
 
 
+
+class BatchRequestItem(BaseModel):
+    id: str = Field(..., max_length=64)
+    method: Literal["GET"] = "GET"
+    path: str = Field(..., max_length=2048, pattern=r"^/")
+    query: Dict[str, Union[str, int, float, bool, List[str]]] = Field(
+        default_factory=dict
+    )
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem] = Field(..., min_length=1, max_length=20)
+
+
+class BatchResponseItem(BaseModel):
+    id: str
+    status: int
+    headers: Dict[str, str]
+    body: Any
+
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResponseItem]
+
+
+
+class BootstrapInboxItem(BaseModel):
+    id: int
+    event_id: int
+    mode: SwapMode
+    desired_shift_type: str
+    status: SwapStatus
+    notes: Optional[str] = None
+    created_at: datetime
+    owner_name: Optional[str] = None
+    owner_email: Optional[str] = None
+    event: EventRead
+
+
+class BootstrapInbox(BaseModel):
+    count: int
+    items: List[BootstrapInboxItem]
+
+
+class BootstrapGroup(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    member_count: int
+    sharing_count: int
+
+
+class BootstrapRead(BaseModel):
+    user: UserRead
+    worksite: Optional[WorksiteRead] = None
+    start_date: date
+    end_date: date
+    events: List[EventRead]
+    swap_requests: List[SwapRequestRead]
+    inbox: BootstrapInbox
+    groups: List[BootstrapGroup]
+
+
 GroupRead.model_rebuild()
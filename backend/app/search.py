@@ -0,0 +1,75 @@
+"""In-memory typeahead index for databases without ``pg_trgm``.
+
+Each entry's ``search_text`` (see ``models.search_text``) is split into words
+and indexed under the words' first one to three characters (edge n-grams). A
+query token narrows the candidates to one posting list, and candidates are
+confirmed with a substring test, so matching is "some word starts with every
+token", the same rule the Postgres path expresses as ``LIKE '% tok%'``.
+Results come back in ``(name, id)`` order to support keyset cursors.
+"""
+
+import threading
+from bisect import bisect_right, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import models
+
+SortKey = Tuple[str, int]
+
+_PREFIX_LENGTH = 3
+
+
+class NgramIndex:
+    def __init__(self, entries: Iterable[Tuple[int, str, Optional[str]]] = ()) -> None:
+        self._texts: Dict[int, str] = {}
+        # Posting lists are kept sorted by (name, id), so a search walks the
+        # shortest one in result order and stops as soon as the page is full.
+        self._postings: Dict[str, List[SortKey]] = defaultdict(list)
+        self._lock = threading.Lock()
+        for entry_id, name, text in sorted(entries, key=lambda row: (row[1], row[0])):
+            for prefix in self._register(entry_id, text):
+                self._postings[prefix].append((name, entry_id))
+
+    def add(self, entry_id: int, name: str, text: Optional[str]) -> None:
+        with self._lock:
+            if entry_id in self._texts:
+                return
+            for prefix in self._register(entry_id, text):
+                insort(self._postings[prefix], (name, entry_id))
+
+    def search(
+        self, query: str, *, after: Optional[SortKey], limit: int
+    ) -> List[SortKey]:
+        """Return up to ``limit`` matching sort keys that come after ``after``."""
+        tokens = models.search_words(query)
+        if not tokens:
+            return []
+        needles = [" " + token for token in tokens]
+        page: List[SortKey] = []
+        with self._lock:
+            candidates = min(
+                (self._postings.get(token[:_PREFIX_LENGTH], []) for token in tokens),
+                key=len,
+            )
+            start = bisect_right(candidates, after) if after else 0
+            for position in range(start, len(candidates)):
+                key = candidates[position]
+                text = self._texts[key[1]]
+                if all(needle in text for needle in needles):
+                    page.append(key)
+                    if len(page) == limit:
+                        break
+        return page
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _register(self, entry_id: int, text: Optional[str]) -> Set[str]:
+        text = text or ""
+        self._texts[entry_id] = text
+        return {
+            word[:length]
+            for word in text.split()
+            for length in range(1, _PREFIX_LENGTH + 1)
+        }
@@ -0,0 +1,270 @@
+"""JSON encoding for API responses.
+
+``JSON_BACKEND`` picks the encoder: ``orjson``, ``msgspec`` or ``json`` (the
+standard library, with starlette's settings). ``auto``, the default, takes the
+first one installed in that order. Every backend writes compact UTF-8 and
+encodes dates, times and enums natively, so callers can hand over plain Python
+values without converting them first.
+
+Endpoints whose models are built by the server from database rows can return
+``model_response(...)``: the models (usually made with ``model_construct``) are
+dumped and encoded directly instead of being validated again against the
+route's ``response_model``, which then only documents the shape.
+
+List endpoints also speak MessagePack (``Accept: application/msgpack``) and,
+when ``cbor2`` is installed, CBOR (``Accept: application/cbor``). The binary
+formats carry the same keys with compact values: dates as days since
+1970-01-01, times as minutes past midnight (fractional only when the time has
+seconds), datetimes as milliseconds since the epoch (naive values are UTC) and
+enums as their values. Clients that ask for a format this server cannot
+produce get JSON.
+"""
+
+import calendar
+import enum
+import hashlib
+import json
+import logging
+from datetime import date, datetime, time
+from functools import partial
+from typing import Any, Callable, Collection, Dict, List, Mapping, Optional, Union
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from .config import settings
+
+try:  # optional accelerated encoders
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depends on the environment
+    msgspec = None
+try:  # optional binary formats
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - depends on the environment
+    cbor2 = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_stdlib_dumps: Callable[[Any], str] = partial(
+    json.dumps,
+    ensure_ascii=False,
+    allow_nan=False,
+    separators=(",", ":"),
+    default=_default,
+)
+
+
+# Installed encoders, fastest first.
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+if orjson is not None:
+    ENCODERS["orjson"] = orjson.dumps
+if msgspec is not None:
+    ENCODERS["msgspec"] = msgspec.json.Encoder().encode
+ENCODERS["json"] = lambda content: _stdlib_dumps(content).encode("utf-8")
+
+
+def _select_backend(name: str) -> str:
+    if name == "auto":
+        return next(iter(ENCODERS))
+    if name not in ENCODERS:
+        logger.warning("JSON backend %r is not installed; using the stdlib", name)
+        return "json"
+    return name
+
+
+backend = _select_backend(settings.json_backend)
+dumps: Callable[[Any], bytes] = ENCODERS[backend]
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _compact(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # utctimetuple leaves naive values as they are, i.e. treats them as UTC.
+        seconds = calendar.timegm(value.utctimetuple())
+        return seconds * 1000 + value.microsecond // 1000
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    if isinstance(value, time):
+        minutes = value.hour * 60 + value.minute
+        if value.second or value.microsecond:
+            return minutes + (value.second + value.microsecond / 1_000_000) / 60
+        return minutes
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _compacted(value: Any) -> Any:
+    # cbor2 has its own date and datetime tags, which ``default`` cannot
+    # override, so the values are converted before encoding.
+    if isinstance(value, dict):
+        return {key: _compacted(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_compacted(item) for item in value]
+    if isinstance(value, (date, time, enum.Enum)):
+        return _compact(value)
+    return value
+
+
+# Binary formats by media type, in the order preferred when Accept ties.
+BINARY_ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+if msgpack is not None:
+    BINARY_ENCODERS[MSGPACK] = partial(msgpack.packb, default=_compact)
+if cbor2 is not None:
+    BINARY_ENCODERS[CBOR] = lambda content: cbor2.dumps(_compacted(content))
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def negotiate(request: Request) -> str:
+    """Media type to answer ``request`` with: a binary format or JSON.
+
+    A binary format is used only when Accept names it, and JSON wins ties.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return JSON
+    explicit: Dict[str, float] = {}
+    wildcard = 0.0
+    for part in accept.split(","):
+        media_type, *params = (piece.strip().lower() for piece in part.split(";"))
+        quality = _quality(params)
+        if media_type in ("*/*", "application/*"):
+            wildcard = max(wildcard, quality)
+            continue
+        media_type = _ALIASES.get(media_type, media_type)
+        explicit[media_type] = max(explicit.get(media_type, 0.0), quality)
+    # q has at most three decimals, so this ranks JSON reached only through a
+    # wildcard just below a binary type named with the same quality.
+    best, best_quality = JSON, explicit.get(JSON, wildcard - 0.0005)
+    for media_type in BINARY_ENCODERS:
+        quality = explicit.get(media_type, 0.0)
+        if quality > max(best_quality, 0.0):
+            best, best_quality = media_type, quality
+    return best
+
+
+def _quality(params: List[str]) -> float:
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def encode(payload: Any, media_type: str = JSON) -> bytes:
+    if media_type == JSON:
+        return dumps(payload)
+    return BINARY_ENCODERS[media_type](payload)
+
+
+def payload_response(
+    payload: Any,
+    *,
+    media_type: str = JSON,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    if media_type == JSON:
+        return FastJSONResponse(payload, status_code=status_code, headers=headers)
+    return Response(
+        encode(payload, media_type),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
+
+
+def model_response(
+    content: Union[BaseModel, List[BaseModel]],
+    *,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+    request: Optional[Request] = None,
+    fields: Optional[Collection[str]] = None,
+) -> Response:
+    """Send server-built models; pass ``request`` to negotiate the format.
+
+    ``fields`` limits the top-level keys, for a sparse fieldset.
+    """
+    include = set(fields) if fields is not None else None
+    if isinstance(content, list):
+        payload: Any = [
+            item.model_dump(by_alias=True, include=include) for item in content
+        ]
+    else:
+        payload = content.model_dump(by_alias=True, include=include)
+    if request is None:
+        return FastJSONResponse(payload, status_code=status_code, headers=headers)
+    return negotiated_response(
+        request, payload, status_code=status_code, headers=headers
+    )
+
+
+def etag(body: bytes) -> str:
+    # Weak: the compression middleware may re-encode the bytes on the way out.
+    return 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(request: Request, tag: str) -> bool:
+    """Whether ``If-None-Match`` names ``tag`` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def negotiated_response(
+    request: Request,
+    payload: Any,
+    *,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    return payload_response(
+        payload,
+        media_type=negotiate(request),
+        status_code=status_code,
+        headers={**(headers or {}), "Vary": "Accept"},
+    )
@@ -0,0 +1,137 @@
+"""Request coalescing ("single flight") for identical concurrent GETs.
+
+When many clients ask for the same thing at once, e.g. a whole group opening
+``/group-shared`` for the same week after a "schedule is up" message, the
+first request runs and the others wait for it and get a copy of its response
+instead of re-running the same queries. Only requests that are in flight at
+the same time are coalesced: nothing is cached once the response is sent.
+
+Two requests are identical when they have the same path, the same query
+parameters (in any order between names), and the same ``Authorization``,
+``Cookie``, ``Accept``, ``Accept-Encoding``, ``If-None-Match`` and
+``If-Modified-Since`` headers, so a response is only ever shared within one
+principal and representation, and a 304 only with a request that sent the same
+validator. Long polls
+(``wait``) are not coalesced, since each waits for its own change. Event
+streams and 5xx responses are not shared: requests waiting on one run their
+own. Coalesced requests are counted per route in ``/metrics``.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from . import metrics
+from .config import settings
+
+# Request headers that change who is asking or what representation they get,
+# and conditional headers, which can turn the response into an empty 304.
+KEY_HEADERS = frozenset(
+    {
+        b"authorization",
+        b"cookie",
+        b"accept",
+        b"accept-encoding",
+        b"if-none-match",
+        b"if-modified-since",
+    }
+)
+EVENT_STREAM = b"text/event-stream"
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...], Tuple[Tuple[bytes, bytes], ...]]
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = asyncio.Event()
+        # The leader's response messages, or None if they cannot be shared.
+        self.messages: Optional[List[dict]] = None
+        self.route = None
+
+
+def _key(scope) -> Optional[_Key]:
+    pairs = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    if any(name == "wait" and value not in ("", "0") for name, value in pairs):
+        return None
+    # Stable sort: values of a repeated parameter keep their order.
+    query = tuple(sorted(pairs, key=lambda pair: pair[0]))
+    headers = tuple(
+        sorted(pair for pair in scope["headers"] if pair[0] in KEY_HEADERS)
+    )
+    return scope["path"], query, headers
+
+
+class SingleFlightMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.flights: Dict[_Key, _Flight] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not settings.single_flight_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = _key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        flight = self.flights.get(key)
+        if flight is not None:
+            await flight.done.wait()
+            if flight.messages is not None:
+                scope["route"] = flight.route
+                stats = metrics.current()
+                if stats is not None:
+                    stats.coalesced = True
+                for message in flight.messages:
+                    await send(message)
+                return
+            # The leader's response could not be shared; this one runs alone.
+            await self.app(scope, receive, send)
+            return
+        await self._lead(key, scope, receive, send)
+
+    async def _lead(self, key: _Key, scope, receive, send) -> None:
+        flight = self.flights[key] = _Flight()
+        messages: List[dict] = []
+        status = 500
+
+        def release(shared: bool) -> None:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            if shared:
+                flight.messages = messages
+                flight.route = scope.get("route")
+            flight.done.set()
+
+        async def capture(message: dict) -> None:
+            nonlocal status
+            if flight.done.is_set():
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", [])).get(
+                    b"content-type", b""
+                )
+                if content_type.startswith(EVENT_STREAM):
+                    release(False)
+                    await send(message)
+                    return
+            messages.append(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                # Published before the leader's own send, so waiting requests
+                # are not held up by a slow client.
+                release(status < 500)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            if not flight.done.is_set():
+                release(False)
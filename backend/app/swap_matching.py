@@ -0,0 +1,307 @@
+"""Pure helpers for matching swap request constraints against shifts."""
+
+from bisect import bisect_left
+from collections import deque
+from datetime import date, time, timedelta
+from typing import (
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_WINDOW_DAYS = 14
+
+_GENERIC_WORDS = frozenset({"shift", "shifts"})
+_ANY_SHIFT = frozenset({"", "any", "anything", "open", "any shift"})
+_DAYPARTS = ("day", "evening", "night")
+
+
+def minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def shift_interval(day: date, start: time, end: time) -> Tuple[int, int]:
+    """Absolute minute interval; overnight shifts roll into the next day."""
+    base = day.toordinal() * MINUTES_PER_DAY
+    begin = base + minutes(start)
+    finish = base + minutes(end)
+    if finish <= begin:
+        finish += MINUTES_PER_DAY
+    return begin, finish
+
+
+def request_date_range(
+    event_date: date,
+    available_start_date: Optional[date],
+    available_end_date: Optional[date],
+    window_days: int = DEFAULT_WINDOW_DAYS,
+) -> Tuple[date, date]:
+    start = available_start_date or event_date - timedelta(days=window_days)
+    end = available_end_date or max(start, event_date) + timedelta(days=window_days)
+    return start, end
+
+
+def fits_time_window(
+    start: time,
+    end: time,
+    window_start: Optional[time],
+    window_end: Optional[time],
+) -> bool:
+    if window_start is None and window_end is None:
+        return True
+    lower = minutes(window_start) if window_start is not None else 0
+    upper = minutes(window_end) if window_end is not None else MINUTES_PER_DAY
+    if upper <= lower:
+        upper += MINUTES_PER_DAY
+    begin = minutes(start)
+    finish = minutes(end)
+    if finish <= begin:
+        finish += MINUTES_PER_DAY
+    # A shift starting after midnight can still sit inside an overnight window.
+    for offset in (0, MINUTES_PER_DAY):
+        if lower <= begin + offset and finish + offset <= upper:
+            return True
+    return False
+
+
+def shift_type_tokens(desired: Optional[str]) -> FrozenSet[str]:
+    normalized = _normalize(desired)
+    if normalized in _ANY_SHIFT:
+        return frozenset()
+    return frozenset(normalized.split()) - _GENERIC_WORDS
+
+
+def daypart(start: time) -> str:
+    hour = start.hour
+    if 5 <= hour < 12:
+        return "day"
+    if 12 <= hour < 18:
+        return "evening"
+    return "night"
+
+
+def matches_shift_type(
+    tokens: FrozenSet[str], title: str, event_type: str, start: time
+) -> bool:
+    if not tokens:
+        return True
+    words = set(_normalize(f"{title} {event_type}").split())
+    if tokens <= words:
+        return True
+    # Fall back to the time of day when the label is not descriptive,
+    # e.g. a "Regular Shift" starting at 07:00 satisfies "Day shift".
+    remaining = tokens - words
+    return remaining <= {daypart(start)} and not words & set(_DAYPARTS)
+
+
+def overlaps_any(
+    intervals: Sequence[Tuple[int, int]],
+    starts: List[int],
+    begin: int,
+    end: int,
+    ignore: Optional[Tuple[int, int]] = None,
+) -> bool:
+    """Check ``[begin, end)`` against ``intervals`` sorted by start.
+
+    ``starts`` is the parallel list of interval starts used for bisection and
+    ``ignore`` skips one interval, typically the shift being swapped away.
+    """
+    index = bisect_left(starts, end)
+    while index > 0:
+        index -= 1
+        other_begin, other_end = intervals[index]
+        if other_end > begin and intervals[index] != ignore:
+            return True
+        # Intervals are short (a single shift), so anything starting more than
+        # a day before ``begin`` cannot reach it.
+        if other_begin < begin - MINUTES_PER_DAY:
+            return False
+    return False
+
+
+def maximum_matching(adjacency: Mapping[Hashable, Iterable[Hashable]]) -> Dict:
+    """Maximum cardinality matching of an undirected graph.
+
+    Runs Edmonds' blossom algorithm per connected component, seeded with a
+    greedy matching so only the leftover free vertices need a search. Returns
+    a mapping containing both directions of every matched pair.
+    """
+    matched: Dict = {}
+    seen: Set = set()
+    for start in adjacency:
+        if start in seen:
+            continue
+        component = _component(adjacency, start)
+        seen.update(component)
+        if len(component) > 1:
+            matched.update(_match_component(adjacency, component))
+    return matched
+
+
+def find_three_cycles(
+    out_edges: Mapping[Hashable, Set[Hashable]],
+    available: Iterable[Hashable],
+    owners: Mapping[Hashable, Hashable],
+) -> List[Tuple[Hashable, Hashable, Hashable]]:
+    """Greedily pick vertex-disjoint ``a -> b -> c -> a`` cycles.
+
+    Every member of a cycle must belong to a different owner.
+    """
+    free = set(available)
+    cycles: List[Tuple[Hashable, Hashable, Hashable]] = []
+    for first in sorted(free):
+        if first not in free:
+            continue
+        found = None
+        for second in sorted(out_edges.get(first, ())):
+            if second not in free or owners[second] == owners[first]:
+                continue
+            for third in sorted(out_edges.get(second, ())):
+                if (
+                    third in free
+                    and third != first
+                    and owners[third] not in (owners[first], owners[second])
+                    and first in out_edges.get(third, ())
+                ):
+                    found = (first, second, third)
+                    break
+            if found:
+                break
+        if found:
+            cycles.append(found)
+            free.difference_update(found)
+    return cycles
+
+
+def _component(adjacency: Mapping, start: Hashable) -> List:
+    component = [start]
+    visited = {start}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbour in adjacency.get(node, ()):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                component.append(neighbour)
+                queue.append(neighbour)
+    return component
+
+
+def _match_component(adjacency: Mapping, component: List) -> Dict:
+    index = {node: position for position, node in enumerate(component)}
+    size = len(component)
+    graph = [
+        sorted(index[neighbour] for neighbour in adjacency[node] if neighbour != node)
+        for node in component
+    ]
+    match = [-1] * size
+    for vertex in range(size):
+        if match[vertex] == -1:
+            for neighbour in graph[vertex]:
+                if match[neighbour] == -1:
+                    match[vertex] = neighbour
+                    match[neighbour] = vertex
+                    break
+    # A vertex without an augmenting path never gains one later, and the
+    # whole alternating tree of a failed search can be dropped for good, so
+    # every free vertex is searched at most once.
+    dead: Set[int] = set()
+    for root in range(size):
+        if match[root] == -1:
+            end, parent = _find_augmenting_path(graph, match, root, dead)
+            while end != -1:
+                previous = parent[end]
+                following = match[previous]
+                match[end] = previous
+                match[previous] = end
+                end = following
+    return {
+        component[vertex]: component[partner]
+        for vertex, partner in enumerate(match)
+        if partner != -1
+    }
+
+
+def _find_augmenting_path(
+    graph: List[List[int]], match: List[int], root: int, dead: Set[int]
+) -> Tuple[int, Dict[int, int]]:
+    # Per-search state lives in dicts so a search only pays for the part of
+    # the component it actually reaches.
+    parent: Dict[int, int] = {}
+    base: Dict[int, int] = {}
+    members: Dict[int, List[int]] = {}
+    used = {root}
+
+    def base_of(vertex: int) -> int:
+        return base.get(vertex, vertex)
+
+    def lowest_common_ancestor(first: int, second: int) -> int:
+        marked = set()
+        while True:
+            first = base_of(first)
+            marked.add(first)
+            if match[first] == -1:
+                break
+            first = parent[match[first]]
+        while True:
+            second = base_of(second)
+            if second in marked:
+                return second
+            second = parent[match[second]]
+
+    def mark_path(vertex: int, ancestor: int, child: int, blossom: Set[int]) -> None:
+        while base_of(vertex) != ancestor:
+            blossom.add(base_of(vertex))
+            blossom.add(base_of(match[vertex]))
+            parent[vertex] = child
+            child = match[vertex]
+            vertex = parent[match[vertex]]
+
+    queue = deque([root])
+    while queue:
+        vertex = queue.popleft()
+        for neighbour in graph[vertex]:
+            if neighbour in dead or match[vertex] == neighbour:
+                continue
+            if base.get(vertex, vertex) == base.get(neighbour, neighbour):
+                continue
+            if neighbour == root or (
+                match[neighbour] != -1 and match[neighbour] in parent
+            ):
+                ancestor = lowest_common_ancestor(vertex, neighbour)
+                blossom: Set[int] = set()
+                mark_path(vertex, ancestor, neighbour, blossom)
+                mark_path(neighbour, ancestor, vertex, blossom)
+                merged = members.setdefault(ancestor, [ancestor])
+                for inner in blossom:
+                    if inner == ancestor:
+                        continue
+                    for other in members.pop(inner, [inner]):
+                        base[other] = ancestor
+                        merged.append(other)
+                        if other not in used:
+                            used.add(other)
+                            queue.append(other)
+            elif neighbour not in parent:
+                parent[neighbour] = vertex
+                if match[neighbour] == -1:
+                    return neighbour, parent
+                used.add(match[neighbour])
+                queue.append(match[neighbour])
+    dead.update(used)
+    dead.update(parent)
+    return -1, parent
+
+
+def _normalize(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return " ".join(value.lower().replace("_", " ").replace("-", " ").split())
@@ -0,0 +1,117 @@
+"""App launch: six separate GETs versus one ``POST /batch``.
+
+Replays the requests the Flutter client makes on launch (month events and swap
+requests, inbox, groups, colleagues and worksites) against a running API three
+ways:
+
+* ``sequential``: one after another, as ``CalendarApiClient`` does today;
+* ``parallel``: all at once on separate connections;
+* ``batch``: a single ``POST /batch``.
+
+``--rtt-ms`` adds that much client-side delay to every round trip to model a
+slow hospital Wi-Fi link (a local server has almost none). Prints the median
+wall time of each mode over ``--rounds``.
+
+Usage:
+    python scripts/bench_batch.py --base-url http://127.0.0.1:8000 --user-id 1 \\
+        --rtt-ms 150
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+import httpx
+
+
+def _launch_requests(user_id: int, month: date) -> List[Dict]:
+    last_day = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    window = {
+        "start_date": month.isoformat(),
+        "end_date": (last_day - timedelta(days=1)).isoformat(),
+    }
+    return [
+        {"id": "events", "path": "/events", "query": {**window, "user_id": user_id}},
+        {
+            "id": "swapRequests",
+            "path": "/swap-requests",
+            "query": {**window, "status": "pending", "user_id": user_id},
+        },
+        {"id": "inbox", "path": "/inbox/swap-requests", "query": {"user_id": user_id}},
+        {"id": "groups", "path": "/group-shared", "query": window},
+        {"id": "colleagues", "path": "/colleagues", "query": {"user_id": user_id}},
+        {"id": "worksites", "path": "/worksites", "query": {"user_id": user_id}},
+    ]
+
+
+def _median_ms(run: Callable[[], None], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Launch requests vs POST /batch.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--month", type=date.fromisoformat, default=None)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    month = args.month or date.today().replace(day=1)
+    requests = _launch_requests(args.user_id, month)
+    delay = args.rtt_ms / 1000
+
+    def wait_rtt(_request: httpx.Request) -> None:
+        time.sleep(delay)
+
+    with httpx.Client(
+        base_url=args.base_url,
+        timeout=60,
+        event_hooks={"request": [wait_rtt]},
+        limits=httpx.Limits(max_connections=len(requests)),
+    ) as client:
+
+        def get(item: Dict) -> None:
+            client.get(item["path"], params=item["query"]).raise_for_status()
+
+        def sequential() -> None:
+            for item in requests:
+                get(item)
+
+        def parallel() -> None:
+            with ThreadPoolExecutor(len(requests)) as pool:
+                list(pool.map(get, requests))
+
+        def batch() -> None:
+            response = client.post("/batch", json={"requests": requests})
+            response.raise_for_status()
+            failed = [
+                item["id"]
+                for item in response.json()["responses"]
+                if item["status"] != 200
+            ]
+            if failed:
+                raise SystemExit(f"batch items failed: {', '.join(failed)}")
+
+        print(f"{len(requests)} launch requests, +{args.rtt_ms:.0f}ms per round trip")
+        for name, run in (
+            ("sequential", sequential),
+            ("parallel", parallel),
+            ("batch", batch),
+        ):
+            run()
+            print(f"  {name:10} p50={_median_ms(run, args.rounds):8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
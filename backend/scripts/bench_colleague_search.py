@@ -0,0 +1,129 @@
+"""Time colleague typeahead against a large per-user directory.
+
+Creates a throwaway user with ``--colleagues`` colleagues (inserted in bulk),
+then runs a set of typeahead queries ``--rounds`` times each through
+``crud.list_colleagues`` and prints p50/p95/max latency per query. When the
+database has ``ix_colleagues_search_text_trgm`` this measures the pg_trgm path;
+otherwise, the in-memory n-gram index (the first search builds it and is
+reported separately). Everything it creates is deleted afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import secrets
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from sqlalchemy import delete, insert, text  # type: ignore
+
+from app.database import SessionLocal  # type: ignore
+from app import crud, models  # type: ignore
+
+FIRST = ["Ana", "Ben", "Chloe", "Diego", "Emma", "Farah", "Grace", "Hiro", "Ines"]
+LAST = ["Lee", "Lopez", "Martin", "Nguyen", "Okafor", "Patel", "Rossi", "Smith"]
+DEPARTMENTS = ["ICU", "Emergency", "Oncology", "Pediatrics", "Cardiology", "NICU"]
+FACILITIES = ["St. Mary", "General Hospital", "Mercy Medical", "Westside Clinic"]
+QUERIES = ["a", "em", "gra", "lopez", "icu", "mercy", "chloe nguyen", "zzz"]
+
+
+def seed(session, owner_id: int, count: int) -> None:
+    rows = []
+    for index in range(count):
+        name = f"{random.choice(FIRST)} {random.choice(LAST)} {index}"
+        email = f"{name.replace(' ', '.').lower()}@example.com"
+        department = random.choice(DEPARTMENTS)
+        facility = random.choice(FACILITIES)
+        rows.append(
+            {
+                "user_id": owner_id,
+                "name": name,
+                "email": email,
+                "department": department,
+                "facility": facility,
+                "status": "invited",
+                "search_text": models.search_text(name, email, department, facility),
+            }
+        )
+    for start in range(0, len(rows), 5000):
+        session.execute(insert(models.Colleague), rows[start : start + 5000])
+    session.commit()
+    # Plan against real statistics, as autovacuum would after a bulk load.
+    session.execute(text("ANALYZE colleagues"))
+    session.commit()
+
+
+def has_trigram_index(session) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    return (
+        session.scalar(text("SELECT to_regclass('ix_colleagues_search_text_trgm')"))
+        is not None
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Colleague typeahead benchmark.")
+    parser.add_argument("--colleagues", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    trigram = has_trigram_index(session)
+    crud.set_colleague_trigram_index(trigram)
+    print("Search path:", "pg_trgm index" if trigram else "in-memory n-gram index")
+    run = secrets.token_hex(4)
+    owner = models.User(
+        name=f"Search bench {run}",
+        email=f"search-{run}@nurseshift.invalid",
+        password_hash="!",
+    )
+    session.add(owner)
+    session.commit()
+    try:
+        started = time.perf_counter()
+        seed(session, owner.id, args.colleagues)
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {args.colleagues} colleagues in {elapsed:.1f}s")
+
+        started = time.perf_counter()
+        crud.list_colleagues(session, user_id=owner.id, query="a", limit=args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"First search: {elapsed:.1f}ms")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                page = crud.list_colleagues(
+                    session, user_id=owner.id, query=query, limit=args.limit
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+                session.expunge_all()
+            timings.sort()
+            print(
+                f"{query!r:16} p50={statistics.median(timings):6.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95) - 1]:6.2f}ms "
+                f"max={timings[-1]:6.2f}ms results={len(page.items)}"
+            )
+    finally:
+        session.rollback()
+        session.execute(
+            delete(models.Colleague).where(models.Colleague.user_id == owner.id)
+        )
+        session.execute(delete(models.User).where(models.User.id == owner.id))
+        session.commit()
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Bytes saved versus CPU spent by response compression, per endpoint.
+
+Fetches uncompressed bodies of the large list endpoints from a running API,
+then compresses each one locally with every installed codec at a range of
+levels. For each it prints the compressed size, the share of bytes saved, and
+the median time to compress over ``--rounds``. The bytes the server actually
+sends for ``Accept-Encoding: br, zstd, gzip`` are shown too, which reflects
+the configured levels and ``COMPRESSION_MINIMUM_SIZE``.
+
+Usage:
+    python scripts/bench_compression.py --base-url http://127.0.0.1:8000 \\
+        --user-id 1 --start 2024-05-01 --end 2024-05-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import zlib
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+Codec = Callable[[bytes, int], bytes]
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return stream.compress(body) + stream.flush()
+
+
+CODECS: Dict[str, Tuple[Codec, List[int]]] = {"gzip": (_gzip, [1, 5, 6, 9])}
+if brotli is not None:
+    CODECS["br"] = (
+        lambda body, level: brotli.compress(body, quality=level),
+        [1, 4, 6, 11],
+    )
+if zstandard is not None:
+    CODECS["zstd"] = (
+        lambda body, level: zstandard.ZstdCompressor(level=level).compress(body),
+        [1, 3, 9, 19],
+    )
+
+
+def _median_ms(run: Callable[[], object], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def measure(client: httpx.Client, path: str, params: dict, rounds: int) -> None:
+    response = client.get(path, params=params, headers={"Accept-Encoding": "identity"})
+    response.raise_for_status()
+    body = response.content
+    with client.stream(
+        "GET", path, params=params, headers={"Accept-Encoding": "br, zstd, gzip"}
+    ) as served:
+        wire = sum(len(chunk) for chunk in served.iter_raw())
+        coding = served.headers.get("content-encoding", "identity")
+    print(
+        f"{path}: {len(body) / 1024:.1f}KiB, server sent "
+        f"{wire / 1024:.1f}KiB ({coding})"
+    )
+    for name, (compress, levels) in CODECS.items():
+        for level in levels:
+            size = len(compress(body, level))
+            elapsed = _median_ms(lambda: compress(body, level), rounds)
+            print(
+                f"  {name:4} level {level:2}: {size / 1024:8.1f}KiB "
+                f"saved {1 - size / len(body):6.1%} in {elapsed:7.2f}ms "
+                f"({len(body) / 1024 / 1024 / (elapsed / 1000):6.0f}MiB/s)"
+            )
+
+
+def main() -> None:
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Response compression benchmark.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--start", type=date.fromisoformat, default=today)
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=today + timedelta(days=30)
+    )
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    window = {"start_date": args.start.isoformat(), "end_date": args.end.isoformat()}
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        measure(client, "/events", {**window, "user_id": args.user_id}, args.rounds)
+        measure(
+            client, "/swap-requests", {**window, "user_id": args.user_id}, args.rounds
+        )
+        measure(client, "/group-shared", window, args.rounds)
+        measure(client, "/colleagues", {"user_id": args.user_id}, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Full versus sparse list responses: bytes, latency and SQL statements.
+
+Requests each list endpoint from a running API with its full payload and
+with the sparse fieldsets a calendar or inbox screen needs. For each it prints
+the body size, the median latency over ``--rounds``, and the SQL statements
+per request as counted by ``/metrics``.
+
+Usage:
+    python scripts/bench_fieldsets.py --base-url http://127.0.0.1:8000 \\
+        --user-id 1 --start 2024-05-01 --end 2024-05-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Dict
+
+import httpx
+
+METRIC = re.compile(
+    r'^nurseshift_(http_requests|db_statements)_total'
+    r'\{method="GET",route="([^"]+)"\} (\d+)$'
+)
+
+
+def _counters(client: httpx.Client, route: str) -> Dict[str, int]:
+    response = client.get("/metrics")
+    response.raise_for_status()
+    counters = {"http_requests": 0, "db_statements": 0}
+    for line in response.text.splitlines():
+        match = METRIC.match(line)
+        if match and match.group(2) == route:
+            counters[match.group(1)] = int(match.group(3))
+    return counters
+
+
+def measure(client: httpx.Client, path: str, params: dict, rounds: int) -> None:
+    label = "&".join(
+        f"{name}={value}"
+        for name, value in params.items()
+        if name in ("fields", "include")
+    )
+    response = client.get(path, params=params)
+    response.raise_for_status()
+    before = _counters(client, path)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        client.get(path, params=params).raise_for_status()
+        timings.append((time.perf_counter() - started) * 1000)
+    after = _counters(client, path)
+    requests = after["http_requests"] - before["http_requests"]
+    statements = (after["db_statements"] - before["db_statements"]) / max(requests, 1)
+    print(
+        f"  {label or '(full)':40} {len(response.content) / 1024:8.1f}KiB "
+        f"p50={statistics.median(timings):7.1f}ms {statements:5.1f} statements"
+    )
+
+
+def main() -> None:
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Sparse fieldset benchmark.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--start", type=date.fromisoformat, default=today)
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=today + timedelta(days=30)
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    window = {"start_date": args.start.isoformat(), "end_date": args.end.isoformat()}
+    endpoints = [
+        (
+            "/events",
+            {**window, "user_id": args.user_id},
+            [{"fields": "date,title,time_range,event_type"}],
+        ),
+        (
+            "/swap-requests",
+            {**window, "user_id": args.user_id},
+            [
+                {"fields": "event_id,status,mode"},
+                {"fields": "event_id,status,mode", "include": "event"},
+            ],
+        ),
+        (
+            "/inbox/swap-requests",
+            {"user_id": args.user_id},
+            [{"fields": "status,mode", "include": "event,owner"}],
+        ),
+        (
+            "/group-shared",
+            window,
+            [
+                {"fields": "name,member_count,sharing_count"},
+                {"include": "shared_calendar"},
+            ],
+        ),
+    ]
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        for path, params, sparse in endpoints:
+            print(path)
+            for extra in [{}, *sparse]:
+                measure(client, path, {**params, **extra}, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
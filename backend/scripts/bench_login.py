@@ -0,0 +1,116 @@
+"""Measure login throughput and how much a login storm slows other requests.
+
+Registers ``--users`` throwaway accounts against a running API, then fires
+``--logins`` concurrent logins while probing ``/health`` in parallel. Reports
+logins per second, login latency percentiles and health-check latency.
+
+Usage:
+    python scripts/bench_login.py --base-url http://127.0.0.1:8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import statistics
+import time
+from typing import List
+
+import httpx
+
+PASSWORD = "bench-password"
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _register(client: httpx.AsyncClient, email: str) -> None:
+    response = await client.post(
+        "/auth/register",
+        json={
+            "name": "Login Bench",
+            "email": email,
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+            "accept_privacy": True,
+            "accept_disclaimer": True,
+        },
+    )
+    response.raise_for_status()
+
+
+async def _login(
+    client: httpx.AsyncClient, email: str, latencies: List[float]
+) -> None:
+    started = time.perf_counter()
+    response = await client.post(
+        "/auth/login", json={"email": email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    latencies.append(time.perf_counter() - started)
+
+
+async def _probe(
+    client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]
+) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        (await client.get("/health")).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.02)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Login throughput benchmark.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    run = secrets.token_hex(4)
+    emails = [f"bench-{run}-{index}@nurseshift.invalid" for index in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=120, limits=limits
+    ) as client:
+        await asyncio.gather(*(_register(client, email) for email in emails))
+
+        login_latencies: List[float] = []
+        health_latencies: List[float] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, health_latencies))
+        gate = asyncio.Semaphore(args.concurrency)
+
+        async def one(index: int) -> None:
+            async with gate:
+                await _login(client, emails[index % len(emails)], login_latencies)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    print(f"{args.logins} logins in {elapsed:.2f}s ({args.logins / elapsed:.1f}/s)")
+    print(
+        "login latency  p50={:.0f}ms p95={:.0f}ms".format(
+            statistics.median(login_latencies) * 1000,
+            _percentile(login_latencies, 0.95) * 1000,
+        )
+    )
+    if health_latencies:
+        print(
+            "/health during storm  p50={:.1f}ms p95={:.1f}ms max={:.1f}ms".format(
+                statistics.median(health_latencies) * 1000,
+                _percentile(health_latencies, 0.95) * 1000,
+                max(health_latencies) * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
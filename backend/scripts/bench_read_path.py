@@ -0,0 +1,257 @@
+"""Compare the ORM and Core read paths for the month list endpoints.
+
+Creates a throwaway user with ``--rows`` events, each carrying a pending swap
+request with a target, then builds the ``GET /events`` and
+``GET /swap-requests`` response bodies both ways:
+
+* ``orm``: load entities, build ``EventRead``/``SwapRequestRead``, validate and
+  serialize them as FastAPI's ``response_model`` does, then ``json.dumps``;
+* ``core``: ``app.reads`` NamedTuple rows encoded straight to JSON bytes.
+
+Prints the median latency over ``--rounds`` and the peak traced memory of one
+build. Everything it creates is deleted afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import secrets
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from pydantic import TypeAdapter  # type: ignore
+from sqlalchemy import delete, insert, select  # type: ignore
+from sqlalchemy.orm import selectinload  # type: ignore
+
+from app.database import SessionLocal  # type: ignore
+from app import models, reads, schemas  # type: ignore
+
+EVENTS = TypeAdapter(List[schemas.EventRead])
+SWAP_REQUESTS = TypeAdapter(List[schemas.SwapRequestRead])
+
+
+def _render(adapter: TypeAdapter, items: list) -> bytes:
+    content = adapter.dump_python(adapter.validate_python(items), mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _event_read(event: models.Event) -> schemas.EventRead:
+    return schemas.EventRead(
+        id=event.id,
+        title=event.title,
+        date=event.date,
+        start_time=event.start_time,
+        end_time=event.end_time,
+        location=event.location,
+        event_type=event.event_type,
+        notes=event.notes,
+        created_at=event.created_at,
+        time_range=event.to_time_range(),
+    )
+
+
+def _swap_read(swap: models.SwapRequest) -> schemas.SwapRequestRead:
+    return schemas.SwapRequestRead(
+        id=swap.id,
+        event_id=swap.event_id,
+        mode=schemas.SwapMode(swap.mode),
+        desired_shift_type=swap.desired_shift_type,
+        available_start_time=swap.available_start_time,
+        available_end_time=swap.available_end_time,
+        available_start_date=swap.available_start_date,
+        available_end_date=swap.available_end_date,
+        visible_to_all=swap.visible_to_all,
+        share_with_staffing_pool=swap.share_with_staffing_pool,
+        notes=swap.notes,
+        targeted_colleagues=[target.colleague_name for target in swap.targets],
+        status=schemas.SwapStatus(swap.status),
+        created_at=swap.created_at,
+        updated_at=swap.updated_at,
+        event=_event_read(swap.event),
+        accepted_by_user_id=swap.accepted_by_user_id,
+        accepted_at=swap.accepted_at,
+        accepted_by_name=swap.accepted_by.name if swap.accepted_by else None,
+        accepted_by_email=swap.accepted_by.email if swap.accepted_by else None,
+        owner_name=swap.user.name if swap.user else None,
+        owner_email=swap.user.email if swap.user else None,
+    )
+
+
+def seed(session, owner_id: int, count: int, first_day: date) -> None:
+    now = datetime.utcnow()
+    event_rows = [
+        {
+            "title": f"Shift {index}",
+            "date": first_day + timedelta(days=index % 28),
+            "start_time": clock(7 if index % 2 else 19, 0),
+            "end_time": clock(19 if index % 2 else 7, 0),
+            "location": "Bench ward",
+            "event_type": "day" if index % 2 else "night",
+            "notes": None,
+            "created_at": now,
+            "user_id": owner_id,
+        }
+        for index in range(count)
+    ]
+    for start in range(0, count, 5000):
+        session.execute(insert(models.Event), event_rows[start : start + 5000])
+    event_ids = session.scalars(
+        select(models.Event.id).where(models.Event.user_id == owner_id)
+    ).all()
+    swap_rows = [
+        {
+            "event_id": event_id,
+            "mode": "give_away",
+            "desired_shift_type": "day",
+            "visible_to_all": True,
+            "share_with_staffing_pool": False,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now,
+            "user_id": owner_id,
+        }
+        for event_id in event_ids
+    ]
+    for start in range(0, len(swap_rows), 5000):
+        session.execute(insert(models.SwapRequest), swap_rows[start : start + 5000])
+    swap_ids = session.scalars(
+        select(models.SwapRequest.id).where(models.SwapRequest.user_id == owner_id)
+    ).all()
+    target_rows = [
+        {"swap_request_id": swap_id, "colleague_name": "colleague@example.com"}
+        for swap_id in swap_ids
+    ]
+    for start in range(0, len(target_rows), 5000):
+        session.execute(insert(models.SwapTarget), target_rows[start : start + 5000])
+    session.commit()
+
+
+def measure(label: str, build: Callable[[], bytes], rounds: int) -> None:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = build()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:22} p50={statistics.median(timings):8.1f}ms "
+        f"max={max(timings):8.1f}ms peak={peak / 1024 / 1024:7.1f}MiB "
+        f"body={len(body) / 1024:8.0f}KiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ORM vs Core read path benchmark.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    run = secrets.token_hex(4)
+    owner = models.User(
+        name=f"Read bench {run}",
+        email=f"read-{run}@nurseshift.invalid",
+        password_hash="!",
+    )
+    session.add(owner)
+    session.commit()
+    owner_id = owner.id
+    first_day = date.today() + timedelta(days=400)
+    last_day = first_day + timedelta(days=27)
+    try:
+        seed(session, owner_id, args.rows, first_day)
+        print(f"Seeded {args.rows} events and swap requests")
+
+        def orm_events() -> bytes:
+            events = session.scalars(
+                select(models.Event)
+                .where(models.Event.date >= first_day)
+                .where(models.Event.date <= last_day)
+                .where(models.Event.user_id == owner_id)
+                .order_by(models.Event.date.asc(), models.Event.start_time.asc())
+            ).all()
+            body = _render(EVENTS, [_event_read(event) for event in events])
+            session.expunge_all()
+            return body
+
+        def core_events() -> bytes:
+            rows = reads.list_events(
+                session, start_date=first_day, end_date=last_day, user_id=owner_id
+            )
+            return reads.events_json(rows)
+
+        def orm_swap_requests() -> bytes:
+            # Eager loading so the ORM side is not also paying for N+1 queries.
+            swaps = session.scalars(
+                select(models.SwapRequest)
+                .join(models.Event)
+                .where(models.Event.user_id == owner_id)
+                .where(models.SwapRequest.status == "pending")
+                .options(
+                    selectinload(models.SwapRequest.event),
+                    selectinload(models.SwapRequest.targets),
+                    selectinload(models.SwapRequest.user),
+                    selectinload(models.SwapRequest.accepted_by),
+                )
+                .order_by(
+                    models.Event.date.asc(),
+                    models.Event.start_time.asc(),
+                    models.SwapRequest.id.asc(),
+                )
+            ).all()
+            body = _render(SWAP_REQUESTS, [_swap_read(swap) for swap in swaps])
+            session.expunge_all()
+            return body
+
+        def core_swap_requests() -> bytes:
+            rows = reads.list_swap_requests(
+                session, status="pending", user_id=owner_id
+            )
+            return reads.swap_requests_json(rows)
+
+        if orm_events() != core_events():
+            print("WARNING: /events bodies differ")
+        if orm_swap_requests() != core_swap_requests():
+            print("WARNING: /swap-requests bodies differ")
+        measure("/events orm", orm_events, args.rounds)
+        measure("/events core", core_events, args.rounds)
+        measure("/swap-requests orm", orm_swap_requests, args.rounds)
+        measure("/swap-requests core", core_swap_requests, args.rounds)
+    finally:
+        session.rollback()
+        swap_ids = select(models.SwapRequest.id).where(
+            models.SwapRequest.user_id == owner_id
+        )
+        session.execute(
+            delete(models.SwapTarget).where(
+                models.SwapTarget.swap_request_id.in_(swap_ids)
+            )
+        )
+        session.execute(
+            delete(models.SwapRequest).where(models.SwapRequest.user_id == owner_id)
+        )
+        session.execute(delete(models.Event).where(models.Event.user_id == owner_id))
+        session.execute(delete(models.User).where(models.User.id == owner_id))
+        session.commit()
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
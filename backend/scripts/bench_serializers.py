@@ -0,0 +1,165 @@
+"""Compare response encoding paths on synthetic shift payloads.
+
+Builds ``--items`` ``SwapRequestRead`` models (each with a nested
+``EventRead``) in memory, no database needed, and times:
+
+* ``validate``: what a ``response_model`` does with a returned model:
+  validate, dump in JSON mode, then ``json.dumps`` as starlette does;
+* ``construct+<backend>``: ``model_construct`` plus ``model_dump`` and the
+  encoder, which is what ``serialization.model_response`` sends;
+* ``dict+<backend>``: plain dicts encoded directly, as ``app.reads`` does;
+* ``format_time_range`` with and without its cache.
+
+Every installed backend in ``serialization.ENCODERS`` is measured and its
+bytes are checked against the stdlib encoder.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pydantic import TypeAdapter  # type: ignore
+
+from app import models, schemas, serialization  # type: ignore
+
+SWAP_REQUESTS = TypeAdapter(List[schemas.SwapRequestRead])
+
+
+def _payloads(count: int) -> List[Dict[str, Any]]:
+    now = datetime(2024, 5, 1, 8, 30, 15, 123456)
+    items = []
+    for index in range(count):
+        start = clock(7 if index % 2 else 19, 0)
+        end = clock(19 if index % 2 else 7, 0)
+        event = {
+            "title": f"Shift {index}",
+            "date": date(2024, 5, 1) + timedelta(days=index % 28),
+            "start_time": start,
+            "end_time": end,
+            "location": "Bench ward",
+            "event_type": "day" if index % 2 else "night",
+            "notes": None,
+            "id": index,
+            "created_at": now,
+            "time_range": models.format_time_range(start, end),
+        }
+        items.append(
+            {
+                "event_id": index,
+                "mode": schemas.SwapMode.give_away,
+                "desired_shift_type": "day",
+                "available_start_time": None,
+                "available_end_time": None,
+                "available_start_date": None,
+                "available_end_date": None,
+                "visible_to_all": True,
+                "share_with_staffing_pool": False,
+                "notes": "Swap ü",
+                "id": index,
+                "status": schemas.SwapStatus.pending,
+                "created_at": now,
+                "updated_at": now,
+                "event": event,
+                "targeted_colleagues": ["colleague@example.com"],
+                "accepted_by_user_id": None,
+                "accepted_at": None,
+                "accepted_by_name": None,
+                "accepted_by_email": None,
+                "owner_name": "Bench Owner",
+                "owner_email": "owner@example.com",
+            }
+        )
+    return items
+
+
+def _constructed(items: List[Dict[str, Any]]) -> List[schemas.SwapRequestRead]:
+    return [
+        schemas.SwapRequestRead.model_construct(
+            **{**item, "event": schemas.EventRead.model_construct(**item["event"])}
+        )
+        for item in items
+    ]
+
+
+def _stdlib(content: Any) -> bytes:
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def measure(label: str, run: Callable[[], Any], rounds: int) -> None:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:28} p50={statistics.median(timings):8.2f}ms "
+        f"min={min(timings):8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response encoding benchmark.")
+    parser.add_argument("--items", type=int, default=2_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    items = _payloads(args.items)
+    print(
+        f"{args.items} swap requests; backends: {', '.join(serialization.ENCODERS)} "
+        f"(active: {serialization.backend})"
+    )
+
+    def validated() -> bytes:
+        validated_items = SWAP_REQUESTS.validate_python(_constructed(items))
+        return _stdlib(SWAP_REQUESTS.dump_python(validated_items, mode="json"))
+
+    expected = validated()
+    measure("validate+json", validated, args.rounds)
+    for name, encode in serialization.ENCODERS.items():
+
+        def constructed(encode: Callable[[Any], bytes] = encode) -> bytes:
+            return encode(
+                [item.model_dump(by_alias=True) for item in _constructed(items)]
+            )
+
+        def plain(encode: Callable[[Any], bytes] = encode) -> bytes:
+            return encode(items)
+
+        if constructed() != expected or plain() != expected:
+            print(f"WARNING: {name} bytes differ from the stdlib encoder")
+        measure(f"construct+{name}", constructed, args.rounds)
+        measure(f"dict+{name}", plain, args.rounds)
+
+    pairs = [
+        (clock(hour, minute), clock((hour + 12) % 24, minute))
+        for hour in range(24)
+        for minute in (0, 15, 30, 45)
+    ] * (args.items // 96 + 1)
+    uncached = models.format_time_range.__wrapped__
+    measure(
+        "format_time_range uncached",
+        lambda: [uncached(start, end) for start, end in pairs],
+        args.rounds,
+    )
+    measure(
+        "format_time_range cached",
+        lambda: [models.format_time_range(start, end) for start, end in pairs],
+        args.rounds,
+    )
+
+
+if __name__ == "__main__":
+    main()
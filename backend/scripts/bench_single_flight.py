@@ -0,0 +1,86 @@
+"""Burst of identical GETs, as when a whole group opens the same week at once.
+
+Sends ``--clients`` concurrent ``GET /group-shared`` requests for the same
+window to a running API, ``--rounds`` times, and prints the median wall time
+of a burst together with the SQL statements run and the requests coalesced
+per burst, as counted by ``/metrics``. Run it against a server started with
+``SINGLE_FLIGHT_ENABLED=false`` to compare.
+
+Usage:
+    python scripts/bench_single_flight.py --base-url http://127.0.0.1:8000 \\
+        --start 2024-05-01 --end 2024-05-31 --clients 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict
+
+import httpx
+
+ROUTE = "/group-shared"
+METRIC = re.compile(
+    r"^nurseshift_(http_requests|db_statements|http_coalesced_requests)_total"
+    r'\{method="GET",route="/group-shared"\} (\d+)$'
+)
+
+
+def _counters(client: httpx.Client) -> Dict[str, int]:
+    response = client.get("/metrics")
+    response.raise_for_status()
+    counters = {"http_requests": 0, "db_statements": 0, "http_coalesced_requests": 0}
+    for line in response.text.splitlines():
+        match = METRIC.match(line)
+        if match:
+            counters[match.group(1)] = int(match.group(2))
+    return counters
+
+
+def main() -> None:
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Concurrent identical GETs.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start", type=date.fromisoformat, default=today)
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=today + timedelta(days=6)
+    )
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    params = {"start_date": args.start.isoformat(), "end_date": args.end.isoformat()}
+    with httpx.Client(
+        base_url=args.base_url,
+        timeout=120,
+        limits=httpx.Limits(max_connections=args.clients),
+    ) as client, ThreadPoolExecutor(args.clients) as pool:
+
+        def get(_index: int) -> None:
+            client.get(ROUTE, params=params).raise_for_status()
+
+        get(0)
+        before = _counters(client)
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            list(pool.map(get, range(args.clients)))
+            timings.append((time.perf_counter() - started) * 1000)
+        after = _counters(client)
+
+    delta = {name: after[name] - before[name] for name in after}
+    print(
+        f"{args.clients} concurrent {ROUTE}: "
+        f"p50={statistics.median(timings):.1f}ms per burst, "
+        f"{delta['db_statements'] / args.rounds:.1f} statements and "
+        f"{delta['http_coalesced_requests'] / args.rounds:.1f} coalesced "
+        f"requests per burst"
+    )
+
+
+if __name__ == "__main__":
+    main()
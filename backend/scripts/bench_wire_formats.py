@@ -0,0 +1,111 @@
+"""Compare JSON with the binary list formats on real month payloads.
+
+Requests ``GET /events``, ``GET /swap-requests`` and ``GET /group-shared``
+from a running API once per format (JSON, MessagePack and CBOR, see
+``app/serialization.py``) and prints, per endpoint and format, the body size,
+its gzip size, the median request latency over ``--rounds`` (the server's
+encode time is the difference to JSON) and the median time to decode the body
+here, which stands in for the client's parse time. A format the server cannot
+produce comes back as JSON and is reported as unavailable.
+
+Usage:
+    python scripts/bench_wire_formats.py --base-url http://127.0.0.1:8000 \\
+        --user-id 1 --start 2024-05-01 --end 2024-05-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+DECODERS: Dict[str, Callable[[bytes], Any]] = {"application/json": json.loads}
+if msgpack is not None:
+    DECODERS["application/msgpack"] = msgpack.unpackb
+if cbor2 is not None:
+    DECODERS["application/cbor"] = cbor2.loads
+
+
+def _median_ms(run: Callable[[], Any], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def measure(
+    client: httpx.Client, path: str, params: Dict[str, Any], rounds: int
+) -> None:
+    json_size = 0
+    lines: List[str] = []
+    for media_type, decode in DECODERS.items():
+        headers = {"Accept": media_type}
+        response = client.get(path, params=params, headers=headers)
+        response.raise_for_status()
+        served = response.headers["content-type"].split(";")[0]
+        if served != media_type:
+            lines.append(f"  {media_type:20} not available on the server")
+            continue
+        body = response.content
+        if media_type == "application/json":
+            json_size = len(body)
+            items = len(decode(body))
+            lines.insert(0, f"{path} ({items} items)")
+        latency = _median_ms(
+            lambda: client.get(path, params=params, headers=headers), rounds
+        )
+        lines.append(
+            f"  {media_type:20} {len(body) / 1024:9.1f}KiB "
+            f"({len(body) / max(json_size, 1):4.0%}) "
+            f"gzip={len(gzip.compress(body)) / 1024:8.1f}KiB "
+            f"request={latency:8.1f}ms "
+            f"decode={_median_ms(lambda: decode(body), rounds):7.2f}ms"
+        )
+    print("\n".join(lines))
+
+
+def main() -> None:
+    today = date.today()
+    parser = argparse.ArgumentParser(description="JSON vs binary formats benchmark.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--start", type=date.fromisoformat, default=today)
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=today + timedelta(days=30)
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    if len(DECODERS) == 1:
+        print("Install msgpack and/or cbor2 here to decode the binary formats")
+
+    window = {"start_date": args.start.isoformat(), "end_date": args.end.isoformat()}
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        measure(client, "/events", {**window, "user_id": args.user_id}, args.rounds)
+        measure(
+            client,
+            "/swap-requests",
+            {**window, "user_id": args.user_id},
+            args.rounds,
+        )
+        measure(client, "/group-shared", window, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Measure database commits, statements and latency per write endpoint.
+
+Registers two throwaway accounts against a running API, then repeats a write
+workflow ``--rounds`` times: create and update a shift, post and accept a swap
+for it, create a group with an invite link and redeem it, add a colleague and
+a worksite, and delete the extra shift and the group. The API's ``/metrics``
+counters are read before and after, so each route's commits and SQL statements
+per request come from the server itself. Each commit is a WAL flush on
+Postgres, so commits per request is the fsync count a write costs.
+
+Usage:
+    python scripts/bench_write_endpoints.py --base-url http://127.0.0.1:8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import secrets
+import statistics
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import httpx
+
+PASSWORD = "bench-password"
+METRIC_LINE = re.compile(
+    r'^nurseshift_(http_requests|db_commits|db_statements)_total'
+    r'\{method="(\w+)",route="([^"]+)"\} (\d+)$'
+)
+
+Counters = Dict[Tuple[str, str], Dict[str, int]]
+
+
+def _scrape(client: httpx.Client) -> Counters:
+    response = client.get("/metrics")
+    response.raise_for_status()
+    counters: Counters = defaultdict(lambda: defaultdict(int))
+    for line in response.text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            metric, method, route, value = match.groups()
+            counters[(method, route)][metric] = int(value)
+    return counters
+
+
+def _register(client: httpx.Client, email: str) -> int:
+    response = client.post(
+        "/auth/register",
+        json={
+            "name": "Write Bench",
+            "email": email,
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+            "accept_privacy": True,
+            "accept_disclaimer": True,
+        },
+    )
+    response.raise_for_status()
+    return response.json()["user"]["id"]
+
+
+def _shift(user_id: int, day: date, title: str) -> dict:
+    return {
+        "title": title,
+        "date": day.isoformat(),
+        "start_time": "07:00",
+        "end_time": "19:00",
+        "location": "Bench ward",
+        "event_type": "day",
+        "user_id": user_id,
+    }
+
+
+def _workflow(client: httpx.Client, owner: int, taker: int, round_no: int) -> None:
+    def call(method: str, path: str, **kwargs) -> dict:
+        response = client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    day = date.today() + timedelta(days=30 + round_no)
+    event = call("POST", "/events", json=_shift(owner, day, "Bench shift"))
+    call("PUT", f"/events/{event['id']}", json=_shift(owner, day, "Bench shift*"))
+    swap = call(
+        "POST",
+        "/swap-requests",
+        json={
+            "event_id": event["id"],
+            "mode": "give_away",
+            "desired_shift_type": "day",
+            "visible_to_all": True,
+        },
+    )
+    call("POST", f"/swap-requests/{swap['id']}/accept", json={"user_id": taker})
+    spare = call("POST", "/events", json=_shift(owner, day, "Bench spare"))
+    call("DELETE", f"/events/{spare['id']}")
+
+    group = call("POST", "/group-shared", json={"name": f"Bench {round_no}"})
+    token = call("POST", f"/groups/{group['id']}/invites", json={"maxUses": 5})[
+        "token"
+    ]
+    call("POST", f"/invites/{token}/redeem", json={"userId": str(taker)})
+    call("DELETE", f"/group-shared/{group['id']}")
+
+    call(
+        "POST",
+        "/colleagues",
+        json={
+            "user_id": owner,
+            "name": f"Bench Colleague {round_no}",
+            "email": f"colleague-{round_no}@nurseshift.invalid",
+            "department": "ICU",
+            "facility": "Bench Hospital",
+        },
+    )
+    call(
+        "POST",
+        "/worksites",
+        json={
+            "user_id": owner,
+            "hospital_name": "Bench Hospital",
+            "department_name": "ICU",
+            "position_name": "Registered Nurse",
+        },
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write endpoint benchmark.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    run = secrets.token_hex(4)
+    latencies: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+
+    def timed(request: httpx.Request) -> None:
+        request.extensions["bench_started"] = time.perf_counter()
+
+    def record(response: httpx.Response) -> None:
+        started = response.request.extensions["bench_started"]
+        route = re.sub(r"/(\d+|[\w-]{20,})(?=/|$)", "/{}", response.request.url.path)
+        latencies[(response.request.method, route)].append(
+            time.perf_counter() - started
+        )
+
+    with httpx.Client(
+        base_url=args.base_url,
+        timeout=60,
+        event_hooks={"request": [timed], "response": [record]},
+    ) as client:
+        owner = _register(client, f"write-bench-{run}-a@nurseshift.invalid")
+        taker = _register(client, f"write-bench-{run}-b@nurseshift.invalid")
+        before = _scrape(client)
+        latencies.clear()
+        started = time.perf_counter()
+        for round_no in range(args.rounds):
+            _workflow(client, owner, taker, round_no)
+        elapsed = time.perf_counter() - started
+        after = _scrape(client)
+
+    print(f"{args.rounds} workflows in {elapsed:.2f}s")
+    print(f"{'route':52} {'commits/req':>11} {'stmts/req':>9}")
+    total_requests = total_commits = 0
+    for key in sorted(after):
+        requests = after[key]["http_requests"] - before[key]["http_requests"]
+        if key[1] == "/metrics" or requests <= 0:
+            continue
+        commits = after[key]["db_commits"] - before[key]["db_commits"]
+        statements = after[key]["db_statements"] - before[key]["db_statements"]
+        total_requests += requests
+        total_commits += commits
+        label = f"{key[0]} {key[1]}"
+        print(f"{label:52} {commits / requests:11.2f} {statements / requests:9.1f}")
+    if total_requests:
+        print(
+            f"overall: {total_commits / total_requests:.2f} commits per request "
+            f"over {total_requests} requests"
+        )
+    print("latency by path:")
+    for (method, path), values in sorted(latencies.items()):
+        if path == "/metrics":
+            continue
+        print(
+            f"  {method:6} {path:44} p50={statistics.median(values) * 1000:6.1f}ms "
+            f"max={max(values) * 1000:6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
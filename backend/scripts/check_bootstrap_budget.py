@@ -0,0 +1,117 @@
+"""Check ``GET /me/bootstrap`` against its latency and query budget.
+
+Logs in to a running API (``--email``/``--password``, or ``--token``) and
+requests the user's bootstrap ``--requests`` times. It then checks that:
+
+* the p95 latency is within ``--budget-ms``;
+* the server ran at most ``--max-queries`` SQL statements per request, as
+  counted by ``/metrics``;
+* a repeat request with the returned ETag gets a 304.
+
+Exits with status 1 if any check fails, so it can gate a deploy.
+
+Usage:
+    python scripts/check_bootstrap_budget.py --base-url http://127.0.0.1:8000 \\
+        --email nurse@example.com --password secret
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+ROUTE = "/me/bootstrap"
+METRIC = re.compile(
+    r'^nurseshift_(http_requests|db_statements)_total'
+    r'\{method="GET",route="/me/bootstrap"\} (\d+)$'
+)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _counters(client: httpx.Client) -> dict:
+    response = client.get("/metrics")
+    response.raise_for_status()
+    counters = {"http_requests": 0, "db_statements": 0}
+    for line in response.text.splitlines():
+        match = METRIC.match(line)
+        if match:
+            counters[match.group(1)] = int(match.group(2))
+    return counters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/me/bootstrap budget check.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default=None)
+    parser.add_argument("--email", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--month", default=None, help="YYYY-MM-DD, any day")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--max-queries", type=float, default=4.0)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        token = args.token
+        if token is None:
+            if not (args.email and args.password):
+                parser.error("pass --token, or --email and --password")
+            response = client.post(
+                "/auth/login", json={"email": args.email, "password": args.password}
+            )
+            response.raise_for_status()
+            token = response.json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        params = {"month": args.month} if args.month else {}
+
+        # Warm-up, which also puts the session into the server's cache.
+        first = client.get(ROUTE, params=params, headers=headers)
+        first.raise_for_status()
+        before = _counters(client)
+        latencies = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            client.get(ROUTE, params=params, headers=headers).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+        after = _counters(client)
+        revalidated = client.get(
+            ROUTE,
+            params=params,
+            headers={**headers, "If-None-Match": first.headers["ETag"]},
+        )
+
+    requests = after["http_requests"] - before["http_requests"]
+    statements = (after["db_statements"] - before["db_statements"]) / max(requests, 1)
+    p95 = _percentile(latencies, 0.95)
+    print(
+        f"{ROUTE}: {len(first.content) / 1024:.1f}KiB, "
+        f"p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms, "
+        f"{statements:.1f} statements per request, "
+        f"revalidation -> {revalidated.status_code}"
+    )
+    failures = []
+    if p95 > args.budget_ms:
+        failures.append(f"p95 {p95:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+    if statements > args.max_queries:
+        failures.append(
+            f"{statements:.1f} statements per request, budget {args.max_queries:g}"
+        )
+    if revalidated.status_code != 304:
+        failures.append(f"If-None-Match returned {revalidated.status_code}, not 304")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Move legacy base64 avatars from users.avatar_url into the avatar file store.
+
+Walks users in primary-key order, a batch at a time, reading only the id and
+the legacy column so no more than one batch of blobs is in memory. Each blob
+is written to ``AVATAR_STORAGE_DIR``, ``avatar_hash`` is set and the legacy
+column is cleared; every batch commits on its own, so the script can be
+stopped and re-run safely. Values that are plain http(s) URLs are left in
+place and reported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from sqlalchemy import select, update  # type: ignore
+
+from app import avatars, models  # type: ignore
+from app.database import SessionLocal  # type: ignore
+
+
+def migrate(batch_size: int) -> None:
+    session = SessionLocal()
+    legacy = models.User.legacy_avatar_data
+    moved = skipped = failed = 0
+    last_id = 0
+    try:
+        while True:
+            rows = session.execute(
+                select(models.User.id, legacy)
+                .where(models.User.id > last_id, legacy.is_not(None))
+                .order_by(models.User.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for user_id, value in rows:
+                last_id = user_id
+                if value.startswith(("http://", "https://")):
+                    skipped += 1
+                    print(f"user {user_id}: external URL left in place")
+                    continue
+                try:
+                    digest = avatars.store(avatars.decode(value))
+                except ValueError as error:
+                    failed += 1
+                    print(f"user {user_id}: {error}")
+                    continue
+                session.execute(
+                    update(models.User)
+                    .where(models.User.id == user_id)
+                    .values({models.User.avatar_hash: digest, legacy: None})
+                )
+                moved += 1
+            session.commit()
+            print(f"... up to user {last_id}: {moved} moved")
+    finally:
+        session.close()
+    print(f"Moved {moved} avatars, skipped {skipped} URLs, {failed} unreadable.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    migrate(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Recompute groups.member_count / sharing_count from the membership tables.
+
+The counters are maintained transactionally by the API; run this after manual
+data fixes or imports that bypassed it to repair any drift in one statement.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from app.database import session_scope  # type: ignore
+from app import crud  # type: ignore
+
+
+def main() -> None:
+    with session_scope() as session:
+        repaired = crud.reconcile_group_counters(session)
+    print(f"Repaired counters on {repaired} groups.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Find mutually compatible pending swap requests and print the proposals."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from app.database import SessionLocal  # type: ignore
+from app import crud  # type: ignore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch swap matcher.")
+    parser.add_argument("--hospital", help="Restrict matching to one hospital")
+    parser.add_argument(
+        "--no-cycles", action="store_true", help="Only propose 2-way swaps"
+    )
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        started = time.perf_counter()
+        result = crud.find_swap_matches(
+            session, hospital=args.hospital, include_cycles=not args.no_cycles
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        session.close()
+
+    print(
+        f"Matched {result.pending} pending swaps in {elapsed:.2f}s "
+        f"({result.compatible_edges} compatible edges)."
+    )
+    for first, second in result.pairs:
+        print(f"pair  {first} <-> {second}")
+    for first, second, third in result.cycles:
+        print(f"cycle {first} -> {second} -> {third} -> {first}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,8 @@ ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 os.environ.setdefault("PYTHONPATH", str(ROOT))
 
-from app.database import SessionLocal  # type: ignore
-from app import models  # type: ignore
+from app.database import session_scope  # type: ignore
+from app import crud, models, schemas  # type: ignore
 
 
 HOSPITAL_NAME = "F.W. Huston Medical Center"
@@ -20,36 +20,22 @@ POSITION_NAME = "Registered Nurse"
 
 
 def main() -> None:
-    session = SessionLocal()
-    try:
-        users = session.query(models.User).all()
-        print(f"Updating {len(users)} users...")
-        for user in users:
-            worksite = (
-                session.query(models.Worksite)
-                .filter(models.Worksite.user_id == user.id)
-                .first()
-            )
-            if worksite is None:
-                worksite = models.Worksite(
-                    user_id=user.id,
+    with session_scope() as session:
+        user_ids = [user_id for (user_id,) in session.query(models.User.id).all()]
+        print(f"Updating {len(user_ids)} users...")
+        for user_id in user_ids:
+            # Goes through crud so the hospital/department references and the
+            # users' primary worksite stay linked.
+            crud.create_worksite(
+                session,
+                schemas.WorksiteCreate(
+                    user_id=user_id,
                     hospital_name=HOSPITAL_NAME,
                     department_name=DEPARTMENT_NAME,
                     position_name=POSITION_NAME,
-                )
-                session.add(worksite)
-            else:
-                worksite.hospital_name = HOSPITAL_NAME
-                worksite.department_name = DEPARTMENT_NAME
-                worksite.position_name = POSITION_NAME
-
-            user.primary_hospital = HOSPITAL_NAME
-            user.primary_department = DEPARTMENT_NAME
-            user.primary_position = POSITION_NAME
-        session.commit()
-        print("All users now share the same worksite details.")
-    finally:
-        session.close()
+                ),
+            )
+    print("All users now share the same worksite details.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""Hammer one invite link with concurrent redeems and check capacity holds.
+
+Creates a throwaway group, an invite link with ``--max-uses`` uses and
+``--users`` users, then redeems the link from ``--workers`` threads (each user
+twice, to exercise the duplicate-membership path). Fails if the link is
+over-redeemed or any user ends up with more than one membership. Everything it
+creates is deleted afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import secrets
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PYTHONPATH", str(ROOT))
+
+from app.database import SessionLocal, session_scope  # type: ignore
+from app import crud, models, schemas  # type: ignore
+
+
+def redeem(token: str, user_id: int) -> str:
+    with session_scope() as session:
+        status, _, reason = crud.redeem_invite_link(session, token, str(user_id))
+    return status or reason or "UNKNOWN"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Invite redemption stress test.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--max-uses", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    run = secrets.token_hex(4)
+    group = models.Group(name=f"Redeem stress {run}", invite_message="")
+    session.add(group)
+    users = [
+        models.User(
+            name=f"Stress {run} {index}",
+            email=f"stress-{run}-{index}@nurseshift.invalid",
+            password_hash="!",
+        )
+        for index in range(args.users)
+    ]
+    session.add_all(users)
+    session.commit()
+    user_ids = [user.id for user in users]
+    _, token = crud.create_group_invite_link(
+        session,
+        group.id,
+        schemas.GroupInviteLinkCreate(
+            expires_in_seconds=3600, max_uses=args.max_uses
+        ),
+    )
+    session.commit()
+
+    try:
+        attempts = [user_id for user_id in user_ids for _ in range(2)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            outcomes = Counter(pool.map(lambda uid: redeem(token, uid), attempts))
+        elapsed = time.perf_counter() - started
+
+        session.expire_all()
+        invite = (
+            session.query(models.GroupInviteLink)
+            .filter(models.GroupInviteLink.group_id == group.id)
+            .one()
+        )
+        memberships = Counter(
+            user_id
+            for (user_id,) in session.query(models.GroupMembership.user_id).filter(
+                models.GroupMembership.group_id == group.id
+            )
+        )
+        print(f"{len(attempts)} redeems in {elapsed:.2f}s: {dict(outcomes)}")
+        print(
+            f"use_count={invite.use_count} max_uses={invite.max_uses} "
+            f"members={len(memberships)}"
+        )
+        expected = min(args.users, args.max_uses)
+        failures = []
+        if invite.use_count != expected or outcomes["JOINED"] != expected:
+            failures.append(f"expected {expected} uses")
+        if len(memberships) != invite.use_count:
+            failures.append("use_count does not match memberships")
+        if any(count > 1 for count in memberships.values()):
+            failures.append("duplicate memberships")
+        if failures:
+            print("FAILED: " + "; ".join(failures))
+            sys.exit(1)
+        print("OK")
+    finally:
+        session.query(models.GroupMembership).filter(
+            models.GroupMembership.group_id == group.id
+        ).delete()
+        session.query(models.GroupInviteLink).filter(
+            models.GroupInviteLink.group_id == group.id
+        ).delete()
+        session.query(models.Group).filter(models.Group.id == group.id).delete()
+        session.query(models.User).filter(models.User.id.in_(user_ids)).delete()
+        session.commit()
+        session.close()
+
+
+if __name__ == "__main__":
+    main()